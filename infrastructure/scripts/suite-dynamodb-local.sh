@@ -19,7 +19,7 @@ init_python_container() {
 execute_seed_script() {
     warning "Ejecutando seed_dynamodb.py"
     breakline
-    docker-compose exec app python no_run/seed_dynamodb.py || {
+    docker-compose exec app python -m no_run.seed_dynamodb || {
         critical_error "Error al ejecutar seed_dynamodb.py"
     }
     breakline
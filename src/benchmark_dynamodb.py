@@ -0,0 +1,444 @@
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from dotenv import load_dotenv
+
+import migration_ttl
+from utils import dynamo_utils
+from utils.dynamo_memory_utils import InMemoryDynamoDBClient
+from utils.item_size_utils import item_size
+from utils.logging_utils import setup_logging
+from utils.table_metadata_utils import TableMetadataCache
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+DYNAMODB_ENDPOINT = os.getenv('DYNAMODB_ENDPOINT', 'http://dynamodb-local:8000')
+AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', 'fakemykeyid')
+AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'fakemysecretaccesskey')
+AWS_SESSION_TOKEN = os.getenv('AWS_SESSION_TOKEN', 'fakemysessiontoken')
+AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+BENCHMARK_OUTPUT_DIR = os.getenv('BENCHMARK_OUTPUT_DIR', 'benchmark_results')
+
+PERCENTILES = (50, 90, 95, 99)
+SCAN_SEGMENTS = (1, 2, 4, 8)
+BATCH_GET_SIZE = 100
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def create_client(endpoint=DYNAMODB_ENDPOINT):
+    """Crea un cliente de DynamoDB contra el endpoint indicado (por defecto dynamodb-local)."""
+    return boto3.client(
+        'dynamodb',
+        region_name=AWS_REGION,
+        endpoint_url=endpoint,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        aws_session_token=AWS_SESSION_TOKEN
+    )
+
+def use_client(client):
+    """
+    Hace que dynamo_utils y migration_ttl usen el cliente del benchmark.
+
+    Ambos módulos crean su cliente al importarse; aquí se reemplaza para medir
+    exactamente el mismo código contra el backend elegido.
+    """
+    dynamo_utils.dynamodb_client = client
+    migration_ttl.dynamodb_client = client
+    migration_ttl.table_metadata = TableMetadataCache(client)
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies, total_seconds, operations=None, units=None):
+    """
+    Resume una serie de latencias.
+
+    :param latencies: Segundos por llamada.
+    :param total_seconds: Duración total del caso.
+    :param operations: Operaciones lógicas (ítems) procesadas; por defecto, una por latencia.
+    :param units: Nombre de la unidad de operations.
+    :return: Diccionario con conteo, tasa, media, percentiles y máximo (en milisegundos).
+    """
+    values = sorted(latencies)
+    operations = len(values) if operations is None else operations
+    result = {
+        'calls': len(values),
+        'operations': operations,
+        'units': units or 'ops',
+        'total_seconds': round(total_seconds, 6),
+        'operations_per_second': round(operations / total_seconds, 3) if total_seconds else None,
+        'mean_ms': round(1000 * sum(values) / len(values), 4) if values else None,
+        'max_ms': round(1000 * values[-1], 4) if values else None
+    }
+    for pct in PERCENTILES:
+        value = percentile(values, pct)
+        result[f'p{pct}_ms'] = None if value is None else round(1000 * value, 4)
+    return result
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+def make_payment(index, rng, log_entries=3):
+    """Genera un pago POS sintético con la forma de los datos de be-ad-api-pos-pagos."""
+    id_comercio = f"{rng.randrange(1, 200):06d}"
+    monto = rng.randrange(1000, 500000)
+    iva = int(monto * 0.19)
+    fecha = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp() + rng.randrange(0, 365 * 86400)
+    fecha_iso = datetime.fromtimestamp(fecha, timezone.utc).isoformat()
+    return {
+        'idPago': f"pago-{index:09d}",
+        'idComercio': id_comercio,
+        'idTerminal': f"T{rng.randrange(1, 5000):05d}",
+        'estado': rng.choice(['APROBADO', 'ANULADO', 'PENDIENTE']),
+        'fecha': fecha_iso,
+        'fechaDia': fecha_iso[:10],
+        'datosPago': {
+            'monto': Decimal(monto), 'iva': Decimal(iva), 'neto': Decimal(monto - iva),
+            'propina': Decimal(rng.randrange(0, 5000)), 'cuotas': '1', 'tipoCuota': 'SIN',
+            'tipoComprobante': 'BOLETA', 'totalExento': Decimal(0)
+        },
+        'datosComercio': {'idComercio': id_comercio, 'rut': '76123456', 'dv': 'K', 'MCC': '5411',
+                          'ciudadComercio': 'Santiago', 'comunaComercio': 'Providencia', 'paisComercio': 'CL',
+                          'clientAppOrg': 'pos'},
+        'datosTarjeta': {'marca': rng.choice(['VISA', 'MASTERCARD']), 'bin': '411111',
+                         'fourDigits': f"{rng.randrange(0, 10000):04d}", 'tipo': 'CREDITO'},
+        'log': [
+            {'idPago': f"pago-{index:09d}", 'estado': 'APROBADO',
+             'fechas': {'fechaAPIUTC': fecha_iso, 'fechaPOSUTC': fecha_iso, 'fechaAnulacion': None}}
+            for _ in range(log_entries)
+        ]
+    }
+
+def marshal(item):
+    """Convierte un diccionario de Python al formato de atributos de DynamoDB."""
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+def unmarshal(item):
+    """Convierte un ítem en formato de atributos de DynamoDB a un diccionario de Python."""
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+class DynamoBenchmark:
+    """
+    Casos de benchmark sobre un backend de DynamoDB (dynamodb-local o un cliente equivalente).
+
+    Crea tablas propias con un prefijo único y las elimina al terminar, así se puede
+    correr contra el mismo contenedor que usa el resto del entorno.
+    """
+
+    def __init__(self, client, items=2000, operations=500, repeats=3, seed=42, prefix='bench'):
+        self.client = client
+        self.items = items
+        self.operations = operations
+        self.repeats = repeats
+        self.rng = random.Random(seed)
+        run = uuid.uuid4().hex[:8]
+        self.items_table = f"{prefix}-{run}-items"
+        self.query_table = f"{prefix}-{run}-query"
+        self.tables = []
+        self.payments = [marshal(make_payment(index, self.rng)) for index in range(items)]
+
+    # Preparación y limpieza
+
+    def _create_table(self, table_name, key_schema, attribute_definitions):
+        self.client.create_table(
+            TableName=table_name,
+            KeySchema=key_schema,
+            AttributeDefinitions=attribute_definitions,
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.tables.append(table_name)
+        migration_ttl.table_metadata.wait_until_active(table_name)
+
+    def setup(self):
+        self._create_table(
+            self.items_table,
+            [{'AttributeName': 'idPago', 'KeyType': 'HASH'}],
+            [{'AttributeName': 'idPago', 'AttributeType': 'S'}]
+        )
+        self._create_table(
+            self.query_table,
+            [{'AttributeName': 'idComercio', 'KeyType': 'HASH'}, {'AttributeName': 'idPago', 'KeyType': 'RANGE'}],
+            [{'AttributeName': 'idComercio', 'AttributeType': 'S'}, {'AttributeName': 'idPago', 'AttributeType': 'S'}]
+        )
+
+    def load(self):
+        """Carga los pagos sin medir, para los casos de lectura que se ejecutan sin batch_write."""
+        for start in range(0, len(self.payments), migration_ttl.BATCH_WRITE_SIZE):
+            migration_ttl.write_batch(self.items_table, self.payments[start:start + migration_ttl.BATCH_WRITE_SIZE],
+                                      ['idPago'])
+
+    def cleanup(self):
+        for table_name in self.tables:
+            try:
+                migration_ttl.table_metadata.delete_table(table_name)
+            except Exception as e:
+                logger.warning("No se pudo eliminar la tabla %s: %s", table_name, e)
+        self.tables = []
+
+    # Casos
+
+    def bench_put_item(self):
+        latencies = []
+        started = time.perf_counter()
+        for item in self.payments[:self.operations]:
+            latencies.append(timed(self.client.put_item, TableName=self.items_table, Item=item)[0])
+        return summarize(latencies, time.perf_counter() - started)
+
+    def bench_get_item(self):
+        keys = [{'idPago': item['idPago']} for item in self.payments[:self.operations]]
+        self.rng.shuffle(keys)
+        latencies = []
+        started = time.perf_counter()
+        for key in keys:
+            latencies.append(timed(self.client.get_item, TableName=self.items_table, Key=key)[0])
+        return summarize(latencies, time.perf_counter() - started)
+
+    def bench_batch_write(self):
+        latencies = []
+        started = time.perf_counter()
+        key_names = ['idPago']
+        for start in range(0, len(self.payments), migration_ttl.BATCH_WRITE_SIZE):
+            batch = self.payments[start:start + migration_ttl.BATCH_WRITE_SIZE]
+            latencies.append(timed(migration_ttl.write_batch, self.items_table, batch, key_names)[0])
+        return summarize(latencies, time.perf_counter() - started, len(self.payments), 'ítems')
+
+    def bench_batch_get(self):
+        keys = [{'idPago': item['idPago']} for item in self.payments]
+        self.rng.shuffle(keys)
+        latencies = []
+        read = 0
+        started = time.perf_counter()
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            pending = {self.items_table: {'Keys': keys[start:start + BATCH_GET_SIZE]}}
+            while pending:
+                elapsed, response = timed(self.client.batch_get_item, RequestItems=pending)
+                latencies.append(elapsed)
+                read += len(response.get('Responses', {}).get(self.items_table, []))
+                pending = response.get('UnprocessedKeys') or None
+        return summarize(latencies, time.perf_counter() - started, read, 'ítems')
+
+    def bench_parallel_scan(self, segments):
+        durations = []
+        count = 0
+        for _ in range(self.repeats):
+            elapsed, count = timed(lambda: sum(1 for _ in dynamo_utils.parallel_scan(self.items_table, segments)))
+            durations.append(elapsed)
+        result = summarize(durations, sum(durations), count * self.repeats, 'ítems')
+        result['segments'] = segments
+        result['items_per_scan'] = count
+        return result
+
+    def bench_query_pagination(self, page_size=25):
+        # Todos los pagos del benchmark en pocos comercios, para tener particiones con muchas páginas
+        merchants = [f"{index:06d}" for index in range(4)]
+        rows = [dict(item, idComercio={'S': merchants[index % len(merchants)]}) for index, item in enumerate(self.payments)]
+        for start in range(0, len(rows), migration_ttl.BATCH_WRITE_SIZE):
+            migration_ttl.write_batch(self.query_table, rows[start:start + migration_ttl.BATCH_WRITE_SIZE],
+                                      ['idComercio', 'idPago'])
+
+        latencies = []
+        count = 0
+        started = time.perf_counter()
+        for merchant in merchants:
+            request = {
+                'TableName': self.query_table,
+                'KeyConditionExpression': 'idComercio = :comercio',
+                'ExpressionAttributeValues': {':comercio': {'S': merchant}},
+                'Limit': page_size
+            }
+            while True:
+                elapsed, response = timed(self.client.query, **request)
+                latencies.append(elapsed)
+                count += len(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        result = summarize(latencies, time.perf_counter() - started, count, 'ítems')
+        result['page_size'] = page_size
+        return result
+
+    def bench_marshalling(self):
+        plain = [make_payment(index, random.Random(index)) for index in range(self.operations)]
+        results = {}
+        for name, function, values in (
+            ('serialize', marshal, plain),
+            ('deserialize', unmarshal, self.payments[:self.operations]),
+            ('item_size', item_size, self.payments[:self.operations]),
+        ):
+            latencies = []
+            started = time.perf_counter()
+            for value in values:
+                latencies.append(timed(function, value)[0])
+            results[name] = summarize(latencies, time.perf_counter() - started)
+        return results
+
+    def bench_migration(self):
+        backup_table_name = migration_ttl.create_backup_table(self.items_table)
+        self.tables.append(backup_table_name)
+        elapsed, _ = timed(migration_ttl.migrate_data, backup_table_name, self.items_table)
+        result = summarize([elapsed], elapsed, len(self.payments), 'ítems')
+        result['rows_per_second'] = result['operations_per_second']
+        return result
+
+    def run(self, cases=None):
+        """
+        Ejecuta los casos pedidos (todos por defecto) y devuelve sus resultados.
+
+        :param cases: Nombres de casos (ver CASES) o None.
+        :return: Diccionario {caso: resultado}.
+        """
+        selected = cases or list(CASES)
+        results = {}
+        self.setup()
+        try:
+            if 'batch_write' not in selected and set(selected) & set(READ_CASES):
+                self.load()
+            for name in CASES:
+                if name not in selected:
+                    continue
+                logger.info("Ejecutando caso %s", name)
+                if name == 'parallel_scan':
+                    results[name] = {str(segments): self.bench_parallel_scan(segments) for segments in SCAN_SEGMENTS}
+                else:
+                    results[name] = getattr(self, f"bench_{name}")()
+        finally:
+            self.cleanup()
+        return results
+
+# Los casos se ejecutan en este orden: los de lectura necesitan los datos de batch_write
+READ_CASES = ('get_item', 'batch_get', 'parallel_scan', 'migration')
+CASES = ('put_item', 'get_item', 'batch_write', 'batch_get', 'parallel_scan', 'query_pagination',
+         'marshalling', 'migration')
+
+def git_revision():
+    """Commit actual del repositorio, si está disponible."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(results, prefix=''):
+    """Aplana los resultados anidados a {'caso.subcaso': resultado}."""
+    flat = {}
+    for name, value in results.items():
+        if 'total_seconds' in value:
+            flat[prefix + name] = value
+        else:
+            flat.update(flatten(value, f"{prefix}{name}."))
+    return flat
+
+def compare(current, baseline, threshold=0.1):
+    """
+    Compara dos corridas y marca regresiones de p50, p99 y tasa.
+
+    :param current: Resultados de la corrida actual (campo 'results').
+    :param baseline: Resultados de la corrida de referencia.
+    :param threshold: Variación relativa a partir de la cual se marca una regresión.
+    :return: Lista de filas (caso, métrica, referencia, actual, variación, regresión).
+    """
+    rows = []
+    current, baseline = flatten(current), flatten(baseline)
+    for case in sorted(set(current) & set(baseline)):
+        for metric, higher_is_better in (('p50_ms', False), ('p99_ms', False), ('operations_per_second', True)):
+            before, after = baseline[case].get(metric), current[case].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regression = change < -threshold if higher_is_better else change > threshold
+            rows.append((case, metric, before, after, change, regression))
+    return rows
+
+def print_results(results):
+    print(f"{'Caso':<36} {'Ops':>8} {'Ops/s':>12} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for case, value in flatten(results).items():
+        print(f"{case:<36} {value['operations']:>8} {value['operations_per_second'] or 0:>12} "
+              f"{value['p50_ms'] or 0:>10} {value['p95_ms'] or 0:>10} {value['p99_ms'] or 0:>10}")
+
+def print_comparison(rows):
+    print(f"{'Caso':<36} {'Métrica':<22} {'Antes':>12} {'Ahora':>12} {'Cambio':>8}")
+    for case, metric, before, after, change, regression in rows:
+        print(f"{case:<36} {metric:<22} {before:>12} {after:>12} {change:>+8.1%}{'  REGRESIÓN' if regression else ''}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark de dynamo_utils, migration_ttl y marshalling contra DynamoDB.')
+    parser.add_argument('--endpoint', default=DYNAMODB_ENDPOINT, help='Endpoint de DynamoDB (por defecto DYNAMODB_ENDPOINT)')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Usa el DynamoDB en memoria (dynamo_memory_utils) en lugar de un endpoint')
+    parser.add_argument('--cases', nargs='*', choices=CASES, help='Casos a ejecutar (por defecto todos)')
+    parser.add_argument('--items', type=int, default=2000, help='Ítems cargados en las tablas del benchmark')
+    parser.add_argument('--operations', type=int, default=500, help='Operaciones por caso de get/put y marshalling')
+    parser.add_argument('--repeats', type=int, default=3, help='Repeticiones de cada scan paralelo')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos sintéticos')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados (por defecto en BENCHMARK_OUTPUT_DIR)')
+    parser.add_argument('--compare', default=None, help='Resultados JSON de referencia para detectar regresiones')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Variación relativa considerada regresión')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.in_process:
+        client = InMemoryDynamoDBClient(AWS_REGION)
+        backend = 'in-process'
+    else:
+        client = create_client(args.endpoint)
+        backend = args.endpoint
+    use_client(client)
+
+    benchmark = DynamoBenchmark(client, args.items, args.operations, args.repeats, args.seed)
+    started = datetime.now(timezone.utc)
+    results = benchmark.run(args.cases)
+    report = {
+        'started': started.isoformat(),
+        'revision': git_revision(),
+        'backend': backend,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'items': args.items, 'operations': args.operations, 'repeats': args.repeats, 'seed': args.seed},
+        'results': results
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(BENCHMARK_OUTPUT_DIR, exist_ok=True)
+        output = os.path.join(BENCHMARK_OUTPUT_DIR, f"benchmark-{started.strftime('%Y%m%d%H%M%S')}.json")
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print_results(results)
+    print(f"Resultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            rows = compare(results, json.load(file)['results'], args.threshold)
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    setup_logging(level=os.getenv('LOG_LEVEL', 'WARNING'))
+    main()
@@ -0,0 +1,395 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+import migration_ttl
+from benchmark_dynamodb import DYNAMODB_ENDPOINT, create_client, make_payment, marshal, percentile, summarize, use_client
+from utils import dynamo_utils
+from utils.dynamo_memory_utils import InMemoryDynamoDBClient
+from utils.logging_utils import setup_logging
+from utils.progress_utils import PROGRESS_METRICS_PORT, ProgressTracker, start_metrics_server
+from utils.resilience_utils import AWSServiceError, ThrottlingError
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+TABLE_NAME = os.getenv('TABLE_BE_AD_API_POS_PAGOS', 'be-ad-api-pos-pagos')
+MERCHANT_INDEX_NAME = os.getenv('LOAD_MERCHANT_INDEX', 'idComercio-fecha-index')
+SQS_QUEUE_URL = os.getenv('SQS_QUEUE_URL', '')
+
+# Mezcla de operaciones por defecto (pesos relativos)
+DEFAULT_MIX = {'create': 40, 'update': 20, 'annul': 5, 'get': 25, 'merchant': 10}
+OPERATIONS = tuple(DEFAULT_MIX)
+
+def parse_mix(text):
+    """Convierte 'create=40,get=25,...' en un diccionario de pesos."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Operación desconocida en la mezcla: {name} (válidas: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight)
+    return mix
+
+def arrival_offsets(rate, duration, arrival='poisson', rng=None):
+    """
+    Genera los instantes (segundos desde el inicio) en que debe comenzar cada operación.
+
+    Los instantes se fijan de antemano según la tasa objetivo y no dependen de cuánto
+    tarden las respuestas (carga de lazo abierto).
+
+    :param rate: Operaciones por segundo.
+    :param duration: Segundos de carga.
+    :param arrival: 'poisson' (intervalos exponenciales) o 'constant'.
+    :param rng: Generador aleatorio.
+    :return: Generador de offsets crecientes.
+    """
+    rng = rng or random.Random()
+    offset = 0.0
+    for index in itertools.count():
+        offset = offset + rng.expovariate(rate) if arrival == 'poisson' else index / rate
+        if offset >= duration:
+            return
+        yield offset
+
+def load_replay(path):
+    """Carga pagos a reproducir (formato de no_run/db_pago.json) ya convertidos a formato DynamoDB."""
+    with open(path, 'r') as file:
+        records = json.load(file, parse_float=Decimal)
+    return [marshal(record) for record in records]
+
+class PosLoadGenerator:
+    """
+    Generador de carga de lazo abierto para la tabla de pagos POS.
+
+    Un hilo despachador inicia cada operación en su instante programado y la entrega a un
+    pool de hilos; la latencia se mide desde el instante programado y no desde que un hilo
+    la toma, así las esperas por saturación quedan en los percentiles (sin coordinated
+    omission).
+    """
+
+    def __init__(self, client, table_name=TABLE_NAME, rate=50.0, duration=60.0, mix=None, workers=64,
+                 arrival='poisson', seed=None, merchant_index=MERCHANT_INDEX_NAME, replay=None, queue_url=None):
+        self.client = client
+        self.table_name = table_name
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix or DEFAULT_MIX
+        self.workers = workers
+        self.arrival = arrival
+        self.rng = random.Random(seed)
+        self.merchant_index = merchant_index
+        self.replay = replay
+        self.queue_url = queue_url
+        self.run_id = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._ids = []
+        self._pending = []
+        self._approved = []
+        self._merchants = []
+        self._latencies = {name: [] for name in OPERATIONS}
+        self._errors = {name: {} for name in OPERATIONS}
+        self._max_dispatch_lag = 0.0
+        self._queue_depths = []
+        self.progress = None
+
+    # Preparación
+
+    def create_table(self):
+        """Crea la tabla de pagos con el índice por comercio y stream (para trigger_lambda_sqs)."""
+        self.client.create_table(
+            TableName=self.table_name,
+            KeySchema=[{'AttributeName': 'idPago', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'idPago', 'AttributeType': 'S'},
+                {'AttributeName': 'idComercio', 'AttributeType': 'S'},
+                {'AttributeName': 'fecha', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': self.merchant_index,
+                'KeySchema': [{'AttributeName': 'idComercio', 'KeyType': 'HASH'},
+                              {'AttributeName': 'fecha', 'KeyType': 'RANGE'}],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST',
+            StreamSpecification={'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+        )
+        migration_ttl.table_metadata.wait_until_active(self.table_name)
+
+    def next_payment(self):
+        """Siguiente pago a crear: uno reproducido (con idPago único por corrida) o uno sintético."""
+        index = next(self._sequence)
+        if self.replay:
+            item = dict(self.replay[index % len(self.replay)])
+            item['idPago'] = {'S': f"{item['idPago']['S']}-{self.run_id}-{index}"}
+            return item
+        item = marshal(make_payment(index, self.rng, log_entries=1))
+        item['idPago'] = {'S': f"carga-{self.run_id}-{index:09d}"}
+        item['estado'] = {'S': 'PENDIENTE'}
+        return item
+
+    def preload(self, count):
+        """Crea pagos sin medir para que las lecturas y actualizaciones tengan sobre qué operar."""
+        for _ in range(count):
+            self._create()
+
+    # Operaciones
+
+    def _pick(self, pool, remove=False):
+        with self._lock:
+            if not pool:
+                return None
+            position = self.rng.randrange(len(pool))
+            if remove:
+                pool[position], pool[-1] = pool[-1], pool[position]
+                return pool.pop()
+            return pool[position]
+
+    def _log_entry(self, id_pago, estado):
+        now = datetime.now(timezone.utc).isoformat()
+        return {'M': {
+            'idPago': {'S': id_pago},
+            'estado': {'S': estado},
+            'fechas': {'M': {'fechaAPIUTC': {'S': now}, 'fechaPOSUTC': {'S': now}, 'fechaAnulacion': {'NULL': True}}}
+        }}
+
+    def _plan(self, operation):
+        """
+        Elige el pago sobre el que opera una operación.
+
+        Si no hay pagos en el estado necesario la operación se reemplaza por una creación,
+        que se mide como 'create' para no mezclar sus latencias con las de la operación pedida.
+
+        :return: Tupla (operación que se ejecuta, función sin argumentos que la ejecuta).
+        """
+        pools = {'update': (self._pending, True), 'annul': (self._approved, True),
+                 'get': (self._ids, False), 'merchant': (self._merchants, False)}
+        if operation not in pools:
+            return 'create', self._create
+        pool, remove = pools[operation]
+        target = self._pick(pool, remove=remove)
+        if target is None:
+            return 'create', self._create
+        return operation, lambda: getattr(self, f"_{operation}")(target)
+
+    # Cada operación devuelve None si se completó o el código de error si no se aplicó
+
+    def _create(self):
+        item = self.next_payment()
+        self.client.put_item(
+            TableName=self.table_name,
+            Item=item,
+            ConditionExpression='attribute_not_exists(idPago)'
+        )
+        with self._lock:
+            self._ids.append(item['idPago']['S'])
+            estado = item.get('estado', {}).get('S')
+            if estado == 'PENDIENTE':
+                self._pending.append(item['idPago']['S'])
+            elif estado == 'APROBADO':
+                self._approved.append(item['idPago']['S'])
+            if 'idComercio' in item:
+                self._merchants.append(item['idComercio']['S'])
+        return None
+
+    def _update(self, id_pago):
+        # Aprobación de un pago pendiente: cambia el estado y agrega la entrada al log
+        # (raise_errors: el código del ClientError llega a _execute en lugar de imprimirse)
+        dynamo_utils.append_log_entry(
+            self.table_name, {'idPago': {'S': id_pago}}, self._log_entry(id_pago, 'APROBADO'),
+            estado='APROBADO', expected_estado='PENDIENTE', raise_errors=True)
+        with self._lock:
+            self._approved.append(id_pago)
+        return None
+
+    def _annul(self, id_pago):
+        dynamo_utils.append_log_entry(
+            self.table_name, {'idPago': {'S': id_pago}}, self._log_entry(id_pago, 'ANULADO'),
+            estado='ANULADO', expected_estado='APROBADO', raise_errors=True)
+        return None
+
+    def _get(self, id_pago):
+        response = self.client.get_item(TableName=self.table_name, Key={'idPago': {'S': id_pago}})
+        return None if 'Item' in response else 'ItemNotFound'
+
+    def _merchant(self, id_comercio):
+        self.client.query(
+            TableName=self.table_name,
+            IndexName=self.merchant_index,
+            KeyConditionExpression='idComercio = :comercio',
+            ExpressionAttributeValues={':comercio': {'S': id_comercio}},
+            ScanIndexForward=False,
+            Limit=20
+        )
+        return None
+
+    def _execute(self, operation, intended):
+        throttled = False
+        try:
+            operation, action = self._plan(operation)
+            error = action()
+        except ClientError as e:
+            error = e.response['Error']['Code']
+        except AWSServiceError as e:
+            error = type(e).__name__
+            throttled = isinstance(e, ThrottlingError)
+        except Exception as e:
+            error = type(e).__name__
+        latency = time.perf_counter() - intended
+        with self._lock:
+            self._latencies[operation].append(latency)
+            if error:
+                self._errors[operation][error] = self._errors[operation].get(error, 0) + 1
+        self.progress.add()
+        if throttled or error in ('ProvisionedThroughputExceededException', 'ThrottlingException'):
+            self.progress.retry()
+
+    # Ejecución
+
+    def _sample_queue(self, stop, interval=5.0):
+        """Registra la profundidad de la cola SQS del pipeline trigger_lambda_sqs."""
+        from utils.sqs_utils import sqs_client
+        while not stop.wait(interval):
+            try:
+                attributes = sqs_client.get_queue_attributes(
+                    QueueUrl=self.queue_url, AttributeNames=['ApproximateNumberOfMessages'])['Attributes']
+                self._queue_depths.append(int(attributes['ApproximateNumberOfMessages']))
+            except ClientError as e:
+                logger.warning("No se pudo leer la cola %s: %s", self.queue_url, e.response['Error']['Message'])
+
+    def run(self):
+        """
+        Ejecuta la carga durante `duration` segundos a la tasa objetivo.
+
+        :return: Reporte con latencias por operación, errores y tasa lograda.
+        """
+        operations = [name for name in OPERATIONS if self.mix.get(name)]
+        weights = [self.mix[name] for name in operations]
+        expected = int(self.rate * self.duration)
+        self.progress = ProgressTracker(f"Carga POS {self.table_name}", total=expected, log=logger, unit='ops')
+
+        stop = threading.Event()
+        if self.queue_url:
+            threading.Thread(target=self._sample_queue, args=(stop,), daemon=True).start()
+
+        dispatched = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for offset in arrival_offsets(self.rate, self.duration, self.arrival, self.rng):
+                intended = started + offset
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self._max_dispatch_lag = max(self._max_dispatch_lag, -delay)
+                operation = self.rng.choices(operations, weights)[0]
+                executor.submit(self._execute, operation, intended)
+                dispatched += 1
+        elapsed = time.perf_counter() - started
+        stop.set()
+        self.progress.finish()
+        return self.report(dispatched, elapsed)
+
+    def report(self, dispatched, elapsed):
+        operations = {}
+        all_latencies = []
+        for name in OPERATIONS:
+            latencies = self._latencies[name]
+            if not latencies:
+                continue
+            all_latencies.extend(latencies)
+            result = summarize(latencies, elapsed)
+            result['p99.9_ms'] = round(1000 * percentile(sorted(latencies), 99.9), 4)
+            result['errors'] = self._errors[name]
+            operations[name] = result
+        overall = summarize(all_latencies, elapsed)
+        report = {
+            'table': self.table_name,
+            'target_rate': self.rate,
+            'arrival': self.arrival,
+            'duration_seconds': round(elapsed, 3),
+            'dispatched': dispatched,
+            'achieved_rate': round(len(all_latencies) / elapsed, 3) if elapsed else None,
+            'max_dispatch_lag_ms': round(1000 * self._max_dispatch_lag, 3),
+            'overall': overall,
+            'operations': operations
+        }
+        if self._queue_depths:
+            report['sqs_queue_depth'] = {'max': max(self._queue_depths), 'last': self._queue_depths[-1]}
+        return report
+
+def print_report(report):
+    print(f"Tasa objetivo {report['target_rate']}/s, lograda {report['achieved_rate']}/s, "
+          f"retraso máximo del despachador {report['max_dispatch_lag_ms']} ms")
+    print(f"{'Operación':<12} {'Ops':>8} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'p99.9 ms':>10} {'máx ms':>10}  Errores")
+    for name, result in report['operations'].items():
+        print(f"{name:<12} {result['operations']:>8} {result['p50_ms']:>10} {result['p90_ms']:>10} "
+              f"{result['p99_ms']:>10} {result['p99.9_ms']:>10} {result['max_ms']:>10}  {result['errors'] or ''}")
+    if 'sqs_queue_depth' in report:
+        print(f"Cola SQS: máximo {report['sqs_queue_depth']['max']} mensajes, al final {report['sqs_queue_depth']['last']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generador de carga POS de lazo abierto para la tabla de pagos.')
+    parser.add_argument('--table', default=TABLE_NAME, help='Tabla de pagos')
+    parser.add_argument('--rate', type=float, default=50.0, help='Operaciones por segundo objetivo')
+    parser.add_argument('--duration', type=float, default=60.0, help='Segundos de carga')
+    parser.add_argument('--mix', default=None, help='Pesos por operación, por ejemplo create=40,update=20,annul=5,get=25,merchant=10')
+    parser.add_argument('--arrival', choices=('poisson', 'constant'), default='poisson', help='Distribución de llegadas')
+    parser.add_argument('--workers', type=int, default=64, help='Hilos que ejecutan operaciones')
+    parser.add_argument('--preload', type=int, default=100, help='Pagos creados antes de medir')
+    parser.add_argument('--replay', default=None, help='JSON de pagos a reproducir (formato de no_run/db_pago.json)')
+    parser.add_argument('--merchant-index', default=MERCHANT_INDEX_NAME, help='GSI por idComercio para las consultas por comercio')
+    parser.add_argument('--create-table', action='store_true', help='Crea la tabla con el GSI por comercio y stream')
+    parser.add_argument('--queue-url', default=SQS_QUEUE_URL, help='Cola SQS del pipeline a monitorear (opcional)')
+    parser.add_argument('--endpoint', default=DYNAMODB_ENDPOINT, help='Endpoint de DynamoDB')
+    parser.add_argument('--in-process', action='store_true', help='Usa el DynamoDB en memoria')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla de llegadas y datos')
+    parser.add_argument('--output', default=None, help='Archivo JSON del reporte')
+    parser.add_argument('--metrics-port', type=int, default=PROGRESS_METRICS_PORT,
+                        help='Puerto del endpoint HTTP de avance (0 lo desactiva)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    client = InMemoryDynamoDBClient() if args.in_process else create_client(args.endpoint)
+    use_client(client)
+    generator = PosLoadGenerator(
+        client, args.table, args.rate, args.duration,
+        mix=parse_mix(args.mix) if args.mix else None,
+        workers=args.workers,
+        arrival=args.arrival,
+        seed=args.seed,
+        merchant_index=args.merchant_index,
+        replay=load_replay(args.replay) if args.replay else None,
+        queue_url=args.queue_url or None
+    )
+    if args.create_table or args.in_process:
+        generator.create_table()
+    start_metrics_server(args.metrics_port)
+    generator.preload(args.preload)
+    report = generator.run()
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Reporte guardado en {args.output}")
+
+if __name__ == '__main__':
+    setup_logging(level=os.getenv('LOG_LEVEL', 'WARNING'))
+    main()
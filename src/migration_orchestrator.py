@@ -0,0 +1,336 @@
+import argparse
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+
+from migration_planner import plan_table, print_plan
+from migration_ttl import (
+    BACKUP_TABLE_SUFFIX,
+    BATCH_WRITE_SIZE,
+    TRANSFORM_POLICIES,
+    build_table_spec,
+    dynamodb_client,
+    enable_ttl,
+    table_metadata,
+    ttl_policy,
+    validate_table_spec,
+    write_batch,
+)
+from utils.item_size_utils import item_size, write_capacity_units
+from utils.logging_utils import setup_logging
+from utils.progress_utils import PROGRESS_METRICS_PORT, ProgressTracker, start_metrics_server
+from utils.rate_limit_utils import TokenBucket
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+MIGRATION_TABLES = os.getenv('MIGRATION_TABLES', os.getenv('TABLE_BE_AD_API_POS_PAGOS', ''))
+MIGRATION_STATE_FILE = os.getenv('MIGRATION_STATE_FILE', 'migration_state.json')
+MIGRATION_REPORT_FILE = os.getenv('MIGRATION_REPORT_FILE', 'migration_report.json')
+
+# Estados de una migración de tabla
+STATUS_PENDING = 'pending'
+STATUS_COPYING = 'copying'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+def _encode_key(key):
+    """Convierte una clave de DynamoDB en JSON serializable (los binarios van en base64)."""
+    if key is None:
+        return None
+    return {
+        name: {'B64': base64.b64encode(value['B']).decode('ascii')} if 'B' in value else value
+        for name, value in key.items()
+    }
+
+def _decode_key(key):
+    """Inverso de _encode_key."""
+    if key is None:
+        return None
+    return {
+        name: {'B': base64.b64decode(value['B64'])} if 'B64' in value else value
+        for name, value in key.items()
+    }
+
+class MigrationState:
+    """
+    Estado persistente de la migración, guardado en un archivo JSON.
+
+    Guarda por tabla la tabla destino, el estado y, por segmento del scan, la última
+    clave procesada. Permite retomar una migración interrumpida sin repetir trabajo
+    (como máximo se reescribe la última página de cada segmento).
+    """
+
+    def __init__(self, path, min_save_interval=2.0):
+        self.path = path
+        self.min_save_interval = min_save_interval
+        self.lock = threading.RLock()
+        self._last_save = 0.0
+        self.tables = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                self.tables = json.load(file).get('tables', {})
+            logger.info(f"Estado de migración cargado desde {path}")
+
+    def table(self, table_name):
+        with self.lock:
+            return self.tables.setdefault(table_name, {'status': STATUS_PENDING, 'segments': {}})
+
+    def save(self, force=False):
+        """Escribe el estado de forma atómica (archivo temporal + rename)."""
+        if not self.path:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < self.min_save_interval:
+                return
+            self._last_save = now
+            temporary = f"{self.path}.tmp"
+            with open(temporary, 'w') as file:
+                json.dump({'tables': self.tables}, file, indent=2, default=str)
+            os.replace(temporary, self.path)
+
+class MigrationBudget:
+    """
+    Presupuesto global compartido por todas las migraciones en curso.
+
+    :ivar read_units: Token bucket de RCU por segundo.
+    :ivar write_units: Token bucket de WCU por segundo.
+    :ivar workers: Semáforo que limita los segmentos activos entre todas las tablas.
+    """
+
+    def __init__(self, read_units_per_second=None, write_units_per_second=None, max_workers=8):
+        self.read_units = TokenBucket(read_units_per_second)
+        self.write_units = TokenBucket(write_units_per_second)
+        self.workers = threading.BoundedSemaphore(max_workers)
+
+class TableMigration:
+    """
+    Migra una tabla a su tabla de respaldo aplicando una política de transformación.
+    """
+
+    def __init__(self, table_name, state, budget, policy, segments=4, page_size=None, progress_interval=10):
+        self.table_name = table_name
+        self.state = state
+        self.budget = budget
+        self.policy = policy
+        self.segments = segments
+        self.page_size = page_size
+        self.entry = state.table(table_name)
+        self.progress = ProgressTracker(f"Migración {table_name}", log=logger, interval=progress_interval)
+
+    def _ensure_target_table(self):
+        """Crea la tabla destino (o reutiliza la del estado guardado) y espera a que esté activa."""
+        target = self.entry.get('target_table')
+        if not target:
+            target = f"{self.table_name}{BACKUP_TABLE_SUFFIX}{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            self.entry['target_table'] = target
+            self.state.save(force=True)
+        if not table_metadata.exists(target):
+            spec = build_table_spec(self.table_name, target)
+            validate_table_spec(spec)
+            logger.info(f"[{self.table_name}] Creando tabla destino {target}")
+            table_metadata.create_table(**spec)
+        table_metadata.wait_until_active(target)
+        return target
+
+    def _add_counters(self, items, units):
+        with self.state.lock:
+            self.entry['items'] = self.entry.get('items', 0) + items
+            self.entry['write_units'] = self.entry.get('write_units', 0) + units
+
+    def _copy_segment(self, target, key_names, segment):
+        """Copia un segmento del scan, retomando desde la última clave guardada."""
+        with self.state.lock:
+            segment_state = self.entry['segments'].setdefault(str(segment), {'last_key': None, 'done': False})
+        if segment_state['done']:
+            return
+        request = {
+            'TableName': self.table_name,
+            'Segment': segment,
+            'TotalSegments': self.segments,
+            'ReturnConsumedCapacity': 'TOTAL'
+        }
+        if self.page_size:
+            request['Limit'] = self.page_size
+        if segment_state['last_key']:
+            request['ExclusiveStartKey'] = _decode_key(segment_state['last_key'])
+
+        with self.budget.workers:
+            while True:
+                response = dynamodb_client.scan(**request)
+                # El consumo de lectura se conoce después del scan: se paga esperando antes de seguir
+                self.budget.read_units.acquire(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+
+                items = [self.policy(record) for record in response.get('Items', [])]
+                for start in range(0, len(items), BATCH_WRITE_SIZE):
+                    batch = items[start:start + BATCH_WRITE_SIZE]
+                    sizes = [item_size(item) for item in batch]
+                    units = sum(write_capacity_units(size) for size in sizes)
+                    self.budget.write_units.acquire(units)
+                    written = write_batch(target, batch, key_names, progress=self.progress)
+                    self._add_counters(len(written), units)
+                    self.progress.add(len(written), bytes=sum(sizes), capacity=units)
+
+                last_key = response.get('LastEvaluatedKey')
+                with self.state.lock:
+                    segment_state['last_key'] = _encode_key(last_key)
+                    segment_state['done'] = last_key is None
+                self.state.save()
+                if last_key is None:
+                    return
+                request['ExclusiveStartKey'] = last_key
+
+    def run(self):
+        """
+        Ejecuta la migración completa de la tabla.
+
+        :return: Entrada de estado de la tabla (con status, items, target_table, ...).
+        """
+        if self.entry.get('status') == STATUS_DONE:
+            logger.info(f"[{self.table_name}] Ya migrada en {self.entry.get('target_table')}, se omite")
+            return self.entry
+
+        started = time.monotonic()
+        try:
+            # ItemCount es aproximado (se actualiza cada ~6 horas): sólo alimenta el ETA
+            self.progress.total = table_metadata.describe(self.table_name).get('ItemCount') or None
+            target = self._ensure_target_table()
+            key_names = table_metadata.key_names(target)
+            if self.entry.get('total_segments') not in (None, self.segments):
+                # Los segmentos guardados sólo valen con la misma cantidad de segmentos
+                logger.info(f"[{self.table_name}] Cambió la cantidad de segmentos, se reinicia la copia")
+                self.entry['segments'] = {}
+            self.entry['total_segments'] = self.segments
+            self.entry['status'] = STATUS_COPYING
+            self.entry.pop('error', None)
+            self.state.save(force=True)
+
+            with ThreadPoolExecutor(max_workers=self.segments) as executor:
+                futures = [executor.submit(self._copy_segment, target, key_names, segment)
+                           for segment in range(self.segments)]
+                for future in futures:
+                    future.result()
+
+            if getattr(self.policy, 'enables_ttl', False):
+                enable_ttl(target)
+            self.entry['status'] = STATUS_DONE
+            logger.info(f"[{self.table_name}] Migración completada: {self.entry.get('items', 0)} ítems en {target}")
+        except Exception as e:
+            self.entry['status'] = STATUS_FAILED
+            self.entry['error'] = str(e)
+            logger.error(f"[{self.table_name}] Error en la migración: {e}")
+        finally:
+            self.entry['seconds'] = round(self.entry.get('seconds', 0) + time.monotonic() - started, 3)
+            self.entry['progress'] = self.progress.finish()
+            self.state.save(force=True)
+        return self.entry
+
+def run_migrations(table_names, policy, max_tables=2, max_workers=8, segments=4, page_size=None,
+                   read_units_per_second=None, write_units_per_second=None,
+                   state_file=MIGRATION_STATE_FILE, report_file=MIGRATION_REPORT_FILE, progress_interval=10):
+    """
+    Migra varias tablas en paralelo con un presupuesto global de capacidad y concurrencia.
+
+    :param table_names: Tablas a migrar.
+    :param policy: Función de transformación de ítems (ver TRANSFORM_POLICIES).
+    :param max_tables: Tablas migrándose a la vez.
+    :param max_workers: Segmentos de scan activos a la vez entre todas las tablas.
+    :param segments: Segmentos del scan paralelo por tabla.
+    :param page_size: Límite de ítems por página de scan (None para el máximo de 1 MB).
+    :param read_units_per_second: Presupuesto global de RCU/s (None sin límite).
+    :param write_units_per_second: Presupuesto global de WCU/s (None sin límite).
+    :param state_file: Archivo de estado para retomar la migración.
+    :param report_file: Archivo JSON donde se guarda el reporte final.
+    :param progress_interval: Segundos entre reportes de avance de cada tabla (el detalle
+                              en vivo queda en el endpoint de métricas, ver progress_utils).
+    :return: Diccionario {tabla: entrada de estado}.
+    """
+    state = MigrationState(state_file)
+    budget = MigrationBudget(read_units_per_second, write_units_per_second, max_workers)
+    migrations = [
+        TableMigration(name, state, budget, policy, segments, page_size, progress_interval)
+        for name in table_names
+    ]
+
+    with ThreadPoolExecutor(max_workers=max_tables) as executor:
+        results = dict(zip(table_names, executor.map(lambda migration: migration.run(), migrations)))
+
+    print_report(results)
+    if report_file:
+        with open(report_file, 'w') as file:
+            json.dump(results, file, indent=2, default=str)
+        logger.info(f"Reporte guardado en {report_file}")
+    return results
+
+def print_report(results):
+    """Imprime el reporte final de la migración."""
+    print(f"{'Tabla':<40} {'Estado':<8} {'Ítems':>10} {'WCU':>10} {'Segundos':>10} {'Ítems/s':>10} "
+          f"{'Reintentos':>10}  Destino / Error")
+    for table_name, entry in results.items():
+        detail = entry.get('error') if entry.get('status') == STATUS_FAILED else entry.get('target_table', '')
+        progress = entry.get('progress', {})
+        print(f"{table_name:<40} {entry.get('status', ''):<8} {entry.get('items', 0):>10} "
+              f"{entry.get('write_units', 0):>10} {entry.get('seconds', 0):>10} "
+              f"{progress.get('average_items_per_second', 0):>10} {progress.get('retries', 0):>10}  {detail}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Migra varias tablas de DynamoDB a tablas de respaldo en paralelo.')
+    parser.add_argument('tables', nargs='*', help='Tablas a migrar (por defecto MIGRATION_TABLES, separadas por coma)')
+    parser.add_argument('--policy', choices=sorted(TRANSFORM_POLICIES), default='ttl', help='Política de transformación')
+    parser.add_argument('--ttl-days', type=int, default=30, help='Días de TTL para la política ttl')
+    parser.add_argument('--max-tables', type=int, default=2, help='Tablas migrándose a la vez')
+    parser.add_argument('--max-workers', type=int, default=8, help='Segmentos activos a la vez entre todas las tablas')
+    parser.add_argument('--segments', type=int, default=4, help='Segmentos de scan por tabla')
+    parser.add_argument('--page-size', type=int, default=None, help='Ítems por página de scan')
+    parser.add_argument('--read-units', type=float, default=None, help='Presupuesto global de RCU por segundo')
+    parser.add_argument('--write-units', type=float, default=None, help='Presupuesto global de WCU por segundo')
+    parser.add_argument('--state-file', default=MIGRATION_STATE_FILE, help='Archivo de estado para retomar')
+    parser.add_argument('--report-file', default=MIGRATION_REPORT_FILE, help='Archivo del reporte final')
+    parser.add_argument('--metrics-port', type=int, default=PROGRESS_METRICS_PORT,
+                        help='Puerto del endpoint HTTP de avance (0 lo desactiva)')
+    parser.add_argument('--dry-run', action='store_true', help='Sólo estima costo y duración, sin escribir nada')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    tables = args.tables or [name.strip() for name in MIGRATION_TABLES.split(',') if name.strip()]
+    if not tables:
+        raise SystemExit("No hay tablas para migrar (argumentos o MIGRATION_TABLES)")
+    policy = ttl_policy(args.ttl_days) if args.policy == 'ttl' else TRANSFORM_POLICIES[args.policy]()
+    if args.dry_run:
+        plans = [
+            plan_table(table, policy, segments=args.segments, workers=args.max_workers,
+                       read_units_per_second=args.read_units, write_units_per_second=args.write_units)
+            for table in tables
+        ]
+        print_plan(plans)
+        return
+    start_metrics_server(args.metrics_port)
+    results = run_migrations(
+        tables, policy,
+        max_tables=args.max_tables,
+        max_workers=args.max_workers,
+        segments=args.segments,
+        page_size=args.page_size,
+        read_units_per_second=args.read_units,
+        write_units_per_second=args.write_units,
+        state_file=args.state_file,
+        report_file=args.report_file
+    )
+    if any(entry.get('status') != STATUS_DONE for entry in results.values()):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import copy
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from migration_ttl import BATCH_WRITE_SIZE, TRANSFORM_POLICIES, dynamodb_client, table_metadata, ttl_policy
+from utils.item_size_utils import item_size, read_capacity_units, write_capacity_units
+from utils.logging_utils import setup_logging
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+MIGRATION_TABLES = os.getenv('MIGRATION_TABLES', os.getenv('TABLE_BE_AD_API_POS_PAGOS', ''))
+
+# Tamaño máximo de una página de scan
+SCAN_PAGE_BYTES = 1024 * 1024
+
+def sample_table(table_name, segments=8, limit=25):
+    """
+    Toma una muestra de la tabla con un scan paralelo de una sola página por segmento.
+
+    Cada segmento lee como máximo `limit` ítems, así que la muestra cuesta pocas RCU y
+    cubre todo el espacio de claves. No escribe nada.
+
+    :param table_name: Nombre de la tabla.
+    :param segments: Segmentos del scan (uno por hilo).
+    :param limit: Ítems por segmento.
+    :return: Diccionario con 'items' (muestra), 'latencies' (segundos por llamada) y
+             'read_units' (RCU consumidas por la muestra).
+    """
+    def read_segment(segment):
+        started = time.perf_counter()
+        response = dynamodb_client.scan(
+            TableName=table_name,
+            Segment=segment,
+            TotalSegments=segments,
+            Limit=limit,
+            ReturnConsumedCapacity='TOTAL'
+        )
+        elapsed = time.perf_counter() - started
+        return response.get('Items', []), elapsed, response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        results = list(executor.map(read_segment, range(segments)))
+    return {
+        'items': [item for items, _, _ in results for item in items],
+        'latencies': [elapsed for _, elapsed, _ in results],
+        'read_units': sum(units for _, _, units in results)
+    }
+
+def plan_table(table_name, policy=None, segments=8, sample_limit=25, workers=4,
+               read_units_per_second=None, write_units_per_second=None):
+    """
+    Estima el costo y la duración de copiar una tabla, sin escribir nada.
+
+    El conteo y el tamaño total salen de describe_table (ItemCount y TableSizeBytes, que
+    AWS actualiza cada ~6 horas); el tamaño promedio y las WCU por ítem salen de la
+    muestra, aplicando la política de transformación a copias de los ítems.
+
+    :param table_name: Nombre de la tabla origen.
+    :param policy: Función de transformación de ítems, o None para copiar sin cambios.
+    :param segments: Segmentos de la muestra.
+    :param sample_limit: Ítems por segmento en la muestra.
+    :param workers: Hilos de copia previstos.
+    :param read_units_per_second: Límite de RCU/s previsto (None sin límite).
+    :param write_units_per_second: Límite de WCU/s previsto (None sin límite).
+    :return: Diccionario con el plan.
+    """
+    description = table_metadata.describe(table_name, refresh=True)
+    sample = sample_table(table_name, segments, sample_limit)
+    items = sample['items']
+
+    sizes = [item_size(item) for item in items]
+    target_items = [policy(copy.deepcopy(item)) for item in items] if policy else items
+    target_sizes = [item_size(item) for item in target_items]
+
+    average_size = sum(sizes) / len(sizes) if sizes else 0
+    average_target_size = sum(target_sizes) / len(target_sizes) if target_sizes else 0
+    # Las WCU se redondean por ítem, así que se promedian por ítem y no sobre el tamaño medio
+    wcu_per_item = sum(write_capacity_units(size) for size in target_sizes) / len(target_sizes) if target_sizes else 0
+
+    item_count = description.get('ItemCount', 0)
+    table_bytes = description.get('TableSizeBytes', 0)
+    count_source = 'describe_table'
+    if not item_count and table_bytes and average_size:
+        item_count = int(table_bytes / average_size)
+        count_source = 'TableSizeBytes / tamaño promedio'
+    if not item_count and items:
+        # Sin estadísticas (tabla nueva o emulador): la muestra es una cota inferior
+        item_count = len(items)
+        count_source = 'muestra (cota inferior)'
+    total_bytes = table_bytes or item_count * average_size
+
+    # El scan lee páginas de hasta 1 MB con lectura eventualmente consistente
+    scan_rcu = read_capacity_units(SCAN_PAGE_BYTES) * (total_bytes / SCAN_PAGE_BYTES)
+    total_wcu = wcu_per_item * item_count
+
+    # Capacidad de los hilos, medida con la latencia de la muestra
+    latencies = sorted(sample['latencies'])
+    latency = latencies[len(latencies) // 2] if latencies else 0
+    pages = math.ceil(total_bytes / SCAN_PAGE_BYTES) if total_bytes else 0
+    batches = math.ceil(item_count / BATCH_WRITE_SIZE) if item_count else 0
+    # Se asume que un batch_write_item tarda lo mismo que un scan de la muestra
+    worker_seconds = (pages + batches) * latency / max(1, workers)
+
+    limits = {'hilos': worker_seconds}
+    if read_units_per_second:
+        limits['RCU/s'] = scan_rcu / read_units_per_second
+    if write_units_per_second:
+        limits['WCU/s'] = total_wcu / write_units_per_second
+    bottleneck = max(limits, key=limits.get)
+
+    return {
+        'table': table_name,
+        'billing_mode': table_metadata.billing_mode(table_name),
+        'item_count': item_count,
+        'item_count_source': count_source,
+        'sample_items': len(items),
+        'sample_read_units': sample['read_units'],
+        'average_item_bytes': round(average_size, 1),
+        'average_target_item_bytes': round(average_target_size, 1),
+        'total_bytes': int(total_bytes),
+        'read_units': round(scan_rcu, 1),
+        'write_units': round(total_wcu, 1),
+        'median_request_seconds': round(latency, 4),
+        'workers': workers,
+        'estimated_seconds': round(limits[bottleneck], 1),
+        'bottleneck': bottleneck
+    }
+
+def print_plan(plans):
+    """Imprime los planes de migración y el total."""
+    print(f"{'Tabla':<40} {'Ítems':>12} {'Bytes/ítem':>11} {'RCU':>12} {'WCU':>12} {'Duración':>10}  Límite")
+    for plan in plans:
+        print(f"{plan['table']:<40} {plan['item_count']:>12} {plan['average_target_item_bytes']:>11} "
+              f"{plan['read_units']:>12} {plan['write_units']:>12} {plan['estimated_seconds']:>9}s  {plan['bottleneck']}")
+    print(f"{'TOTAL':<40} {sum(plan['item_count'] for plan in plans):>12} {'':>11} "
+          f"{round(sum(plan['read_units'] for plan in plans), 1):>12} "
+          f"{round(sum(plan['write_units'] for plan in plans), 1):>12}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Estima costo y duración de una migración sin escribir nada.')
+    parser.add_argument('tables', nargs='*', help='Tablas a evaluar (por defecto MIGRATION_TABLES, separadas por coma)')
+    parser.add_argument('--policy', choices=sorted(TRANSFORM_POLICIES), default='ttl', help='Política de transformación')
+    parser.add_argument('--ttl-days', type=int, default=30, help='Días de TTL para la política ttl')
+    parser.add_argument('--segments', type=int, default=8, help='Segmentos de la muestra')
+    parser.add_argument('--sample-limit', type=int, default=25, help='Ítems por segmento en la muestra')
+    parser.add_argument('--workers', type=int, default=4, help='Hilos de copia previstos')
+    parser.add_argument('--read-units', type=float, default=None, help='Límite de RCU por segundo previsto')
+    parser.add_argument('--write-units', type=float, default=None, help='Límite de WCU por segundo previsto')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    tables = args.tables or [name.strip() for name in MIGRATION_TABLES.split(',') if name.strip()]
+    if not tables:
+        raise SystemExit("No hay tablas para evaluar (argumentos o MIGRATION_TABLES)")
+    policy = ttl_policy(args.ttl_days) if args.policy == 'ttl' else TRANSFORM_POLICIES[args.policy]()
+    plans = [
+        plan_table(table, policy, args.segments, args.sample_limit, args.workers, args.read_units, args.write_units)
+        for table in tables
+    ]
+    print_plan(plans)
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
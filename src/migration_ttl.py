@@ -1,4 +1,3 @@
-import boto3
 import os
 import logging
 import time
@@ -6,8 +5,13 @@ from datetime import datetime
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
 
-# Configuración de logging
-logging.basicConfig(level=logging.INFO)
+from utils.item_size_utils import item_size, write_capacity_units
+from utils.logging_utils import SampledLogger, setup_logging
+from utils.progress_utils import ProgressTracker, start_metrics_server
+from utils.table_metadata_utils import TableMetadataCache
+from utils.resilience_utils import resilient_client, resilient_resource
+
+# Configuración de logging (los handlers se configuran con setup_logging al ejecutar el script)
 logger = logging.getLogger(__name__)
 
 # Cargar variables de entorno desde un archivo .env
@@ -22,13 +26,13 @@ AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 TABLE_NAME = os.getenv('TABLE_BE_AD_API_POS_PAGOS', 'be-ad-api-pos-pag')
 BACKUP_TABLE_SUFFIX = '-backup-'
 TTL_FIELD_NAME = 'ttl'
-KEY_SCHEMA = [
-    {'AttributeName': 'idPago', 'KeyType': 'HASH'},
-    {'AttributeName': 'fecha', 'KeyType': 'S'} 
-]
+BATCH_WRITE_SIZE = 25
+MIGRATION_LOG_SAMPLE_EVERY = int(os.getenv('MIGRATION_LOG_SAMPLE_EVERY', '1000'))
+VALID_KEY_TYPES = ('HASH', 'RANGE')
+VALID_KEY_ATTRIBUTE_TYPES = ('S', 'N', 'B')
 
 # Inicializa el cliente y recurso de DynamoDB
-dynamodb_client = boto3.client(
+dynamodb_client = resilient_client(
     'dynamodb',
     region_name=AWS_REGION,
     endpoint_url=DYNAMODB_ENDPOINT,
@@ -37,7 +41,7 @@ dynamodb_client = boto3.client(
     aws_session_token=AWS_SESSION_TOKEN
 )
 
-dynamodb_resource = boto3.resource(
+dynamodb_resource = resilient_resource(
     'dynamodb',
     region_name=AWS_REGION,
     endpoint_url=DYNAMODB_ENDPOINT,
@@ -46,6 +50,9 @@ dynamodb_resource = boto3.resource(
     aws_session_token=AWS_SESSION_TOKEN
 )
 
+# Caché de metadata de tablas (describe_table / describe_time_to_live)
+table_metadata = TableMetadataCache(dynamodb_client)
+
 # Función para mostrasr string fecha a partir de un timestamp
 def timestamp_to_string(timestamp):
     """
@@ -54,7 +61,7 @@ def timestamp_to_string(timestamp):
     :param timestamp: El timestamp a convertir (en segundos).
     :return: Fecha en formato de cadena 'YYYY-MM-DD HH:MM:SS'.
     """
-    logger.info(f"func timestamp_to_string invoked with param: {timestamp}")
+    logger.debug("func timestamp_to_string invoked with param: %s", timestamp)
     # Convierte el timestamp a un objeto datetime
     dt_object = datetime.fromtimestamp(timestamp)
     
@@ -67,136 +74,292 @@ def timestamp_to_string(timestamp):
 def calculate_ttl(days=30):
     # Calcular el TTL en segundos desde la época
     ttl_seconds = int(time.time()) + days * 86400  # 86400 segundos en un día
-    logger.info(f"func calculate_ttl ttl_seconds(int): {ttl_seconds}")
+    logger.debug("func calculate_ttl ttl_seconds(int): %s", ttl_seconds)
     return ttl_seconds
 
+# Políticas de transformación de ítems
+def ttl_policy(days=30):
+    """
+    Política que agrega el atributo TTL (número, en segundos desde la época) a cada ítem.
+
+    :param days: Días de vida de los ítems migrados.
+    :return: Función de transformación.
+    """
+    def transform(record):
+        record[TTL_FIELD_NAME] = {'N': str(calculate_ttl(days))}
+        return record
+    transform.enables_ttl = True
+    return transform
+
+def copy_policy():
+    """Política que copia los ítems sin modificarlos."""
+    def transform(record):
+        return record
+    transform.enables_ttl = False
+    return transform
+
+TRANSFORM_POLICIES = {
+    'ttl': ttl_policy,
+    'copy': copy_policy,
+}
+
 # Función para habilitar TTL en la nueva tabla
-def enable_ttl():
-    # Obtener el estado actual del TTL de la tabla
-    response = dynamodb_client.describe_time_to_live(TableName=TABLE_NAME)
-    ttl_status = response.get('TimeToLiveDescription', {}).get('TimeToLiveStatus')
+def enable_ttl(table_name=TABLE_NAME):
+    # Obtener el estado actual del TTL de la tabla (desde la caché de metadata)
+    ttl_status = table_metadata.ttl_status(table_name)
 
     # Verificar el estado del TTL
     if ttl_status == 'ENABLED':
-        print(f"TTL ya está habilitado en la tabla {TABLE_NAME}")
+        print(f"TTL ya está habilitado en la tabla {table_name}")
     else:
         # Habilitar el TTL si no está activo
-        dynamodb_client.update_time_to_live(
-            TableName=TABLE_NAME,
-            TimeToLiveSpecification={
-                'Enabled': True,
-                'AttributeName': TTL_FIELD_NAME
-            }
-        )
-        print(f"TTL habilitado en la tabla {TABLE_NAME}")
+        table_metadata.update_time_to_live(table_name, TTL_FIELD_NAME)
+        print(f"TTL habilitado en la tabla {table_name}")
+
+# Función para recorrer una tabla página por página
+def iter_pages(table_name, **scan_kwargs):
+    """
+    Recorre una tabla con scan siguiendo LastEvaluatedKey, sin acumular los ítems.
+
+    :param table_name: Nombre de la tabla.
+    :param scan_kwargs: Parámetros adicionales para scan (Limit, ProjectionExpression, ...).
+    :return: Generador de listas de ítems (una por página).
+    """
+    request = dict(scan_kwargs, TableName=table_name)
+    while True:
+        response = dynamodb_client.scan(**request)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
 # Función para obtener los elementos de una tabla
 def get_items(table_name):
-    response = dynamodb_client.scan(TableName=table_name)
-    items = response.get('Items', [])
-    return items
+    return [item for page in iter_pages(table_name) for item in page]
+
+# Función para derivar la definición de la tabla de respaldo a partir de la original
+def build_table_spec(source_table_name, target_table_name):
+    """
+    Construye los parámetros de create_table de la tabla destino copiando la tabla origen.
+
+    Copia esquema de claves, definiciones de atributos, GSI, LSI, modo de facturación,
+    capacidad provisionada y configuración de streams desde describe_table.
+
+    :param source_table_name: Nombre de la tabla original.
+    :param target_table_name: Nombre de la tabla a crear.
+    :return: Diccionario de parámetros para create_table.
+    """
+    source = table_metadata.describe(source_table_name)
+    billing_mode = table_metadata.billing_mode(source_table_name)
+    provisioned = billing_mode == 'PROVISIONED'
+
+    def throughput(description):
+        return {
+            'ReadCapacityUnits': description['ReadCapacityUnits'],
+            'WriteCapacityUnits': description['WriteCapacityUnits']
+        }
+
+    spec = {
+        'TableName': target_table_name,
+        'KeySchema': [dict(key) for key in source['KeySchema']],
+        'AttributeDefinitions': [dict(attribute) for attribute in source['AttributeDefinitions']],
+        'BillingMode': billing_mode
+    }
+    if provisioned:
+        spec['ProvisionedThroughput'] = throughput(source['ProvisionedThroughput'])
+
+    global_indexes = []
+    for index in source.get('GlobalSecondaryIndexes', []):
+        global_index = {
+            'IndexName': index['IndexName'],
+            'KeySchema': index['KeySchema'],
+            'Projection': index['Projection']
+        }
+        if provisioned:
+            global_index['ProvisionedThroughput'] = throughput(index['ProvisionedThroughput'])
+        global_indexes.append(global_index)
+    if global_indexes:
+        spec['GlobalSecondaryIndexes'] = global_indexes
+
+    local_indexes = [
+        {'IndexName': index['IndexName'], 'KeySchema': index['KeySchema'], 'Projection': index['Projection']}
+        for index in source.get('LocalSecondaryIndexes', [])
+    ]
+    if local_indexes:
+        spec['LocalSecondaryIndexes'] = local_indexes
+
+    stream = source.get('StreamSpecification')
+    if stream and stream.get('StreamEnabled'):
+        spec['StreamSpecification'] = {'StreamEnabled': True, 'StreamViewType': stream['StreamViewType']}
+    return spec
+
+# Función para validar la definición de una tabla antes de crearla
+def validate_table_spec(spec):
+    """
+    Valida una definición de tabla antes de hacer cualquier trabajo costoso.
+
+    :param spec: Parámetros de create_table.
+    :raises ValueError: Con todos los problemas encontrados.
+    """
+    problems = []
+    attribute_types = {}
+    for attribute in spec.get('AttributeDefinitions', []):
+        if attribute['AttributeType'] not in VALID_KEY_ATTRIBUTE_TYPES:
+            problems.append(f"Tipo inválido {attribute['AttributeType']} para el atributo {attribute['AttributeName']}")
+        attribute_types[attribute['AttributeName']] = attribute['AttributeType']
+
+    def check_key_schema(owner, key_schema):
+        key_types = [key['KeyType'] for key in key_schema]
+        for key in key_schema:
+            if key['KeyType'] not in VALID_KEY_TYPES:
+                problems.append(f"{owner}: KeyType inválido '{key['KeyType']}' en {key['AttributeName']}")
+            if key['AttributeName'] not in attribute_types:
+                problems.append(f"{owner}: {key['AttributeName']} no está en AttributeDefinitions")
+        if key_types.count('HASH') != 1 or key_types.count('RANGE') > 1 or (key_types and key_types[0] != 'HASH'):
+            problems.append(f"{owner}: el esquema de claves debe tener una HASH y como máximo una RANGE ({key_types})")
+        return {key['AttributeName'] for key in key_schema}
+
+    used = check_key_schema('Tabla', spec.get('KeySchema', []))
+    table_hash = [key['AttributeName'] for key in spec.get('KeySchema', []) if key['KeyType'] == 'HASH']
+    for index in spec.get('GlobalSecondaryIndexes', []):
+        used |= check_key_schema(f"GSI {index['IndexName']}", index['KeySchema'])
+    for index in spec.get('LocalSecondaryIndexes', []):
+        used |= check_key_schema(f"LSI {index['IndexName']}", index['KeySchema'])
+        index_hash = [key['AttributeName'] for key in index['KeySchema'] if key['KeyType'] == 'HASH']
+        if index_hash != table_hash:
+            problems.append(f"LSI {index['IndexName']}: debe compartir la clave HASH de la tabla")
+
+    unused = set(attribute_types) - used
+    if unused:
+        problems.append(f"Atributos definidos que no son clave de la tabla ni de índices: {sorted(unused)}")
+    if spec.get('BillingMode') == 'PROVISIONED' and 'ProvisionedThroughput' not in spec:
+        problems.append("Falta ProvisionedThroughput para una tabla PROVISIONED")
+
+    if problems:
+        raise ValueError("Definición de tabla inválida: " + "; ".join(problems))
 
 # Función para crear una tabla de respaldo
-def create_backup_table():
+def create_backup_table(table_name=TABLE_NAME):
     # Nombre de la nueva tabla de respaldo con marca de tiempo
-    backup_table_name = f"{TABLE_NAME}{BACKUP_TABLE_SUFFIX}{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    logger.info(f"Creando tabla de respaldo: {backup_table_name}")
-    
-    # Obtén el esquema de la tabla original
-    logger.info(f"Obteniendo detalles de la tabla original: {TABLE_NAME}")
-    original_table = dynamodb_client.describe_table(TableName=TABLE_NAME)
-    key_schema = KEY_SCHEMA
-    provisioned_throughput = original_table['Table']['ProvisionedThroughput']
-    attribute_definitions = original_table['Table']['AttributeDefinitions']
-    
-    logger.info(f"Key Schema: {key_schema}")
-    logger.info(f"Provisioned Throughput: {provisioned_throughput}")
-    logger.info(f"Attribute Definitions: {attribute_definitions}")
-
-    # Extraer nombres de atributos del KeySchema
-    key_attribute_names = {key['AttributeName'] for key in key_schema}
-    logger.info(f"Nombres de atributos del KeySchema: {key_attribute_names}")
+    backup_table_name = f"{table_name}{BACKUP_TABLE_SUFFIX}{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
-    # Crear un diccionario de AttributeDefinitions para comprobación
-    attribute_definitions_dict = {attr['AttributeName']: attr for attr in attribute_definitions}
+    logger.info(f"Creando tabla de respaldo: {backup_table_name}")
 
-    # Verificar que todos los atributos en KeySchema están en AttributeDefinitions
-    for key_name in key_attribute_names:
-        if key_name not in attribute_definitions_dict:
-            logger.info(f"El atributo '{key_name}' no está en AttributeDefinitions, se agregará.")
-            attribute_definitions.append({'AttributeName': key_name, 'AttributeType': 'S'})  # Assuming 'S' (String) type
+    # Derivar el esquema completo desde la tabla original y validarlo antes de crear nada
+    logger.info(f"Obteniendo detalles de la tabla original: {table_name}")
+    spec = build_table_spec(table_name, backup_table_name)
+    validate_table_spec(spec)
 
-    logger.info(f"Definiciones de atributos actualizadas: {attribute_definitions}")
+    logger.info(f"Key Schema: {spec['KeySchema']}")
+    logger.info(f"Attribute Definitions: {spec['AttributeDefinitions']}")
+    logger.info(f"Billing Mode: {spec['BillingMode']}")
+    logger.info(f"Índices globales: {[index['IndexName'] for index in spec.get('GlobalSecondaryIndexes', [])]}")
+    logger.info(f"Índices locales: {[index['IndexName'] for index in spec.get('LocalSecondaryIndexes', [])]}")
 
     # Crear la tabla de respaldo
     logger.info(f"Creando la tabla de respaldo con nombre: {backup_table_name}")
     try:
-        dynamodb_client.create_table(
-            TableName=backup_table_name,
-            KeySchema=key_schema,
-            AttributeDefinitions=attribute_definitions,
-            ProvisionedThroughput={
-                'ReadCapacityUnits': provisioned_throughput['ReadCapacityUnits'],
-                'WriteCapacityUnits': provisioned_throughput['WriteCapacityUnits']
-            }
-        )
+        table_metadata.create_table(**spec)
         logger.info(f"Tabla de respaldo '{backup_table_name}' creada exitosamente")
+
+        # Esperar a que la tabla quede ACTIVE antes de escribir en ella
+        table_metadata.wait_until_active(backup_table_name)
+        logger.info(f"Tabla de respaldo '{backup_table_name}' activa")
     except Exception as e:
         logger.error(f"Error al crear la tabla de respaldo: {str(e)}")
         raise
 
     return backup_table_name
 
-def migrate_data(backup_table_name):
-    logger.info(f"Iniciando migración de datos a la tabla de respaldo: {backup_table_name}")
-
-    # Obtener los ítems de la tabla original
-    logger.info(f"Obteniendo ítems de la tabla original: {TABLE_NAME}")
-    items = get_items(TABLE_NAME)
-    logger.info(f"Total de ítems obtenidos: {len(items)}")
-
-    if not items:
-        logger.info(f"No hay datos para migrar a {backup_table_name}")
-        return
+# Función para escribir ítems en lotes con batch_write_item
+def write_batch(table_name, items, key_names, max_attempts=8, progress=None):
+    """
+    Escribe ítems con batch_write_item, reintentando los UnprocessedItems.
 
-    updated_items = []
+    Dentro de un lote no puede repetirse una clave: si hay duplicados se conserva el último.
 
-    # Migrar datos uno por uno usando put_item
-    for index, record in enumerate(items):
-        calculate_ttl_value = calculate_ttl()
-        calculate_ttl_value_formatter = timestamp_to_string(calculate_ttl_value)
+    :param table_name: Nombre de la tabla destino.
+    :param items: Ítems en formato DynamoDB (como máximo BATCH_WRITE_SIZE).
+    :param key_names: Nombres de los atributos de clave de la tabla destino.
+    :param progress: ProgressTracker donde registrar los reintentos, o None.
+    :return: Lista de los ítems escritos (sin los duplicados descartados).
+    :raises RuntimeError: Si quedan ítems sin procesar tras max_attempts.
+    """
+    unique = list({tuple(str(item[name]) for name in key_names): item for item in items}.values())
+    requests = [{'PutRequest': {'Item': item}} for item in unique]
+    for attempt in range(max_attempts):
+        response = dynamodb_client.batch_write_item(RequestItems={table_name: requests})
+        requests = response.get('UnprocessedItems', {}).get(table_name, [])
+        if not requests:
+            return unique
+        if progress is not None:
+            progress.retry(len(requests))
+        time.sleep(min(2.0, 0.05 * (2 ** attempt)))
+    raise RuntimeError(f"{len(requests)} ítems sin procesar en {table_name} tras {max_attempts} intentos")
 
-        logger.info(f"ttl calculado: {calculate_ttl_value}")
-        logger.info(f"ttl formateado: {calculate_ttl_value_formatter}")
+def migrate_data(backup_table_name, table_name=TABLE_NAME):
+    logger.info(f"Iniciando migración de datos a la tabla de respaldo: {backup_table_name}")
 
-        record[TTL_FIELD_NAME] = {'S': str(calculate_ttl_value)}
-        updated_items.append(record)
+    # Los ítems se leen página por página: la memoria usada no depende del tamaño de la tabla
+    logger.info(f"Recorriendo los ítems de la tabla original: {table_name}")
+    key_names = table_metadata.key_names(backup_table_name)
+    # ItemCount es aproximado (se actualiza cada ~6 horas): sólo se usa para el ETA
+    total = table_metadata.describe(table_name).get('ItemCount') or None
+    # Dentro del loop los logs son diferidos (%s) y muestreados; el avance va en resúmenes periódicos
+    sampled = SampledLogger(logger, every=MIGRATION_LOG_SAMPLE_EVERY)
+    progress = ProgressTracker(f"Migración {table_name}", total=total, log=logger)
+    read = 0
 
-        logger.info(f"Iniciando migración del ítem {index + 1}/{len(items)}")
-        
-        logger.info(f"item {index + 1} info: {record}")
-        
-        # Migrar el ítem a la tabla de respaldo
+    def flush(batch):
+        # Migrar el lote a la tabla de respaldo; sólo se cuentan los ítems realmente escritos
         try:
-            dynamodb_client.put_item(TableName=backup_table_name, Item=record)
-            logger.info(f"Ítem {index + 1}/{len(items)} migrado exitosamente")
+            written = write_batch(backup_table_name, batch, key_names, progress=progress)
         except ClientError as e:
-            logger.error(f"Error al migrar el ítem {index + 1}/{len(items)}: {e.response['Error']['Message']}")
+            logger.error("Error al migrar los ítems hasta %s: %s", read, e.response['Error']['Message'])
             raise
+        sizes = [item_size(item) for item in written]
+        progress.add(len(written), bytes=sum(sizes), capacity=sum(write_capacity_units(size) for size in sizes))
+
+    # Migrar datos en lotes usando las claves reales de la tabla
+    batch = []
+    for page in iter_pages(table_name):
+        for record in page:
+            read += 1
+            calculate_ttl_value = calculate_ttl()
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("ttl calculado: %s (%s)", calculate_ttl_value, timestamp_to_string(calculate_ttl_value))
+
+            record[TTL_FIELD_NAME] = {'N': str(calculate_ttl_value)}
+            batch.append(record)
+
+            sampled.debug('item', "item %s info: %s", read, record)
+
+            if len(batch) == BATCH_WRITE_SIZE:
+                flush(batch)
+                batch = []
+    if batch:
+        flush(batch)
+
+    if not read:
+        logger.info(f"No hay datos para migrar a {backup_table_name}")
+    metrics = progress.finish()
+    logger.info(f"Ítems leídos: {read}, escritos en {backup_table_name}: {metrics['items']}")
 
 
 # Función principal para realizar la copia de seguridad
-def run_backup():
+def run_backup(table_name=TABLE_NAME):
     logger.info("Iniciando el proceso de copia de seguridad")
     try:
-        backup_table_name = create_backup_table()
-        migrate_data(backup_table_name)
-        enable_ttl()
+        backup_table_name = create_backup_table(table_name)
+        migrate_data(backup_table_name, table_name)
+        enable_ttl(backup_table_name)
         logger.info(f"Copia de seguridad completada exitosamente en la tabla: {backup_table_name}")
     except Exception as e:
         logger.error(f"Error en el proceso de copia de seguridad: {str(e)}")
 
 
 if __name__ == '__main__':
+    setup_logging()
+    start_metrics_server()
     run_backup()
@@ -5,15 +5,12 @@ import logging
 from dotenv import load_dotenv
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Para mostrar los logs en la consola
-        logging.FileHandler('dynamodb_operations.log')  # Para almacenar los logs en un archivo
-    ]
-)
+from utils.logging_utils import SampledLogger, setup_logging
+from utils.progress_utils import ProgressTracker, start_metrics_server
+
+# Configuración de logging: consola y archivo, escritos desde una cola en segundo plano
+# (los handlers se configuran con setup_logging al ejecutar el script desde src/ con:
+# python -m no_run.seed_dynamodb)
 logger = logging.getLogger()
 
 # Cargar variables de entorno desde un archivo .env
@@ -32,14 +29,17 @@ AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 # DB
 TABLE_NAME = os.getenv('TABLE_BE_AD_API_POS_PAGOS', 'be-ad-api-pos-pagos')
 TABLE_DATA_JSON_SOURCE_PATH = 'no_run/db_pago.json'
+SEED_LOG_SAMPLE_EVERY = int(os.getenv('SEED_LOG_SAMPLE_EVERY', '100'))
 
-logger.info(f"DYNAMODB_PORT '{DYNAMODB_PORT}'.")
-logger.info(f"DYNAMODB_HOST '{DYNAMODB_HOST}'.")
-logger.info(f"DYNAMODB_ENDPOINT '{DYNAMODB_ENDPOINT}'.")
-logger.info(f"AWS_ACCESS_KEY_ID '{AWS_ACCESS_KEY_ID}'.")
-logger.info(f"AWS_SECRET_ACCESS_KEY '{AWS_SECRET_ACCESS_KEY}'.")
-logger.info(f"AWS_REGION '{AWS_REGION}'.")
-logger.info(f"TABLE_NAME '{TABLE_NAME}'.")
+def log_configuration():
+    """Registra la configuración (se llama después de setup_logging para que no se pierda)."""
+    logger.info("DYNAMODB_PORT '%s'.", DYNAMODB_PORT)
+    logger.info("DYNAMODB_HOST '%s'.", DYNAMODB_HOST)
+    logger.info("DYNAMODB_ENDPOINT '%s'.", DYNAMODB_ENDPOINT)
+    logger.info("AWS_ACCESS_KEY_ID '%s'.", AWS_ACCESS_KEY_ID)
+    logger.info("AWS_SECRET_ACCESS_KEY '%s'.", AWS_SECRET_ACCESS_KEY)
+    logger.info("AWS_REGION '%s'.", AWS_REGION)
+    logger.info("TABLE_NAME '%s'.", TABLE_NAME)
 
 # Nombre de la tabla DynamoDB
 
@@ -92,10 +92,13 @@ def load_json_file(file_path):
 
 def insert_data_to_dynamodb(dynamodb_client, table_name, data):
     """Inserta datos en una tabla DynamoDB."""
+    sampled = SampledLogger(logger, every=SEED_LOG_SAMPLE_EVERY)
+    progress = ProgressTracker(f"Carga {table_name}", total=len(data), log=logger, unit='registros')
     for record in data:
         try:
-            dynamodb_client.put_item(
+            response = dynamodb_client.put_item(
                 TableName=table_name,
+                ReturnConsumedCapacity='TOTAL',
                 Item={
                     'idPago': {'S': record['idPago']},
                     'attendant': {'S': record['attendant']},
@@ -224,16 +227,21 @@ def insert_data_to_dynamodb(dynamodb_client, table_name, data):
                     ]}
                 }
             )
-            logger.info(f"Registro insertado exitosamente: {record['idPago']}")
+            progress.add(capacity=response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+            sampled.info('insert', "Registro insertado exitosamente: %s", record['idPago'])
         except Exception as e:
-            logger.error(f"Error al insertar el registro con idPago '{record['idPago']}': {e}")
+            logger.error("Error al insertar el registro con idPago '%s': %s", record['idPago'], e)
+    progress.finish()
 
 def main():
     file_path = TABLE_DATA_JSON_SOURCE_PATH
+    start_metrics_server()
     dynamodb_client = create_dynamodb_client()
     create_table(dynamodb_client)
     data = load_json_file(file_path)
     insert_data_to_dynamodb(dynamodb_client, TABLE_NAME, data)
 
 if __name__ == '__main__':
+    setup_logging(log_file='dynamodb_operations.log')
+    log_configuration()
     main()
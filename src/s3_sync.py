@@ -0,0 +1,88 @@
+import argparse
+import logging
+import os
+import sys
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from utils.logging_utils import setup_logging
+from utils.progress_utils import PROGRESS_METRICS_PORT, start_metrics_server
+from utils.resilience_utils import AWSServiceError
+from utils.s3_sync_utils import COMPARE_MODES, sync_from_s3, sync_to_s3
+from utils.s3_transfer_utils import S3TransferEngine, transfer_config
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+def parse_s3_url(url):
+    """Convierte 's3://bucket/prefijo' en (bucket, prefijo)."""
+    if not url.startswith('s3://'):
+        return None
+    bucket, _, prefix = url[len('s3://'):].partition('/')
+    return bucket, prefix
+
+def print_result(result, dry_run):
+    action = 'Se transferirían' if dry_run else 'Transferidos'
+    print(f"{action}: {len(result['transferred'])}, sin cambios: {result['skipped']}, "
+          f"{'a eliminar' if dry_run else 'eliminados'}: {len(result['deleted'])}, fallidos: {len(result['failed'])}")
+    for path in result['transferred'] if dry_run else []:
+        print(f"  + {path}")
+    for path in result['deleted'] if dry_run else []:
+        print(f"  - {path}")
+    for path, error in result['failed']:
+        print(f"  ! {path}: {error}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Sincroniza un directorio local con un prefijo de S3 (en cualquier sentido)')
+    parser.add_argument('source', help='Directorio local o s3://bucket/prefijo')
+    parser.add_argument('destination', help='Directorio local o s3://bucket/prefijo')
+    parser.add_argument('--delete', action='store_true', help='Elimina en el destino lo que no existe en el origen')
+    parser.add_argument('--compare', choices=COMPARE_MODES, default='etag', help='Criterio para detectar cambios')
+    parser.add_argument('--dry-run', action='store_true', help='Muestra el plan sin transferir')
+    parser.add_argument('--manifest', default=None, help='Manifiesto de hashes (por defecto, dentro del directorio local)')
+    parser.add_argument('--concurrency', type=int, default=None, help='Hilos de transferencia')
+    parser.add_argument('--part-size-mb', type=float, default=None, help='Tamaño de parte multipart (MB)')
+    parser.add_argument('--max-bandwidth', type=int, default=None, help='Límite agregado de ancho de banda (bytes/s)')
+    parser.add_argument('--metrics-port', type=int, default=PROGRESS_METRICS_PORT,
+                        help='Puerto del endpoint HTTP de avance (0 lo desactiva)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    source, destination = parse_s3_url(args.source), parse_s3_url(args.destination)
+    if (source is None) == (destination is None):
+        print("Uno de los extremos debe ser un directorio local y el otro s3://bucket/prefijo")
+        sys.exit(2)
+
+    config_kwargs = {}
+    if args.concurrency:
+        config_kwargs['max_concurrency'] = args.concurrency
+    if args.part_size_mb:
+        config_kwargs['multipart_chunksize'] = int(args.part_size_mb * 1024 * 1024)
+    if args.max_bandwidth:
+        config_kwargs['max_bandwidth'] = args.max_bandwidth
+    start_metrics_server(args.metrics_port)
+
+    options = {'delete': args.delete, 'compare': args.compare, 'dry_run': args.dry_run, 'manifest_path': args.manifest}
+    try:
+        with S3TransferEngine(config=transfer_config(**config_kwargs), name=f"sync {args.source} -> {args.destination}") as engine:
+            if destination:
+                result = sync_to_s3(args.source, destination[0], destination[1], engine=engine, **options)
+            else:
+                result = sync_from_s3(source[0], source[1], args.destination, engine=engine, **options)
+    except ClientError as e:
+        print(f"Error al listar en S3, no se sincronizó nada: {e.response['Error']['Message']}")
+        sys.exit(1)
+    except AWSServiceError as e:
+        print(f"Error al listar en S3, no se sincronizó nada: {e}")
+        sys.exit(1)
+    print_result(result, args.dry_run)
+    if result['failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    setup_logging(level=os.getenv('LOG_LEVEL', 'INFO'))
+    main()
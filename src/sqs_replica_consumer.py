@@ -0,0 +1,136 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from decimal import Decimal
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from utils.dynamo_utils import describe_table, dynamodb_client
+from utils.logging_utils import setup_logging
+from utils.progress_utils import PROGRESS_METRICS_PORT, start_metrics_server
+from utils.resilience_utils import AWSServiceError, backoff_delay
+from utils.sqs_consumer_utils import (SQS_CONSUMER_POLLERS, SQS_CONSUMER_WORKERS, SQS_MAX_RECEIVE_COUNT,
+                                      SQS_VISIBILITY_TIMEOUT, consume_queue)
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+SQS_QUEUE_URL = os.getenv('SQS_QUEUE_URL', '')
+SQS_DLQ_URL = os.getenv('SQS_DLQ_URL') or None
+DYNAMODB_TABLE_REPLICA = os.getenv('DYNAMODB_TABLE_REPLICA', '')
+
+# Reintentos de los UnprocessedItems de BatchWriteItem
+MAX_WRITE_ATTEMPTS = 5
+
+# Tipos de atributo de DynamoDB (para reconocer ítems ya serializados, como la NewImage del stream)
+ATTRIBUTE_TYPES = {'S', 'N', 'B', 'BOOL', 'NULL', 'M', 'L', 'SS', 'NS', 'BS'}
+
+_serializer = TypeSerializer()
+
+def to_attribute_values(item):
+    """
+    Convierte el cuerpo de un mensaje en un ítem de DynamoDB serializado.
+
+    La Lambda unload-rec publica la NewImage del stream, que ya viene serializada
+    ({'idPago': {'S': '...'}}); un JSON plano se serializa aquí.
+    """
+    if all(isinstance(value, dict) and len(value) == 1 and next(iter(value)) in ATTRIBUTE_TYPES
+           for value in item.values()):
+        return item
+    return {name: _serializer.serialize(value) for name, value in json.loads(json.dumps(item), parse_float=Decimal).items()}
+
+class ReplicaWriter:
+    """
+    Handler de SQSConsumer que escribe cada lote de mensajes en la tabla réplica.
+
+    Cada lote (hasta 10 mensajes) se escribe con un solo BatchWriteItem. Si dos mensajes
+    del lote traen la misma clave se escribe sólo el último, porque BatchWriteItem
+    rechaza claves repetidas. Los ítems que quedan sin procesar tras los reintentos y los
+    mensajes que no son JSON válido se devuelven como fallidos.
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.key_names = [key['AttributeName'] for key in describe_table(table_name).get('KeySchema', [])]
+        if not self.key_names:
+            raise ValueError(f"No se pudo obtener el esquema de claves de la tabla {table_name}")
+
+    def _key(self, item):
+        return tuple(json.dumps(item.get(name), sort_keys=True) for name in self.key_names)
+
+    def __call__(self, messages):
+        failed = []
+        by_key = {}
+        for message in messages:
+            try:
+                item = to_attribute_values(json.loads(message['Body']))
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error("Mensaje %s inválido: %s", message['MessageId'], e)
+                failed.append(message)
+                continue
+            key = self._key(item)
+            previous = by_key.get(key)
+            # El último mensaje con la clave gana; los anteriores se confirman junto con él
+            by_key[key] = (item, (previous[1] if previous else []) + [message])
+        requests = {key: {'PutRequest': {'Item': item}} for key, (item, _) in by_key.items()}
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            if not requests:
+                break
+            if attempt:
+                time.sleep(backoff_delay(attempt))
+            try:
+                response = dynamodb_client.batch_write_item(RequestItems={self.table_name: list(requests.values())})
+            except (ClientError, AWSServiceError) as e:
+                logger.warning("Error al escribir %d ítems en %s: %s", len(requests), self.table_name, e)
+                continue
+            unprocessed = {self._key(request['PutRequest']['Item'])
+                           for request in response.get('UnprocessedItems', {}).get(self.table_name, [])}
+            requests = {key: request for key, request in requests.items() if key in unprocessed}
+        for key in requests:
+            failed.extend(by_key[key][1])
+        return failed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replica en una tabla de DynamoDB los mensajes de una cola SQS')
+    parser.add_argument('--queue-url', default=SQS_QUEUE_URL, help='URL de la cola (por defecto, SQS_QUEUE_URL)')
+    parser.add_argument('--table', default=DYNAMODB_TABLE_REPLICA, help='Tabla réplica (por defecto, DYNAMODB_TABLE_REPLICA)')
+    parser.add_argument('--dlq-url', default=SQS_DLQ_URL, help='URL de la DLQ para mensajes que fallan repetidamente')
+    parser.add_argument('--pollers', type=int, default=SQS_CONSUMER_POLLERS, help='Hilos que reciben mensajes')
+    parser.add_argument('--workers', type=int, default=SQS_CONSUMER_WORKERS, help='Lotes escritos a la vez')
+    parser.add_argument('--visibility-timeout', type=int, default=SQS_VISIBILITY_TIMEOUT,
+                        help='Visibilidad de los mensajes en proceso (segundos)')
+    parser.add_argument('--max-receive-count', type=int, default=SQS_MAX_RECEIVE_COUNT,
+                        help='Entregas tras las cuales un mensaje va a la DLQ')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='Termina tras estos segundos sin mensajes (por defecto, consume indefinidamente)')
+    parser.add_argument('--metrics-port', type=int, default=PROGRESS_METRICS_PORT,
+                        help='Puerto del endpoint HTTP de avance (0 lo desactiva)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not args.queue_url or not args.table:
+        print("Se necesitan la URL de la cola (--queue-url o SQS_QUEUE_URL) y la tabla réplica (--table o DYNAMODB_TABLE_REPLICA)")
+        sys.exit(2)
+    try:
+        writer = ReplicaWriter(args.table)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    start_metrics_server(args.metrics_port)
+    consume_queue(
+        args.queue_url, writer, idle_timeout=args.idle_timeout, pollers=args.pollers, workers=args.workers,
+        visibility_timeout=args.visibility_timeout, max_receive_count=args.max_receive_count,
+        dlq_url=args.dlq_url, name=f"réplica {args.table}")
+
+if __name__ == '__main__':
+    setup_logging(level=os.getenv('LOG_LEVEL', 'INFO'))
+    main()
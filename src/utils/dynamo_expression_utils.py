@@ -0,0 +1,647 @@
+import re
+from decimal import Decimal
+
+# Intérprete de expresiones de DynamoDB (condición, actualización, proyección y clave)
+# sobre ítems en formato de atributos ({'S': ...}, {'N': ...}, {'M': {...}}, ...).
+
+class ExpressionError(ValueError):
+    """Expresión inválida (DynamoDB responde ValidationException)."""
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<name>\#[A-Za-z0-9_]+)
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<number>\d+)
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<symbol><>|<=|>=|[=<>()\[\],.+\-])
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'}
+_UPDATE_CLAUSES = ('SET', 'REMOVE', 'ADD', 'DELETE')
+_COMPARATORS = ('=', '<>', '<', '<=', '>', '>=')
+_CONDITION_FUNCTIONS = ('attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains')
+_SCALAR_TYPES = ('S', 'N', 'B')
+
+def tokenize(expression):
+    """Divide una expresión en tokens (tipo, texto)."""
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if not match or match.end() == position:
+            raise ExpressionError(f"Token inválido en la expresión: {expression[position:position + 10]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'word' and text.upper() in _KEYWORDS:
+            kind, text = 'keyword', text.upper()
+        tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+class ExpressionContext:
+    """
+    ExpressionAttributeNames y ExpressionAttributeValues de una petición.
+
+    Registra qué nombres y valores se usaron, para rechazar los que sobran como hace DynamoDB.
+    """
+
+    def __init__(self, names=None, values=None):
+        self.names = names or {}
+        self.values = values or {}
+        self.used_names = set()
+        self.used_values = set()
+
+    def name(self, alias):
+        if alias not in self.names:
+            raise ExpressionError(f"An expression attribute name used in the document path is not defined; attribute name: {alias}")
+        self.used_names.add(alias)
+        return self.names[alias]
+
+    def value(self, alias):
+        if alias not in self.values:
+            raise ExpressionError(f"An expression attribute value used in expression is not defined; attribute value: {alias}")
+        self.used_values.add(alias)
+        return self.values[alias]
+
+    def check_unused(self):
+        unused_names = set(self.names) - self.used_names
+        if unused_names:
+            raise ExpressionError(f"Value provided in ExpressionAttributeNames unused in expressions: keys: {{{', '.join(sorted(unused_names))}}}")
+        unused_values = set(self.values) - self.used_values
+        if unused_values:
+            raise ExpressionError(f"Value provided in ExpressionAttributeValues unused in expressions: keys: {{{', '.join(sorted(unused_values))}}}")
+
+class _Parser:
+    """Parser descendente recursivo; produce árboles de tuplas."""
+
+    def __init__(self, expression, context):
+        self.tokens = tokenize(expression)
+        self.position = 0
+        self.context = context
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise ExpressionError("Fin inesperado de la expresión")
+        self.position += 1
+        return token
+
+    def expect(self, text):
+        kind, value = self.next()
+        if value != text:
+            raise ExpressionError(f"Se esperaba {text!r} y se encontró {value!r}")
+
+    def accept(self, text):
+        if self.peek()[1] == text:
+            self.position += 1
+            return True
+        return False
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    def finish(self):
+        if not self.done():
+            raise ExpressionError(f"Token inesperado: {self.peek()[1]!r}")
+
+    # Rutas y operandos
+
+    def path(self):
+        kind, text = self.next()
+        if kind == 'name':
+            elements = [self.context.name(text)]
+        elif kind == 'word':
+            elements = [text]
+        else:
+            raise ExpressionError(f"Se esperaba un atributo y se encontró {text!r}")
+        while True:
+            if self.accept('.'):
+                kind, text = self.next()
+                if kind == 'name':
+                    elements.append(self.context.name(text))
+                elif kind == 'word':
+                    elements.append(text)
+                else:
+                    raise ExpressionError(f"Nombre de atributo inválido: {text!r}")
+            elif self.accept('['):
+                kind, text = self.next()
+                if kind != 'number':
+                    raise ExpressionError(f"Índice de lista inválido: {text!r}")
+                elements.append(int(text))
+                self.expect(']')
+            else:
+                return ('path', tuple(elements))
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.next()
+            return ('value', self.context.value(text))
+        if kind == 'word' and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            if text == 'size':
+                node = ('size', self.path())
+            elif text == 'if_not_exists':
+                path = self.path()
+                self.expect(',')
+                node = ('if_not_exists', path, self.operand())
+            elif text == 'list_append':
+                first = self.operand()
+                self.expect(',')
+                node = ('list_append', first, self.operand())
+            else:
+                raise ExpressionError(f"Función inválida como operando: {text}")
+            self.expect(')')
+            return node
+        return self.path()
+
+    # Condiciones
+
+    def condition(self):
+        node = self.conjunction()
+        while self.accept('OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept('AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept('NOT'):
+            return ('not', self.negation())
+        return self.primary()
+
+    def primary(self):
+        kind, text = self.peek()
+        if text == '(':
+            self.next()
+            node = self.condition()
+            self.expect(')')
+            return node
+        if kind == 'word' and text in _CONDITION_FUNCTIONS and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            arguments = [self.path() if text != 'contains' else self.operand()]
+            while self.accept(','):
+                arguments.append(self.operand())
+            self.expect(')')
+            return ('function', text, tuple(arguments))
+        left = self.operand()
+        kind, text = self.next()
+        if text in _COMPARATORS:
+            return ('compare', text, left, self.operand())
+        if text == 'BETWEEN':
+            low = self.operand()
+            self.expect('AND')
+            return ('between', left, low, self.operand())
+        if text == 'IN':
+            self.expect('(')
+            options = [self.operand()]
+            while self.accept(','):
+                options.append(self.operand())
+            self.expect(')')
+            return ('in', left, tuple(options))
+        raise ExpressionError(f"Operador inválido en la condición: {text!r}")
+
+    # Actualizaciones
+
+    def update(self):
+        actions = {clause: [] for clause in _UPDATE_CLAUSES}
+        seen = set()
+        while not self.done():
+            kind, clause = self.next()
+            if clause not in _UPDATE_CLAUSES:
+                raise ExpressionError(f"Se esperaba SET, REMOVE, ADD o DELETE y se encontró {clause!r}")
+            if clause in seen:
+                raise ExpressionError(f"La cláusula {clause} aparece más de una vez")
+            seen.add(clause)
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    value = self.operand()
+                    if self.peek()[1] in ('+', '-'):
+                        operator = self.next()[1]
+                        value = ('arithmetic', operator, value, self.operand())
+                    actions['SET'].append((path, value))
+                elif clause == 'REMOVE':
+                    actions['REMOVE'].append(path)
+                else:
+                    actions[clause].append((path, self.operand()))
+                if not self.accept(','):
+                    break
+        return actions
+
+def parse_condition(expression, context):
+    parser = _Parser(expression, context)
+    node = parser.condition()
+    parser.finish()
+    return node
+
+def parse_update(expression, context):
+    """
+    :return: Diccionario {'SET': [(ruta, valor)], 'REMOVE': [ruta], 'ADD': [...], 'DELETE': [...]}.
+    """
+    parser = _Parser(expression, context)
+    actions = parser.update()
+    parser.finish()
+    return actions
+
+def parse_projection(expression, context):
+    """:return: Lista de rutas (tuplas de elementos)."""
+    parser = _Parser(expression, context)
+    paths = [parser.path()[1]]
+    while parser.accept(','):
+        paths.append(parser.path()[1])
+    parser.finish()
+    return paths
+
+def parse_key_condition(expression, context, hash_name, range_name=None):
+    """
+    Analiza una KeyConditionExpression.
+
+    :return: (valor de la clave HASH, condición de la clave RANGE o None). La condición
+             es ('compare', op, valor), ('between', bajo, alto) o ('begins_with', prefijo).
+    """
+    node = parse_condition(expression, context)
+    conditions = [node[1], node[2]] if node[0] == 'and' else [node]
+    if any(condition[0] == 'and' for condition in conditions):
+        raise ExpressionError("KeyConditionExpression admite como máximo dos condiciones")
+    hash_value = None
+    range_condition = None
+
+    def key_name(operand):
+        if operand[0] != 'path' or len(operand[1]) != 1:
+            raise ExpressionError("KeyConditionExpression sólo admite atributos de clave")
+        return operand[1][0]
+
+    for condition in conditions:
+        if condition[0] == 'compare' and condition[2][0] == 'value' and condition[3][0] == 'path':
+            # ":v = atributo" se normaliza a "atributo = :v"
+            mirrored = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+            condition = ('compare', mirrored.get(condition[1], condition[1]), condition[3], condition[2])
+        if condition[0] == 'compare':
+            name = key_name(condition[2])
+            if condition[3][0] != 'value' or condition[1] == '<>':
+                raise ExpressionError("Condición de clave inválida")
+            if name == hash_name and condition[1] == '=':
+                hash_value = condition[3][1]
+                continue
+            if name == range_name:
+                range_condition = ('compare', condition[1], condition[3][1])
+                continue
+        elif condition[0] == 'between' and key_name(condition[1]) == range_name:
+            range_condition = ('between', condition[2][1], condition[3][1])
+            continue
+        elif condition[0] == 'function' and condition[1] == 'begins_with' and key_name(condition[2][0]) == range_name:
+            range_condition = ('begins_with', condition[2][1][1])
+            continue
+        raise ExpressionError("Query condition missed key schema element")
+    if hash_value is None:
+        raise ExpressionError(f"Query condition missed key schema element: {hash_name}")
+    return hash_value, range_condition
+
+# Valores
+
+def scalar(value):
+    """Convierte un valor escalar (S, N, B) a un valor de Python ordenable."""
+    if 'S' in value:
+        return value['S']
+    if 'N' in value:
+        return Decimal(value['N'])
+    if 'B' in value:
+        return value['B']
+    raise ExpressionError(f"Tipo no escalar: {list(value)}")
+
+def format_number(number):
+    """Formatea un Decimal como lo hace DynamoDB (sin exponente ni ceros de más)."""
+    text = format(number.normalize(), 'f')
+    return '0' if text in ('-0', '0') else text
+
+def value_type(value):
+    return next(iter(value))
+
+def copy_value(value):
+    """Copia profunda de un valor de atributo (más rápida que copy.deepcopy)."""
+    # Los escalares son inmutables: sólo se copian los contenedores
+    if 'M' in value:
+        return {'M': {name: copy_value(item) for name, item in value['M'].items()}}
+    if 'L' in value:
+        return {'L': [copy_value(item) for item in value['L']]}
+    for kind in ('SS', 'NS', 'BS'):
+        if kind in value:
+            return {kind: list(value[kind])}
+    return value.copy()
+
+def copy_item(item):
+    return {name: copy_value(value) for name, value in item.items()}
+
+def values_equal(left, right):
+    if left is None or right is None:
+        return False
+    left_type, right_type = value_type(left), value_type(right)
+    if left_type != right_type:
+        return False
+    if left_type == 'N':
+        return Decimal(left['N']) == Decimal(right['N'])
+    if left_type == 'NS':
+        return {Decimal(number) for number in left['NS']} == {Decimal(number) for number in right['NS']}
+    if left_type in ('SS', 'BS'):
+        return set(left[left_type]) == set(right[right_type])
+    if left_type == 'M':
+        return left['M'].keys() == right['M'].keys() and all(
+            values_equal(value, right['M'][name]) for name, value in left['M'].items())
+    if left_type == 'L':
+        return len(left['L']) == len(right['L']) and all(
+            values_equal(a, b) for a, b in zip(left['L'], right['L']))
+    return left[left_type] == right[right_type]
+
+def resolve(item, path):
+    """Devuelve el valor en la ruta indicada, o None si no existe."""
+    value = item.get(path[0])
+    for element in path[1:]:
+        if value is None:
+            return None
+        if isinstance(element, int):
+            items = value.get('L')
+            value = items[element] if items is not None and element < len(items) else None
+        else:
+            members = value.get('M')
+            value = members.get(element) if members is not None else None
+    return value
+
+def _size(value):
+    kind, inner = next(iter(value.items()))
+    if kind == 'S':
+        return len(inner.encode('utf-8'))
+    if kind == 'B':
+        return len(inner)
+    if kind in ('M', 'L', 'SS', 'NS', 'BS'):
+        return len(inner)
+    raise ExpressionError(f"size() no admite el tipo {kind}")
+
+def evaluate_operand(item, node):
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return resolve(item, node[1])
+    if kind == 'size':
+        value = resolve(item, node[1][1])
+        return None if value is None else {'N': str(_size(value))}
+    if kind == 'if_not_exists':
+        value = resolve(item, node[1][1])
+        return value if value is not None else evaluate_operand(item, node[2])
+    if kind == 'list_append':
+        first, second = evaluate_operand(item, node[1]), evaluate_operand(item, node[2])
+        if first is None or second is None or 'L' not in first or 'L' not in second:
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        return {'L': first['L'] + second['L']}
+    if kind == 'arithmetic':
+        left, right = evaluate_operand(item, node[2]), evaluate_operand(item, node[3])
+        if left is None or right is None:
+            raise ExpressionError("The provided expression refers to an attribute that does not exist in the item")
+        if 'N' not in left or 'N' not in right:
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        result = Decimal(left['N']) + Decimal(right['N']) if node[1] == '+' else Decimal(left['N']) - Decimal(right['N'])
+        return {'N': format_number(result)}
+    raise ExpressionError(f"Operando inválido: {kind}")
+
+def _compare(operator, left, right):
+    if operator == '=':
+        return values_equal(left, right)
+    if operator == '<>':
+        return left is not None and right is not None and not values_equal(left, right)
+    if left is None or right is None:
+        return False
+    left_type, right_type = value_type(left), value_type(right)
+    if left_type != right_type or left_type not in _SCALAR_TYPES:
+        return False
+    a, b = scalar(left), scalar(right)
+    if operator == '<':
+        return a < b
+    if operator == '<=':
+        return a <= b
+    if operator == '>':
+        return a > b
+    return a >= b
+
+def _contains(container, operand):
+    if container is None or operand is None:
+        return False
+    kind = value_type(container)
+    if kind == 'S':
+        return 'S' in operand and operand['S'] in container['S']
+    if kind == 'B':
+        return 'B' in operand and operand['B'] in container['B']
+    if kind == 'L':
+        return any(values_equal(element, operand) for element in container['L'])
+    if kind in ('SS', 'NS', 'BS'):
+        element_type = kind[0]
+        if element_type not in operand:
+            return False
+        if kind == 'NS':
+            return Decimal(operand['N']) in {Decimal(number) for number in container['NS']}
+        return operand[element_type] in container[kind]
+    return False
+
+def evaluate_condition(item, node):
+    """Evalúa una condición sobre un ítem (un ítem inexistente se pasa como {})."""
+    kind = node[0]
+    if kind == 'and':
+        return evaluate_condition(item, node[1]) and evaluate_condition(item, node[2])
+    if kind == 'or':
+        return evaluate_condition(item, node[1]) or evaluate_condition(item, node[2])
+    if kind == 'not':
+        return not evaluate_condition(item, node[1])
+    if kind == 'compare':
+        return _compare(node[1], evaluate_operand(item, node[2]), evaluate_operand(item, node[3]))
+    if kind == 'between':
+        value = evaluate_operand(item, node[1])
+        return _compare('>=', value, evaluate_operand(item, node[2])) and _compare('<=', value, evaluate_operand(item, node[3]))
+    if kind == 'in':
+        value = evaluate_operand(item, node[1])
+        return any(values_equal(value, evaluate_operand(item, option)) for option in node[2])
+    if kind == 'function':
+        name, arguments = node[1], node[2]
+        if name == 'attribute_exists':
+            return resolve(item, arguments[0][1]) is not None
+        if name == 'attribute_not_exists':
+            return resolve(item, arguments[0][1]) is None
+        if name == 'attribute_type':
+            value = resolve(item, arguments[0][1])
+            expected = evaluate_operand(item, arguments[1])
+            return value is not None and value_type(value) == expected.get('S')
+        if name == 'begins_with':
+            value, prefix = resolve(item, arguments[0][1]), evaluate_operand(item, arguments[1])
+            if value is None or prefix is None:
+                return False
+            if 'S' in value and 'S' in prefix:
+                return value['S'].startswith(prefix['S'])
+            if 'B' in value and 'B' in prefix:
+                return value['B'].startswith(prefix['B'])
+            return False
+        if name == 'contains':
+            return _contains(evaluate_operand(item, arguments[0]), evaluate_operand(item, arguments[1]))
+    raise ExpressionError(f"Condición inválida: {kind}")
+
+def matches_range(value, condition):
+    """Evalúa la condición de la clave RANGE de un query sobre un valor escalar ya convertido."""
+    kind = condition[0]
+    if kind == 'compare':
+        target = scalar(condition[2])
+        operator = condition[1]
+        if operator == '=':
+            return value == target
+        if operator == '<':
+            return value < target
+        if operator == '<=':
+            return value <= target
+        if operator == '>':
+            return value > target
+        return value >= target
+    if kind == 'between':
+        return scalar(condition[1]) <= value <= scalar(condition[2])
+    return value.startswith(scalar(condition[1]))
+
+# Aplicación de actualizaciones
+
+def _parent(item, path):
+    """Devuelve (contenedor, elemento final) para asignar o borrar en la ruta."""
+    if len(path) == 1:
+        return item, path[0]
+    parent = resolve(item, path[:-1])
+    element = path[-1]
+    if parent is None or (isinstance(element, int) and 'L' not in parent) or (isinstance(element, str) and 'M' not in parent):
+        raise ExpressionError("The document path provided in the update expression is invalid for update")
+    return (parent['L'] if isinstance(element, int) else parent['M']), element
+
+def _assign(item, path, value):
+    container, element = _parent(item, path)
+    if isinstance(element, int):
+        if element < len(container):
+            container[element] = value
+        else:
+            container.append(value)
+    else:
+        container[element] = value
+
+def _remove(item, path):
+    try:
+        container, element = _parent(item, path)
+    except ExpressionError:
+        return
+    if isinstance(element, int):
+        if element < len(container):
+            del container[element]
+    else:
+        container.pop(element, None)
+
+def _set_union(kind, current, addition):
+    if kind == 'NS':
+        existing = {Decimal(number) for number in current}
+        return current + [number for number in addition if Decimal(number) not in existing]
+    return current + [element for element in addition if element not in current]
+
+def apply_update(item, actions):
+    """
+    Aplica las acciones de parse_update sobre el ítem (lo modifica).
+
+    Los valores de SET se calculan con el ítem anterior a la actualización, como en DynamoDB.
+
+    :return: Conjunto de atributos de primer nivel modificados.
+    """
+    updated = set()
+    values = [(path[1], evaluate_operand(item, value)) for path, value in actions['SET']]
+    for path, value in values:
+        if value is None:
+            raise ExpressionError("The provided expression refers to an attribute that does not exist in the item")
+        _assign(item, path, copy_value(value))
+        updated.add(path[0])
+
+    removals = [path[1] for path in actions['REMOVE']]
+    # Los índices de lista se borran de mayor a menor para no desplazar los siguientes
+    for path in sorted(removals, key=lambda path: [-element if isinstance(element, int) else 0 for element in path]):
+        _remove(item, path)
+        updated.add(path[0])
+
+    for path, operand in actions['ADD']:
+        path = path[1]
+        addition = evaluate_operand(item, operand)
+        current = resolve(item, path)
+        kind = value_type(addition)
+        if kind == 'N':
+            if current is not None and 'N' not in current:
+                raise ExpressionError("An operand in the update expression has an incorrect data type")
+            total = Decimal(addition['N']) + (Decimal(current['N']) if current else 0)
+            _assign(item, path, {'N': format_number(total)})
+        elif kind in ('SS', 'NS', 'BS'):
+            if current is not None and kind not in current:
+                raise ExpressionError("An operand in the update expression has an incorrect data type")
+            _assign(item, path, {kind: _set_union(kind, list(current[kind]) if current else [], addition[kind])})
+        else:
+            raise ExpressionError("Incorrect operand type for operator or function; operator: ADD")
+        updated.add(path[0])
+
+    for path, operand in actions['DELETE']:
+        path = path[1]
+        subtraction = evaluate_operand(item, operand)
+        current = resolve(item, path)
+        kind = value_type(subtraction)
+        if kind not in ('SS', 'NS', 'BS'):
+            raise ExpressionError("Incorrect operand type for operator or function; operator: DELETE")
+        if current is None:
+            continue
+        if kind not in current:
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        if kind == 'NS':
+            removed = {Decimal(number) for number in subtraction['NS']}
+            remaining = [number for number in current['NS'] if Decimal(number) not in removed]
+        else:
+            remaining = [element for element in current[kind] if element not in subtraction[kind]]
+        if remaining:
+            _assign(item, path, {kind: remaining})
+        else:
+            _remove(item, path)
+        updated.add(path[0])
+    return updated
+
+def project(item, paths):
+    """Devuelve sólo las rutas pedidas del ítem (ProjectionExpression)."""
+    result = {}
+    for path in paths:
+        value = resolve(item, path)
+        if value is None:
+            continue
+        if len(path) == 1:
+            result[path[0]] = copy_value(value)
+            continue
+        # Se reconstruye la estructura anidada; los elementos de lista quedan compactados
+        source = item[path[0]]
+        target = result.setdefault(path[0], {value_type(source): {} if 'M' in source else []})
+        for depth, element in enumerate(path[1:], start=1):
+            last = depth == len(path) - 1
+            source = source['M'][element] if isinstance(element, str) else source['L'][element]
+            if isinstance(element, str):
+                members = target['M']
+                if last:
+                    members[element] = copy_value(source)
+                else:
+                    target = members.setdefault(element, {'M': {}} if 'M' in source else {'L': []})
+            else:
+                elements = target['L']
+                if last:
+                    elements.append(copy_value(source))
+                else:
+                    target = {'M': {}} if 'M' in source else {'L': []}
+                    elements.append(target)
+    return result
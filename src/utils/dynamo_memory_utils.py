@@ -0,0 +1,967 @@
+import bisect
+import hashlib
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from botocore.exceptions import ClientError
+
+from utils.dynamo_expression_utils import (
+    ExpressionContext,
+    ExpressionError,
+    apply_update,
+    copy_item,
+    evaluate_condition,
+    matches_range,
+    parse_condition,
+    parse_key_condition,
+    parse_projection,
+    parse_update,
+    project,
+    scalar,
+)
+from utils.item_size_utils import MAX_ITEM_SIZE_BYTES, item_size, read_capacity_units, write_capacity_units
+
+# Límites de la API de DynamoDB que respeta el fake
+MAX_PAGE_BYTES = 1024 * 1024
+MAX_BATCH_WRITE = 25
+MAX_BATCH_GET = 100
+MAX_TRANSACTION_ITEMS = 100
+FAKE_ACCOUNT_ID = '000000000000'
+FAKE_REGION = 'us-east-1'
+
+_TOKEN_SPACE = 2 ** 64
+
+def _error(code, message, operation, **extra):
+    """Crea el ClientError que devolvería DynamoDB (subclase registrada en client.exceptions)."""
+    response = {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': 400}}
+    response.update(extra)
+    return _EXCEPTIONS.get(code, ClientError)(response, operation)
+
+_EXCEPTIONS = {
+    code: type(code, (ClientError,), {})
+    for code in (
+        'ConditionalCheckFailedException', 'ResourceNotFoundException', 'ResourceInUseException',
+        'ValidationException', 'TransactionCanceledException', 'IdempotentParameterMismatchException',
+        'ProvisionedThroughputExceededException', 'ThrottlingException', 'TransactionConflictException'
+    )
+}
+
+class _Exceptions:
+    """Equivalente a client.exceptions de boto3 para los errores que produce el fake."""
+
+    ClientError = ClientError
+
+    def __init__(self):
+        for code, exception in _EXCEPTIONS.items():
+            setattr(self, code, exception)
+
+def _token(hash_value):
+    """Posición de una partición en el espacio de claves (como el hash de partición de DynamoDB)."""
+    raw = hash_value if isinstance(hash_value, bytes) else str(hash_value).encode('utf-8')
+    return int.from_bytes(hashlib.md5(raw).digest()[:8], 'big')
+
+class _KeySchema:
+    """Nombres y tipos de las claves HASH y RANGE de una tabla o índice."""
+
+    def __init__(self, key_schema, attribute_types):
+        self.hash_name = next(key['AttributeName'] for key in key_schema if key['KeyType'] == 'HASH')
+        ranges = [key['AttributeName'] for key in key_schema if key['KeyType'] == 'RANGE']
+        self.range_name = ranges[0] if ranges else None
+        self.hash_type = attribute_types[self.hash_name]
+        self.range_type = attribute_types[self.range_name] if self.range_name else None
+        self.names = (self.hash_name,) + ((self.range_name,) if self.range_name else ())
+
+    def values(self, item):
+        """
+        Devuelve (hash, range) convertidos a valores ordenables, o None si el ítem no tiene
+        las claves con el tipo correcto (ítems que no entran en un índice disperso).
+        """
+        hash_value = item.get(self.hash_name)
+        if hash_value is None or self.hash_type not in hash_value:
+            return None
+        range_raw = None
+        if self.range_name:
+            range_value = item.get(self.range_name)
+            if range_value is None or self.range_type not in range_value:
+                return None
+            range_raw = scalar(range_value)
+        return scalar(hash_value), range_raw
+
+class _Index:
+    """
+    Índice ordenado de una tabla, GSI o LSI.
+
+    Guarda por partición la lista ordenada de claves RANGE (para query con bisect) y una
+    lista global ordenada por token de partición (para scan segmentado y paginado).
+    """
+
+    def __init__(self, name, schema, projection=None):
+        self.name = name
+        self.schema = schema
+        self.projection = projection or {'ProjectionType': 'ALL'}
+        self.partitions = {}
+        self.ordered = []
+        self.count = 0
+
+    def entry(self, item, primary_key):
+        values = self.schema.values(item)
+        if values is None:
+            return None
+        hash_value, range_value = values
+        return (_token(hash_value), hash_value, range_value, primary_key)
+
+    def add(self, item, primary_key):
+        entry = self.entry(item, primary_key)
+        if entry is None:
+            return
+        bisect.insort(self.ordered, entry)
+        bisect.insort(self.partitions.setdefault(entry[1], []), (entry[2], primary_key))
+        self.count += 1
+
+    def remove(self, item, primary_key):
+        entry = self.entry(item, primary_key)
+        if entry is None:
+            return
+        position = bisect.bisect_left(self.ordered, entry)
+        if position < len(self.ordered) and self.ordered[position] == entry:
+            del self.ordered[position]
+            self.count -= 1
+        partition = self.partitions.get(entry[1])
+        if partition is not None:
+            position = bisect.bisect_left(partition, (entry[2], primary_key))
+            if position < len(partition) and partition[position] == (entry[2], primary_key):
+                del partition[position]
+            if not partition:
+                del self.partitions[entry[1]]
+
+    def scan(self, segment, total_segments, start_entry=None):
+        low = (segment * _TOKEN_SPACE // total_segments,)
+        high = ((segment + 1) * _TOKEN_SPACE // total_segments,)
+        position = bisect.bisect_left(self.ordered, low)
+        if start_entry is not None:
+            position = max(position, bisect.bisect_right(self.ordered, start_entry))
+        end = bisect.bisect_left(self.ordered, high)
+        for position in range(position, end):
+            yield self.ordered[position][3]
+
+    def query(self, hash_value, range_condition, forward=True, start_entry=None):
+        partition = self.partitions.get(hash_value, [])
+        low, high = 0, len(partition)
+        if range_condition is not None:
+            kind = range_condition[0]
+            if kind == 'between':
+                low = bisect.bisect_left(partition, (scalar(range_condition[1]),))
+                high = bisect.bisect_right(partition, (scalar(range_condition[2]), _MAX))
+            elif kind == 'compare':
+                target = scalar(range_condition[2])
+                operator = range_condition[1]
+                if operator in ('=', '>='):
+                    low = bisect.bisect_left(partition, (target,))
+                if operator == '>':
+                    low = bisect.bisect_right(partition, (target, _MAX))
+                if operator in ('=', '<='):
+                    high = bisect.bisect_right(partition, (target, _MAX))
+                if operator == '<':
+                    high = bisect.bisect_left(partition, (target,))
+            else:
+                low = bisect.bisect_left(partition, (scalar(range_condition[1]),))
+        if start_entry is not None:
+            if forward:
+                low = max(low, bisect.bisect_right(partition, start_entry))
+            else:
+                high = min(high, bisect.bisect_left(partition, start_entry))
+        positions = range(low, high) if forward else range(high - 1, low - 1, -1)
+        for position in positions:
+            range_value, primary_key = partition[position]
+            if range_condition is not None and range_condition[0] == 'begins_with' \
+                    and not matches_range(range_value, range_condition):
+                if forward:
+                    break
+                continue
+            yield primary_key
+
+class _Max:
+    """Centinela mayor que cualquier clave primaria, para los límites superiores de bisect."""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, _Max)
+
+_MAX = _Max()
+
+class _Table:
+    def __init__(self, description):
+        self.name = description['TableName']
+        self.description = description
+        attribute_types = {
+            attribute['AttributeName']: attribute['AttributeType'] for attribute in description['AttributeDefinitions']
+        }
+        self.schema = _KeySchema(description['KeySchema'], attribute_types)
+        self.items = {}
+        self.primary = _Index(None, self.schema)
+        self.indexes = {}
+        for index in description.get('GlobalSecondaryIndexes', []) + description.get('LocalSecondaryIndexes', []):
+            self.indexes[index['IndexName']] = _Index(
+                index['IndexName'], _KeySchema(index['KeySchema'], attribute_types), index['Projection'])
+        self.ttl_attribute = None
+        self.stream = []
+        self.listeners = []
+        self.sizes = {}
+        self.size_bytes = 0
+
+    def primary_key(self, item):
+        return self.schema.values(item)
+
+    def store(self, primary_key, item):
+        old = self.items.get(primary_key)
+        if old is not None:
+            self.unstore(primary_key)
+        self.items[primary_key] = item
+        self.sizes[primary_key] = item_size(item)
+        self.size_bytes += self.sizes[primary_key]
+        self.primary.add(item, primary_key)
+        for index in self.indexes.values():
+            index.add(item, primary_key)
+        return old
+
+    def unstore(self, primary_key):
+        item = self.items.pop(primary_key, None)
+        if item is None:
+            return None
+        self.size_bytes -= self.sizes.pop(primary_key)
+        self.primary.remove(item, primary_key)
+        for index in self.indexes.values():
+            index.remove(item, primary_key)
+        return item
+
+class InMemoryDynamoDBClient:
+    """
+    Cliente de DynamoDB en memoria con la misma interfaz que boto3.client('dynamodb').
+
+    Pensado para pruebas y micro-benchmarks sin el contenedor dynamodb-local: soporta
+    tablas con clave HASH o HASH+RANGE, GSI y LSI (con proyección), expresiones de
+    condición, actualización, proyección y filtro, query y scan paginados (límite de 1 MB y
+    segmentos), operaciones batch, transacciones, TTL y streams. Los errores son
+    ClientError con los mismos códigos que DynamoDB.
+
+    Diferencias con el servicio: las tablas e índices quedan ACTIVE al instante, las
+    lecturas son siempre consistentes y el TTL sólo borra al llamar a expire_ttl().
+    """
+
+    def __init__(self, region_name=FAKE_REGION):
+        self.region_name = region_name
+        self.exceptions = _Exceptions()
+        self._tables = {}
+        self._transaction_tokens = {}
+        self._sequence = 0
+        self._ttl_sweep = False
+        self._lock = threading.RLock()
+
+    # Utilidades internas
+
+    def _table(self, table_name, operation):
+        table = self._tables.get(table_name)
+        if table is None:
+            raise _error('ResourceNotFoundException', 'Requested resource not found', operation)
+        return table
+
+    def _key(self, table, key, operation):
+        if set(key) != set(table.schema.names):
+            raise _error('ValidationException', 'The provided key element does not match the schema', operation)
+        primary_key = table.primary_key(key)
+        if primary_key is None:
+            raise _error('ValidationException', 'The provided key element does not match the schema', operation)
+        return primary_key
+
+    def _validate_item(self, table, item, operation):
+        for name, kind in ((table.schema.hash_name, table.schema.hash_type), (table.schema.range_name, table.schema.range_type)):
+            if name is None:
+                continue
+            value = item.get(name)
+            if value is None:
+                raise _error('ValidationException',
+                             f'One or more parameter values were invalid: Missing the key {name} in the item', operation)
+            if kind not in value:
+                raise _error('ValidationException',
+                             f'One or more parameter values were invalid: Type mismatch for key {name} expected: {kind} actual: {next(iter(value))}',
+                             operation)
+            if value[kind] in ('', b''):
+                raise _error('ValidationException',
+                             f'One or more parameter values are not valid. The AttributeValue for a key attribute cannot contain an empty string value. Key: {name}',
+                             operation)
+        if item_size(item) > MAX_ITEM_SIZE_BYTES:
+            raise _error('ValidationException', 'Item size has exceeded the maximum allowed size', operation)
+
+    def _context(self, request):
+        return ExpressionContext(request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'))
+
+    def _condition(self, request, context, operation):
+        expression = request.get('ConditionExpression')
+        return parse_condition(expression, context) if expression else None
+
+    def _check(self, condition, item, request, operation):
+        if condition is not None and not evaluate_condition(item or {}, condition):
+            extra = {}
+            if item is not None and request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD':
+                extra['Item'] = copy_item(item)
+            raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation, **extra)
+
+    def _capacity(self, request, table_name, units):
+        if request.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            return {'ConsumedCapacity': {'TableName': table_name, 'CapacityUnits': float(units)}}
+        return {}
+
+    def _run(self, operation, function, request):
+        with self._lock:
+            try:
+                return function(request)
+            except ExpressionError as e:
+                raise _error('ValidationException', f'Invalid expression: {e}', operation)
+
+    def _emit(self, table, event_name, old, new):
+        """Registra un evento en el stream de la tabla y lo entrega a los suscriptores."""
+        stream = table.description.get('StreamSpecification') or {}
+        if not stream.get('StreamEnabled'):
+            return
+        self._sequence += 1
+        view_type = stream.get('StreamViewType', 'NEW_AND_OLD_IMAGES')
+        source = new if new is not None else old
+        record = {
+            'eventID': uuid.uuid4().hex,
+            'eventName': event_name,
+            'eventVersion': '1.1',
+            'eventSource': 'aws:dynamodb',
+            'awsRegion': self.region_name,
+            'dynamodb': {
+                'ApproximateCreationDateTime': time.time(),
+                'Keys': {name: dict(source[name]) for name in table.schema.names},
+                'SequenceNumber': f"{self._sequence:021d}",
+                'SizeBytes': item_size(source),
+                'StreamViewType': view_type
+            },
+            'eventSourceARN': table.description['LatestStreamArn']
+        }
+        if new is not None and view_type in ('NEW_IMAGE', 'NEW_AND_OLD_IMAGES'):
+            record['dynamodb']['NewImage'] = copy_item(new)
+        if old is not None and view_type in ('OLD_IMAGE', 'NEW_AND_OLD_IMAGES'):
+            record['dynamodb']['OldImage'] = copy_item(old)
+        if event_name == 'REMOVE' and self._ttl_sweep:
+            record['userIdentity'] = {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'}
+        table.stream.append(record)
+        for listener in list(table.listeners):
+            listener({'Records': [record]})
+
+    def _write(self, table, primary_key, new):
+        """Guarda (o borra si new es None) un ítem y emite el evento de stream."""
+        if new is None:
+            old = table.unstore(primary_key)
+            if old is not None:
+                self._emit(table, 'REMOVE', old, None)
+            return old
+        old = table.store(primary_key, new)
+        self._emit(table, 'MODIFY' if old is not None else 'INSERT', old, new)
+        return old
+
+    def _project_index(self, table, index, item):
+        projection = index.projection if index is not None else {'ProjectionType': 'ALL'}
+        if projection['ProjectionType'] == 'ALL':
+            return item
+        names = set(table.schema.names) | set(index.schema.names)
+        if projection['ProjectionType'] == 'INCLUDE':
+            names |= set(projection.get('NonKeyAttributes', []))
+        return {name: value for name, value in item.items() if name in names}
+
+    # Tablas
+
+    def _describe(self, table):
+        description = dict(table.description)
+        description['ItemCount'] = len(table.items)
+        description['TableSizeBytes'] = table.size_bytes
+        for kind in ('GlobalSecondaryIndexes', 'LocalSecondaryIndexes'):
+            if kind in description:
+                description[kind] = [
+                    dict(index, ItemCount=table.indexes[index['IndexName']].count,
+                         IndexSizeBytes=sum(table.sizes[entry[3]] for entry in table.indexes[index['IndexName']].ordered))
+                    for index in description[kind]
+                ]
+        return copy_description(description)
+
+    def create_table(self, **request):
+        def run(request):
+            name = request['TableName']
+            if name in self._tables:
+                raise _error('ResourceInUseException', f'Table already exists: {name}', 'CreateTable')
+            billing_mode = request.get('BillingMode', 'PROVISIONED')
+            if billing_mode == 'PROVISIONED' and 'ProvisionedThroughput' not in request:
+                raise _error('ValidationException', 'No provisioned throughput specified for the table', 'CreateTable')
+            defined = {attribute['AttributeName'] for attribute in request['AttributeDefinitions']}
+            key_schemas = [request['KeySchema']] + [
+                index['KeySchema'] for index in request.get('GlobalSecondaryIndexes', []) + request.get('LocalSecondaryIndexes', [])]
+            for key_schema in key_schemas:
+                for key in key_schema:
+                    if key['KeyType'] not in ('HASH', 'RANGE'):
+                        raise _error('ValidationException', f"Invalid KeyType: {key['KeyType']}", 'CreateTable')
+                    if key['AttributeName'] not in defined:
+                        raise _error('ValidationException',
+                                     'One or more parameter values were invalid: Some index key attributes are not defined in AttributeDefinitions',
+                                     'CreateTable')
+            arn = f"arn:aws:dynamodb:{self.region_name}:{FAKE_ACCOUNT_ID}:table/{name}"
+            throughput = request.get('ProvisionedThroughput', {'ReadCapacityUnits': 0, 'WriteCapacityUnits': 0})
+            description = {
+                'TableName': name,
+                'TableArn': arn,
+                'TableId': str(uuid.uuid4()),
+                'TableStatus': 'ACTIVE',
+                'CreationDateTime': datetime.now(timezone.utc),
+                'KeySchema': [dict(key) for key in request['KeySchema']],
+                'AttributeDefinitions': [dict(attribute) for attribute in request['AttributeDefinitions']],
+                'BillingModeSummary': {'BillingMode': billing_mode},
+                'ProvisionedThroughput': dict(throughput, NumberOfDecreasesToday=0)
+            }
+            if request.get('GlobalSecondaryIndexes'):
+                description['GlobalSecondaryIndexes'] = [
+                    self._index_description(index, arn, billing_mode) for index in request['GlobalSecondaryIndexes']]
+            if request.get('LocalSecondaryIndexes'):
+                description['LocalSecondaryIndexes'] = [
+                    {'IndexName': index['IndexName'], 'KeySchema': index['KeySchema'], 'Projection': index['Projection'],
+                     'IndexArn': f"{arn}/index/{index['IndexName']}"}
+                    for index in request['LocalSecondaryIndexes']]
+            self._set_stream(description, request.get('StreamSpecification'))
+            table = _Table(description)
+            self._tables[name] = table
+            return {'TableDescription': self._describe(table)}
+        return self._run('CreateTable', run, request)
+
+    def _index_description(self, index, arn, billing_mode):
+        description = {
+            'IndexName': index['IndexName'],
+            'KeySchema': index['KeySchema'],
+            'Projection': index['Projection'],
+            'IndexStatus': 'ACTIVE',
+            'IndexArn': f"{arn}/index/{index['IndexName']}"
+        }
+        throughput = index.get('ProvisionedThroughput') if billing_mode == 'PROVISIONED' else None
+        description['ProvisionedThroughput'] = dict(
+            throughput or {'ReadCapacityUnits': 0, 'WriteCapacityUnits': 0}, NumberOfDecreasesToday=0)
+        return description
+
+    def _set_stream(self, description, specification):
+        if not specification:
+            return
+        if specification.get('StreamEnabled'):
+            label = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+            description['StreamSpecification'] = {
+                'StreamEnabled': True, 'StreamViewType': specification.get('StreamViewType', 'NEW_AND_OLD_IMAGES')}
+            description['LatestStreamLabel'] = label
+            description['LatestStreamArn'] = f"{description['TableArn']}/stream/{label}"
+        else:
+            description['StreamSpecification'] = {'StreamEnabled': False}
+
+    def describe_table(self, **request):
+        return self._run('DescribeTable', lambda request: {
+            'Table': self._describe(self._table(request['TableName'], 'DescribeTable'))}, request)
+
+    def list_tables(self, **request):
+        def run(request):
+            names = sorted(self._tables)
+            start = request.get('ExclusiveStartTableName')
+            if start:
+                names = names[bisect.bisect_right(names, start):]
+            limit = request.get('Limit', 100)
+            response = {'TableNames': names[:limit]}
+            if len(names) > limit:
+                response['LastEvaluatedTableName'] = names[limit - 1]
+            return response
+        return self._run('ListTables', run, request)
+
+    def delete_table(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'DeleteTable')
+            description = self._describe(table)
+            description['TableStatus'] = 'DELETING'
+            del self._tables[table.name]
+            return {'TableDescription': description}
+        return self._run('DeleteTable', run, request)
+
+    def update_table(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'UpdateTable')
+            description = table.description
+            attribute_types = {
+                attribute['AttributeName']: attribute['AttributeType'] for attribute in description['AttributeDefinitions']}
+            for attribute in request.get('AttributeDefinitions', []):
+                if attribute['AttributeName'] not in attribute_types:
+                    description['AttributeDefinitions'].append(dict(attribute))
+                attribute_types[attribute['AttributeName']] = attribute['AttributeType']
+            if 'BillingMode' in request:
+                description['BillingModeSummary'] = {'BillingMode': request['BillingMode']}
+            if 'ProvisionedThroughput' in request:
+                description['ProvisionedThroughput'] = dict(request['ProvisionedThroughput'], NumberOfDecreasesToday=0)
+            if 'StreamSpecification' in request:
+                self._set_stream(description, request['StreamSpecification'])
+            billing_mode = description['BillingModeSummary']['BillingMode']
+            for update in request.get('GlobalSecondaryIndexUpdates', []):
+                if 'Create' in update:
+                    created = update['Create']
+                    if created['IndexName'] in table.indexes:
+                        raise _error('ValidationException', f"Index already exists: {created['IndexName']}", 'UpdateTable')
+                    index = _Index(created['IndexName'], _KeySchema(created['KeySchema'], attribute_types), created['Projection'])
+                    # Backfill del índice nuevo con los ítems existentes
+                    for primary_key, item in table.items.items():
+                        index.add(item, primary_key)
+                    table.indexes[index.name] = index
+                    description.setdefault('GlobalSecondaryIndexes', []).append(
+                        self._index_description(created, description['TableArn'], billing_mode))
+                elif 'Delete' in update:
+                    name = update['Delete']['IndexName']
+                    if name not in table.indexes:
+                        raise _error('ResourceNotFoundException', f'Requested resource not found: Index: {name}', 'UpdateTable')
+                    del table.indexes[name]
+                    description['GlobalSecondaryIndexes'] = [
+                        index for index in description['GlobalSecondaryIndexes'] if index['IndexName'] != name]
+                    if not description['GlobalSecondaryIndexes']:
+                        del description['GlobalSecondaryIndexes']
+            return {'TableDescription': self._describe(table)}
+        return self._run('UpdateTable', run, request)
+
+    # TTL
+
+    def update_time_to_live(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'UpdateTimeToLive')
+            specification = request['TimeToLiveSpecification']
+            table.ttl_attribute = specification['AttributeName'] if specification['Enabled'] else None
+            return {'TimeToLiveSpecification': dict(specification)}
+        return self._run('UpdateTimeToLive', run, request)
+
+    def describe_time_to_live(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'DescribeTimeToLive')
+            if table.ttl_attribute is None:
+                return {'TimeToLiveDescription': {'TimeToLiveStatus': 'DISABLED'}}
+            return {'TimeToLiveDescription': {'TimeToLiveStatus': 'ENABLED', 'AttributeName': table.ttl_attribute}}
+        return self._run('DescribeTimeToLive', run, request)
+
+    def expire_ttl(self, now=None, table_name=None):
+        """
+        Borra los ítems vencidos según el atributo TTL (DynamoDB lo hace en segundo plano).
+
+        Sólo se consideran valores numéricos en segundos desde la época; los eventos de
+        stream llevan userIdentity de servicio, como los borrados reales por TTL.
+
+        :param now: Instante de referencia (por defecto, ahora).
+        :param table_name: Tabla a revisar, o None para todas.
+        :return: Cantidad de ítems borrados.
+        """
+        now = Decimal(str(time.time() if now is None else now))
+        expired = 0
+        with self._lock:
+            tables = [self._tables[table_name]] if table_name else list(self._tables.values())
+            self._ttl_sweep = True
+            try:
+                for table in tables:
+                    if table.ttl_attribute is None:
+                        continue
+                    for primary_key, item in list(table.items.items()):
+                        value = item.get(table.ttl_attribute)
+                        if value is not None and 'N' in value and Decimal(value['N']) <= now:
+                            self._write(table, primary_key, None)
+                            expired += 1
+            finally:
+                self._ttl_sweep = False
+        return expired
+
+    # Streams
+
+    def get_stream_records(self, table_name, after_sequence=None):
+        """
+        Devuelve los eventos del stream de una tabla en el formato de los eventos de Lambda.
+
+        :param table_name: Nombre de la tabla.
+        :param after_sequence: SequenceNumber desde el cual leer (exclusivo), o None.
+        :return: Lista de registros.
+        """
+        with self._lock:
+            records = self._table(table_name, 'GetRecords').stream
+            if after_sequence is not None:
+                records = [record for record in records if record['dynamodb']['SequenceNumber'] > after_sequence]
+            return [dict(record) for record in records]
+
+    def subscribe_stream(self, table_name, handler):
+        """
+        Entrega cada evento del stream a handler({'Records': [registro]}) al momento de la
+        escritura, como un trigger de Lambda con tamaño de lote 1.
+
+        :param table_name: Nombre de la tabla.
+        :param handler: Función que recibe el evento.
+        """
+        with self._lock:
+            self._table(table_name, 'Subscribe').listeners.append(handler)
+
+    # Ítems
+
+    def _put(self, request, operation):
+        table = self._table(request['TableName'], operation)
+        item = request['Item']
+        self._validate_item(table, item, operation)
+        context = self._context(request)
+        condition = self._condition(request, context, operation)
+        context.check_unused()
+        primary_key = table.primary_key(item)
+        old = table.items.get(primary_key)
+        self._check(condition, old, request, operation)
+        return table, primary_key, old, copy_item(item)
+
+    def put_item(self, **request):
+        def run(request):
+            table, primary_key, old, new = self._put(request, 'PutItem')
+            self._write(table, primary_key, new)
+            response = self._capacity(request, table.name, write_capacity_units(max(item_size(new), item_size(old) if old else 0)))
+            if old is not None and request.get('ReturnValues') == 'ALL_OLD':
+                response['Attributes'] = copy_item(old)
+            return response
+        return self._run('PutItem', run, request)
+
+    def get_item(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'GetItem')
+            primary_key = self._key(table, request['Key'], 'GetItem')
+            context = self._context(request)
+            paths = parse_projection(request['ProjectionExpression'], context) if request.get('ProjectionExpression') else None
+            context.check_unused()
+            item = table.items.get(primary_key)
+            units = read_capacity_units(table.sizes.get(primary_key, 0), request.get('ConsistentRead', False))
+            response = self._capacity(request, table.name, units)
+            if item is not None:
+                response['Item'] = project(item, paths) if paths else copy_item(item)
+            return response
+        return self._run('GetItem', run, request)
+
+    def _delete(self, request, operation):
+        table = self._table(request['TableName'], operation)
+        primary_key = self._key(table, request['Key'], operation)
+        context = self._context(request)
+        condition = self._condition(request, context, operation)
+        context.check_unused()
+        old = table.items.get(primary_key)
+        self._check(condition, old, request, operation)
+        return table, primary_key, old
+
+    def delete_item(self, **request):
+        def run(request):
+            table, primary_key, old = self._delete(request, 'DeleteItem')
+            self._write(table, primary_key, None)
+            response = self._capacity(request, table.name, write_capacity_units(item_size(old) if old else 0))
+            if old is not None and request.get('ReturnValues') == 'ALL_OLD':
+                response['Attributes'] = copy_item(old)
+            return response
+        return self._run('DeleteItem', run, request)
+
+    def _update(self, request, operation):
+        table = self._table(request['TableName'], operation)
+        key = request['Key']
+        primary_key = self._key(table, key, operation)
+        context = self._context(request)
+        condition = self._condition(request, context, operation)
+        actions = parse_update(request['UpdateExpression'], context) if request.get('UpdateExpression') else None
+        context.check_unused()
+        old = table.items.get(primary_key)
+        self._check(condition, old, request, operation)
+        new = copy_item(old) if old is not None else {name: dict(value) for name, value in key.items()}
+        updated = set()
+        if actions:
+            updated = apply_update(new, actions)
+            changed_keys = updated & set(table.schema.names)
+            if changed_keys:
+                raise _error('ValidationException',
+                             f'One or more parameter values were invalid: Cannot update attribute {sorted(changed_keys)[0]}. This attribute is part of the key',
+                             operation)
+        self._validate_item(table, new, operation)
+        return table, primary_key, old, new, updated
+
+    def update_item(self, **request):
+        def run(request):
+            table, primary_key, old, new, updated = self._update(request, 'UpdateItem')
+            self._write(table, primary_key, new)
+            response = self._capacity(request, table.name, write_capacity_units(max(item_size(new), item_size(old) if old else 0)))
+            return_values = request.get('ReturnValues', 'NONE')
+            if return_values == 'ALL_NEW':
+                response['Attributes'] = copy_item(new)
+            elif return_values == 'ALL_OLD' and old is not None:
+                response['Attributes'] = copy_item(old)
+            elif return_values == 'UPDATED_NEW':
+                response['Attributes'] = copy_item({name: new[name] for name in updated if name in new})
+            elif return_values == 'UPDATED_OLD' and old is not None:
+                response['Attributes'] = copy_item({name: old[name] for name in updated if name in old})
+            return response
+        return self._run('UpdateItem', run, request)
+
+    # Query y scan
+
+    def _read_expressions(self, request):
+        """Interpreta FilterExpression y ProjectionExpression de un query o scan."""
+        context = self._context(request)
+        filter_node = parse_condition(request['FilterExpression'], context) if request.get('FilterExpression') else None
+        paths = parse_projection(request['ProjectionExpression'], context) if request.get('ProjectionExpression') else None
+        return context, filter_node, paths
+
+    def _page(self, request, table, index, keys, context, filter_node, paths):
+        """Arma una página de query o scan a partir de un iterador de claves primarias."""
+        limit = request.get('Limit')
+        select = request.get('Select', 'ALL_ATTRIBUTES')
+        items = []
+        scanned = 0
+        scanned_bytes = 0
+        last = None
+        keys = iter(keys)
+        for primary_key in keys:
+            item = table.items[primary_key]
+            scanned += 1
+            scanned_bytes += table.sizes[primary_key]
+            visible = self._project_index(table, index, item)
+            if filter_node is None or evaluate_condition(visible, filter_node):
+                if select != 'COUNT':
+                    items.append(project(visible, paths) if paths else copy_item(visible))
+                else:
+                    items.append(None)
+            if (limit is not None and scanned >= limit) or scanned_bytes >= MAX_PAGE_BYTES:
+                if next(keys, None) is not None:
+                    last = self._last_key(table, index, item)
+                break
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if select != 'COUNT':
+            response['Items'] = items
+        if last is not None:
+            response['LastEvaluatedKey'] = last
+        units = read_capacity_units(scanned_bytes, request.get('ConsistentRead', False))
+        response.update(self._capacity(request, table.name, units))
+        return response
+
+    def _last_key(self, table, index, item):
+        names = set(table.schema.names) | (set(index.schema.names) if index is not None else set())
+        return {name: dict(item[name]) for name in names}
+
+    def _start_entry(self, table, index, request):
+        start = request.get('ExclusiveStartKey')
+        if not start:
+            return None
+        primary_key = table.primary_key(start)
+        source = index or table.primary
+        values = source.schema.values(start)
+        if primary_key is None or values is None:
+            raise _error('ValidationException', 'The provided starting key is invalid', 'Query')
+        return values, primary_key
+
+    def _source(self, table, request, operation):
+        name = request.get('IndexName')
+        if name is None:
+            return None
+        index = table.indexes.get(name)
+        if index is None:
+            raise _error('ValidationException',
+                         f'The table does not have the specified index: {name}', operation)
+        return index
+
+    def query(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'Query')
+            index = self._source(table, request, 'Query')
+            source = index or table.primary
+            context, filter_node, paths = self._read_expressions(request)
+            hash_value, range_condition = parse_key_condition(
+                request['KeyConditionExpression'], context, source.schema.hash_name, source.schema.range_name)
+            context.check_unused()
+            if source.schema.hash_type not in hash_value:
+                raise _error('ValidationException', 'One or more parameter values were invalid: Condition parameter type does not match schema type', 'Query')
+            start = self._start_entry(table, index, request)
+            start_entry = (start[0][1], start[1]) if start else None
+            keys = source.query(scalar(hash_value), range_condition, request.get('ScanIndexForward', True), start_entry)
+            return self._page(request, table, index, keys, context, filter_node, paths)
+        return self._run('Query', run, request)
+
+    def scan(self, **request):
+        def run(request):
+            table = self._table(request['TableName'], 'Scan')
+            index = self._source(table, request, 'Scan')
+            source = index or table.primary
+            context, filter_node, paths = self._read_expressions(request)
+            context.check_unused()
+            total_segments = request.get('TotalSegments', 1)
+            segment = request.get('Segment', 0)
+            if not 0 <= segment < total_segments:
+                raise _error('ValidationException', 'The Segment parameter must be less than TotalSegments', 'Scan')
+            start = self._start_entry(table, index, request)
+            start_entry = (_token(start[0][0]), start[0][0], start[0][1], start[1]) if start else None
+            keys = source.scan(segment, total_segments, start_entry)
+            return self._page(request, table, index, keys, context, filter_node, paths)
+        return self._run('Scan', run, request)
+
+    # Batch
+
+    def batch_write_item(self, **request):
+        def run(request):
+            requests = [(table_name, entry) for table_name, entries in request['RequestItems'].items() for entry in entries]
+            if not requests or len(requests) > MAX_BATCH_WRITE:
+                raise _error('ValidationException',
+                             'Too many items requested for the BatchWriteItem call' if requests else 'The batch write request list is empty',
+                             'BatchWriteItem')
+            planned = []
+            seen = set()
+            for table_name, entry in requests:
+                table = self._table(table_name, 'BatchWriteItem')
+                if 'PutRequest' in entry:
+                    item = entry['PutRequest']['Item']
+                    self._validate_item(table, item, 'BatchWriteItem')
+                    primary_key = table.primary_key(item)
+                    new = copy_item(item)
+                else:
+                    primary_key = self._key(table, entry['DeleteRequest']['Key'], 'BatchWriteItem')
+                    new = None
+                if (table_name, primary_key) in seen:
+                    raise _error('ValidationException', 'Provided list of item keys contains duplicates', 'BatchWriteItem')
+                seen.add((table_name, primary_key))
+                planned.append((table, primary_key, new))
+            consumed = {}
+            for table, primary_key, new in planned:
+                old = self._write(table, primary_key, new)
+                size = max(item_size(new) if new else 0, item_size(old) if old else 0)
+                consumed[table.name] = consumed.get(table.name, 0) + write_capacity_units(size)
+            response = {'UnprocessedItems': {}}
+            if request.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+                response['ConsumedCapacity'] = [
+                    {'TableName': name, 'CapacityUnits': float(units)} for name, units in consumed.items()]
+            return response
+        return self._run('BatchWriteItem', run, request)
+
+    def batch_get_item(self, **request):
+        def run(request):
+            total = sum(len(entry['Keys']) for entry in request['RequestItems'].values())
+            if not total or total > MAX_BATCH_GET:
+                raise _error('ValidationException', 'Too many items requested for the BatchGetItem call', 'BatchGetItem')
+            responses = {}
+            consumed = []
+            for table_name, entry in request['RequestItems'].items():
+                table = self._table(table_name, 'BatchGetItem')
+                context = self._context(entry)
+                paths = parse_projection(entry['ProjectionExpression'], context) if entry.get('ProjectionExpression') else None
+                context.check_unused()
+                items = []
+                units = 0
+                seen = set()
+                for key in entry['Keys']:
+                    primary_key = self._key(table, key, 'BatchGetItem')
+                    if primary_key in seen:
+                        raise _error('ValidationException', 'Provided list of item keys contains duplicates', 'BatchGetItem')
+                    seen.add(primary_key)
+                    item = table.items.get(primary_key)
+                    units += read_capacity_units(table.sizes.get(primary_key, 0), entry.get('ConsistentRead', False))
+                    if item is not None:
+                        items.append(project(item, paths) if paths else copy_item(item))
+                responses[table_name] = items
+                consumed.append({'TableName': table_name, 'CapacityUnits': float(units)})
+            response = {'Responses': responses, 'UnprocessedKeys': {}}
+            if request.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+                response['ConsumedCapacity'] = consumed
+            return response
+        return self._run('BatchGetItem', run, request)
+
+    # Transacciones
+
+    def transact_write_items(self, **request):
+        def run(request):
+            actions = request['TransactItems']
+            if not actions or len(actions) > MAX_TRANSACTION_ITEMS:
+                raise _error('ValidationException', 'Member must have length less than or equal to 100', 'TransactWriteItems')
+            token = request.get('ClientRequestToken')
+            if token and token in self._transaction_tokens:
+                if self._transaction_tokens[token] != repr(actions):
+                    raise _error('IdempotentParameterMismatchException',
+                                 'The request uses the same client token as a previous, but non-identical request', 'TransactWriteItems')
+                return {}
+
+            planned = []
+            reasons = []
+            targets = set()
+            failed = False
+            for action in actions:
+                kind, body = next(iter(action.items()))
+                operation = 'TransactWriteItems'
+                try:
+                    if kind == 'Put':
+                        table, primary_key, old, new = self._put(body, operation)
+                    elif kind == 'Update':
+                        table, primary_key, old, new, _ = self._update(body, operation)
+                    elif kind == 'Delete':
+                        table, primary_key, old = self._delete(body, operation)
+                        new = None
+                    elif kind == 'ConditionCheck':
+                        table = self._table(body['TableName'], operation)
+                        primary_key = self._key(table, body['Key'], operation)
+                        context = self._context(body)
+                        condition = parse_condition(body['ConditionExpression'], context)
+                        context.check_unused()
+                        self._check(condition, table.items.get(primary_key), body, operation)
+                        new = False
+                    else:
+                        raise _error('ValidationException', f'Invalid transaction action: {kind}', operation)
+                    reasons.append({'Code': 'None'})
+                except ClientError as e:
+                    code = e.response['Error']['Code']
+                    if code != 'ConditionalCheckFailedException':
+                        raise
+                    failed = True
+                    reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                    if 'Item' in e.response:
+                        reason['Item'] = e.response['Item']
+                    reasons.append(reason)
+                    table = self._table(body['TableName'], operation)
+                    primary_key = table.primary_key(body.get('Key') or body.get('Item'))
+                    new = False
+                if (table.name, primary_key) in targets:
+                    raise _error('ValidationException',
+                                 'Transaction request cannot include multiple operations on one item', 'TransactWriteItems')
+                targets.add((table.name, primary_key))
+                planned.append((table, primary_key, new))
+
+            if failed:
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise _error('TransactionCanceledException',
+                             f'Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]',
+                             'TransactWriteItems', CancellationReasons=reasons)
+            for table, primary_key, new in planned:
+                if new is not False:
+                    self._write(table, primary_key, new)
+            if token:
+                self._transaction_tokens[token] = repr(actions)
+            return {}
+        return self._run('TransactWriteItems', run, request)
+
+    def transact_get_items(self, **request):
+        def run(request):
+            responses = []
+            for action in request['TransactItems']:
+                body = action['Get']
+                table = self._table(body['TableName'], 'TransactGetItems')
+                primary_key = self._key(table, body['Key'], 'TransactGetItems')
+                context = self._context(body)
+                paths = parse_projection(body['ProjectionExpression'], context) if body.get('ProjectionExpression') else None
+                context.check_unused()
+                item = table.items.get(primary_key)
+                responses.append({'Item': project(item, paths) if paths else copy_item(item)} if item is not None else {})
+            return {'Responses': responses}
+        return self._run('TransactGetItems', run, request)
+
+def copy_description(description):
+    """Copia una descripción de tabla (listas y diccionarios anidados)."""
+    if isinstance(description, dict):
+        return {name: copy_description(value) for name, value in description.items()}
+    if isinstance(description, list):
+        return [copy_description(value) for value in description]
+    return description
@@ -1,7 +1,14 @@
-import boto3
 import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from utils.resilience_utils import resilient_client, resilient_resource
 
 # Cargar variables de entorno desde un archivo .env
 load_dotenv()
@@ -13,8 +20,19 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'fakemysecretaccesske
 AWS_SESSION_TOKEN = os.getenv('AWS_SESSION_TOKEN', 'fakemysessiontoken')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 
+# Límites de tamaño de ítem de DynamoDB
+MAX_ITEM_SIZE_BYTES = 400 * 1024
+LOG_OVERFLOW_RATIO = 0.85
+LOG_HISTORY_SUFFIX = '#historial#'
+
+# Atributo de versión para el bloqueo optimista
+VERSION_FIELD = 'versionItem'
+
+class VersionConflictError(Exception):
+    """La versión del ítem cambió entre la lectura y la escritura."""
+
 # Inicializa el cliente y recurso de DynamoDB
-dynamodb_client = boto3.client(
+dynamodb_client = resilient_client(
     'dynamodb',
     region_name=AWS_REGION,
     endpoint_url=DYNAMODB_ENDPOINT,
@@ -23,7 +41,7 @@ dynamodb_client = boto3.client(
     aws_session_token=AWS_SESSION_TOKEN
 )
 
-dynamodb_resource = boto3.resource(
+dynamodb_resource = resilient_resource(
     'dynamodb',
     region_name=AWS_REGION,
     endpoint_url=DYNAMODB_ENDPOINT,
@@ -195,6 +213,321 @@ def batch_write_items(table_name, items):
     except ClientError as e:
         print(f"Error al hacer el batch write en la tabla {table_name}: {e.response['Error']['Message']}")
 
+def append_log_entry(table_name, key, log_entry, estado=None, expected_estado=None,
+                     log_field='log', estado_field='estado', overflow=False, keep_entries=10,
+                     history_table=None, raise_errors=False):
+    """
+    Agrega una entrada al final de la lista de log de un ítem sin reescribir el ítem completo.
+
+    Usa list_append en una única update_item, por lo que sólo se envía la entrada nueva.
+    Opcionalmente actualiza el estado en la misma operación y exige un estado previo.
+
+    :param table_name: Nombre de la tabla.
+    :param key: Clave del ítem a actualizar.
+    :param log_entry: Entrada de log en formato DynamoDB (por ejemplo {'M': {...}}).
+    :param estado: Nuevo valor (str) del atributo de estado, o None para no modificarlo.
+    :param expected_estado: Estado (str) que debe tener el ítem para aplicar el cambio, o None.
+    :param log_field: Nombre del atributo lista de log.
+    :param estado_field: Nombre del atributo de estado.
+    :param overflow: Si es True, mueve las entradas antiguas a un ítem de historial cuando
+                     el ítem se acerca al límite de 400 KB.
+    :param keep_entries: Entradas más recientes que se conservan en el ítem al desbordar.
+    :param history_table: Tabla donde se guardan los ítems de historial (por defecto la misma).
+    :param raise_errors: Si es True, levanta el ClientError (con su código) en lugar de imprimirlo.
+    :return: Respuesta de la actualización o None si ocurre un error o no se cumple la condición.
+    """
+    names = {'#log': log_field}
+    values = {':entrada': {'L': [log_entry]}, ':vacia': {'L': []}}
+    update_expression = 'SET #log = list_append(if_not_exists(#log, :vacia), :entrada)'
+    # El ítem debe existir: list_append no debe crear pagos a partir de una clave suelta
+    conditions = [f"attribute_exists(#k{index})" for index in range(len(key))]
+    names.update({f"#k{index}": name for index, name in enumerate(key)})
+
+    if estado is not None:
+        names['#estado'] = estado_field
+        values[':estado'] = {'S': estado}
+        update_expression += ', #estado = :estado'
+    if expected_estado is not None:
+        names['#estado'] = estado_field
+        values[':esperado'] = {'S': expected_estado}
+        conditions.append('#estado = :esperado')
+
+    try:
+        response = dynamodb_client.update_item(
+            TableName=table_name,
+            Key=key,
+            UpdateExpression=update_expression,
+            ConditionExpression=' AND '.join(conditions),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnConsumedCapacity='TOTAL'
+        )
+    except ClientError as e:
+        if raise_errors:
+            raise
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            detail = f" o su estado no es {expected_estado}" if expected_estado is not None else ''
+            print(f"No se agregó el log en la tabla {table_name}: el ítem no existe{detail}")
+        else:
+            print(f"Error al agregar el log en la tabla {table_name}: {e.response['Error']['Message']}")
+        return None
+
+    if overflow:
+        # Las WCU consumidas por la escritura equivalen al tamaño del ítem en KB
+        consumed_kb = response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+        if consumed_kb * 1024 >= MAX_ITEM_SIZE_BYTES * LOG_OVERFLOW_RATIO:
+            move_log_to_history(table_name, key, keep_entries, log_field, history_table)
+    return response
+
+def move_log_to_history(table_name, key, keep_entries=10, log_field='log', history_table=None):
+    """
+    Mueve las entradas antiguas del log de un ítem a un ítem de historial separado.
+
+    El ítem de historial usa la misma clave con el sufijo LOG_HISTORY_SUFFIX y una marca
+    de tiempo en los atributos de clave de tipo texto o binario; una clave sólo numérica
+    no admite sufijo y no se mueve. La copia y el recorte van en una transacción
+    condicionada al largo leído: si un append concurrente cambia el log, la transacción
+    se cancela sin perder entradas y el movimiento se reintenta en el siguiente append.
+
+    :param table_name: Nombre de la tabla.
+    :param key: Clave del ítem.
+    :param keep_entries: Entradas más recientes que se conservan en el ítem.
+    :param log_field: Nombre del atributo lista de log.
+    :param history_table: Tabla donde se guarda el historial (por defecto la misma).
+    :return: Clave del ítem de historial creado, o None si no se movió nada.
+    """
+    history_table = history_table or table_name
+    try:
+        response = dynamodb_client.get_item(
+            TableName=table_name,
+            Key=key,
+            ProjectionExpression='#log',
+            ExpressionAttributeNames={'#log': log_field},
+            ConsistentRead=True
+        )
+        entries = response.get('Item', {}).get(log_field, {}).get('L', [])
+        moved = len(entries) - keep_entries
+        if moved <= 0:
+            return None
+
+        if not any('S' in value or 'B' in value for value in key.values()):
+            print(f"No se puede mover el log de la tabla {table_name}: la clave {key} no tiene atributos de texto "
+                  f"o binarios para el sufijo del historial")
+            return None
+        suffix = f"{LOG_HISTORY_SUFFIX}{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+        history_key = {}
+        for name, value in key.items():
+            if 'S' in value:
+                value = {'S': value['S'] + suffix}
+            elif 'B' in value:
+                value = {'B': bytes(value['B']) + suffix.encode('utf-8')}
+            history_key[name] = value
+        # Copia y recorte en una transacción: o se mueven las entradas o no cambia nada
+        dynamodb_client.transact_write_items(TransactItems=[
+            {'Put': {
+                'TableName': history_table,
+                'Item': dict(history_key, **{log_field: {'L': entries[:moved]}}),
+                'ConditionExpression': 'attribute_not_exists(#log)',
+                'ExpressionAttributeNames': {'#log': log_field}
+            }},
+            {'Update': {
+                'TableName': table_name,
+                'Key': key,
+                # Se reescribe la lista con las entradas conservadas: un REMOVE por índice
+                # superaría el límite de 4 KB de la expresión al mover cientos de entradas
+                'UpdateExpression': 'SET #log = :conservadas',
+                'ConditionExpression': 'size(#log) = :largo',
+                'ExpressionAttributeNames': {'#log': log_field},
+                'ExpressionAttributeValues': {
+                    ':conservadas': {'L': entries[moved:]},
+                    ':largo': {'N': str(len(entries))}
+                }
+            }}
+        ])
+        print(f"{moved} entradas de log movidas al historial en la tabla {history_table}")
+        return history_key
+    except ClientError as e:
+        print(f"Error al mover el log al historial en la tabla {table_name}: {e.response['Error']['Message']}")
+        return None
+
+def versioned_update_item(table_name, key, update_expression, expression_attribute_values,
+                          expected_version, expression_attribute_names=None, version_field=VERSION_FIELD,
+                          exists=True):
+    """
+    Actualiza un ítem sólo si su versión no cambió (bloqueo optimista) e incrementa la versión.
+
+    Un ítem sin atributo de versión se considera en la versión 0. En la versión 0 también
+    se verifica la existencia leída: con exists=True el ítem debe seguir existiendo (no se
+    crea uno parcial si otro proceso lo eliminó) y con exists=False no debe existir todavía.
+
+    :param table_name: Nombre de la tabla.
+    :param key: Clave del ítem a actualizar.
+    :param update_expression: Expresión de actualización (SET, REMOVE, ADD, DELETE).
+    :param expression_attribute_values: Valores de los atributos de la expresión.
+    :param expected_version: Versión leída antes de modificar el ítem.
+    :param expression_attribute_names: Nombres de los atributos de la expresión, si los hay.
+    :param version_field: Nombre del atributo de versión.
+    :param exists: Si el ítem existía al leerlo (sólo se usa con expected_version 0).
+    :return: Respuesta de la actualización (con los atributos nuevos) o None si ocurre un error.
+    :raises VersionConflictError: Si otro proceso modificó el ítem después de leerlo.
+    """
+    names = dict(expression_attribute_names or {}, **{'#versionItem': version_field})
+    values = dict(expression_attribute_values or {}, **{
+        ':versionEsperada': {'N': str(expected_version)},
+        ':versionNueva': {'N': str(expected_version + 1)}
+    })
+    condition = '#versionItem = :versionEsperada'
+    if expected_version == 0:
+        names['#claveItem'] = next(iter(key))
+        if exists:
+            condition = f"attribute_exists(#claveItem) AND (attribute_not_exists(#versionItem) OR {condition})"
+        else:
+            condition = 'attribute_not_exists(#claveItem)'
+            del values[':versionEsperada']
+
+    # La versión se agrega a la cláusula SET existente o en una cláusula SET nueva; la palabra
+    # clave no puede ser parte de un placeholder (#set, :set) ni de un nombre de atributo
+    set_clause = re.search(r'(?<![#:\w.])SET\b', update_expression, re.IGNORECASE)
+    if set_clause:
+        position = set_clause.end()
+        update_expression = f"{update_expression[:position]} #versionItem = :versionNueva,{update_expression[position:]}"
+    else:
+        update_expression = f"SET #versionItem = :versionNueva {update_expression}"
+
+    try:
+        return dynamodb_client.update_item(
+            TableName=table_name,
+            Key=key,
+            UpdateExpression=update_expression,
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            raise VersionConflictError(
+                f"El ítem {key} de la tabla {table_name} ya no está en la versión {expected_version}"
+            ) from e
+        print(f"Error al actualizar el ítem versionado en la tabla {table_name}: {e.response['Error']['Message']}")
+        return None
+
+def update_with_retry(table_name, key, modify, max_attempts=5, base_delay=0.05, version_field=VERSION_FIELD):
+    """
+    Lectura-modificación-escritura con reintentos ante conflictos de versión.
+
+    En cada intento se lee el ítem con lectura consistente, se llama a modify con el ítem
+    actual y se aplica la actualización condicionada a la versión leída. Si otro proceso
+    escribió entre medio, se espera (backoff con jitter) y se repite con datos frescos.
+
+    :param table_name: Nombre de la tabla.
+    :param key: Clave del ítem.
+    :param modify: Función que recibe el ítem actual (o None si no existe) y devuelve un
+                   diccionario con 'update_expression', 'expression_attribute_values' y
+                   opcionalmente 'expression_attribute_names', o None para no escribir nada.
+    :param max_attempts: Intentos antes de abandonar.
+    :param base_delay: Espera base en segundos entre intentos.
+    :param version_field: Nombre del atributo de versión.
+    :return: Respuesta de la actualización, o None si modify no pidió cambios u ocurre un error.
+    :raises VersionConflictError: Si se agotan los intentos por conflictos.
+    """
+    for attempt in range(max_attempts):
+        try:
+            response = dynamodb_client.get_item(TableName=table_name, Key=key, ConsistentRead=True)
+        except ClientError as e:
+            print(f"Error al leer el ítem de la tabla {table_name}: {e.response['Error']['Message']}")
+            return None
+        item = response.get('Item')
+        version = int(item[version_field]['N']) if item and version_field in item else 0
+
+        change = modify(item)
+        if change is None:
+            return None
+        try:
+            return versioned_update_item(
+                table_name, key,
+                change['update_expression'],
+                change.get('expression_attribute_values'),
+                version,
+                change.get('expression_attribute_names'),
+                version_field,
+                exists=item is not None
+            )
+        except VersionConflictError:
+            if attempt == max_attempts - 1:
+                raise
+            time.sleep(random.uniform(0, base_delay * (2 ** attempt)))
+
+def scan_segment(table_name, segment, total_segments, **scan_kwargs):
+    """
+    Recorre un segmento de un scan paralelo siguiendo LastEvaluatedKey.
+
+    :param table_name: Nombre de la tabla.
+    :param segment: Número de segmento (0 .. total_segments - 1).
+    :param total_segments: Cantidad total de segmentos del scan.
+    :param scan_kwargs: Parámetros adicionales para scan (Limit, FilterExpression, ...).
+    :return: Generador de páginas (respuestas de scan) del segmento.
+    """
+    request = dict(scan_kwargs, TableName=table_name, Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = dynamodb_client.scan(**request)
+        yield response
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        request['ExclusiveStartKey'] = last_key
+
+def parallel_scan(table_name, total_segments=4, max_buffered_pages=16, **scan_kwargs):
+    """
+    Escanea una tabla con varios segmentos en paralelo y entrega los ítems a medida que llegan.
+
+    Cada segmento corre en su propio hilo; las páginas pasan por una cola acotada,
+    por lo que la memoria usada no depende del tamaño de la tabla. Si un segmento falla,
+    la excepción se levanta en el consumidor: un scan incompleto nunca parece completo.
+
+    :param table_name: Nombre de la tabla.
+    :param total_segments: Cantidad de segmentos (y de hilos) del scan.
+    :param max_buffered_pages: Páginas que pueden esperar en la cola antes de frenar a los hilos.
+    :param scan_kwargs: Parámetros adicionales para scan (Limit, ProjectionExpression, ...).
+    :return: Generador de ítems de la tabla.
+    :raises ClientError: Si falla el scan de algún segmento (o la excepción que lo haya detenido).
+    """
+    pages = queue.Queue(maxsize=max_buffered_pages)
+    stop = threading.Event()
+    done = object()
+
+    def worker(segment):
+        try:
+            for page in scan_segment(table_name, segment, total_segments, **scan_kwargs):
+                if stop.is_set():
+                    return
+                pages.put(page.get('Items', []))
+        except Exception as e:
+            # Cualquier error (ClientError o AWSServiceError de la capa resiliente) llega al consumidor
+            pages.put(e)
+        finally:
+            pages.put(done)
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        for segment in range(total_segments):
+            executor.submit(worker, segment)
+        pending = total_segments
+        try:
+            while pending:
+                page = pages.get()
+                if page is done:
+                    pending -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            # Libera a los hilos bloqueados en la cola si el consumidor se detiene antes de tiempo
+            stop.set()
+            while pending:
+                if pages.get() is done:
+                    pending -= 1
+
 def main():
     # Definir nombre de la tabla
     table_name = 'TestTable'
@@ -1,7 +1,7 @@
-import boto3
 import os
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from utils.resilience_utils import resilient_client
 
 # Cargar variables de entorno desde un archivo .env
 load_dotenv()
@@ -13,7 +13,7 @@ AWS_SESSION_TOKEN = os.getenv('AWS_SESSION_TOKEN', 'fakemysessiontoken')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 
 # Inicializa el cliente de ELBv2
-elb_client = boto3.client(
+elb_client = resilient_client(
     'elbv2',
     region_name=AWS_REGION,
     aws_access_key_id=AWS_ACCESS_KEY_ID,
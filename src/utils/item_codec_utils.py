@@ -0,0 +1,188 @@
+import base64
+import hashlib
+import json
+import os
+import zlib
+from collections.abc import Mapping
+from dotenv import load_dotenv
+
+from utils.item_size_utils import attribute_size
+from utils.s3_utils import get_object_bytes, put_object_content
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+OFFLOAD_BUCKET = os.getenv('DYNAMODB_OFFLOAD_BUCKET')
+OFFLOAD_PREFIX = os.getenv('DYNAMODB_OFFLOAD_PREFIX', 'dynamodb-offload')
+
+# Umbrales por defecto (en bytes, según item_size_utils)
+COMPRESS_THRESHOLD_BYTES = 4 * 1024
+OFFLOAD_THRESHOLD_BYTES = 64 * 1024
+
+# Prefijos que identifican los atributos codificados (guardados como Binary)
+COMPRESSED_MARKER = b'\x00dz1'
+OFFLOADED_MARKER = b'\x00ds1'
+ALGORITHMS = {'zlib': b'z', 'zstd': b's'}
+
+def _to_json(value):
+    """Serializa un valor en formato DynamoDB a JSON (los binarios van en base64)."""
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            return {'__b64__': base64.b64encode(bytes(obj)).decode('ascii')}
+        if isinstance(obj, set):
+            return sorted(obj)
+        raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+    return json.dumps(value, separators=(',', ':'), default=default).encode('utf-8')
+
+def _from_json(data):
+    """Deserializa el JSON generado por _to_json."""
+    def object_hook(obj):
+        if set(obj) == {'__b64__'}:
+            return base64.b64decode(obj['__b64__'])
+        return obj
+    return json.loads(data.decode('utf-8'), object_hook=object_hook)
+
+def _compress(data, algorithm):
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise ValueError("El algoritmo 'zstd' requiere el paquete zstandard")
+        return zstandard.ZstdCompressor().compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(data, algorithm_code):
+    if algorithm_code == ALGORITHMS['zstd']:
+        if zstandard is None:
+            raise ValueError("El atributo está comprimido con zstd y falta el paquete zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def is_encoded(value):
+    """
+    Indica si un valor fue codificado por encode_item.
+
+    :param value: Valor en formato DynamoDB.
+    :return: True si es un atributo comprimido o descargado a S3.
+    """
+    data = value.get('B') if isinstance(value, dict) else None
+    return isinstance(data, (bytes, bytearray)) and bytes(data[:4]) in (COMPRESSED_MARKER, OFFLOADED_MARKER)
+
+def encode_attribute(name, value, algorithm='zlib', offload_threshold=OFFLOAD_THRESHOLD_BYTES,
+                     bucket=OFFLOAD_BUCKET, prefix=OFFLOAD_PREFIX):
+    """
+    Comprime un valor y, si sigue siendo muy grande, lo descarga a S3.
+
+    :param name: Nombre del atributo (sólo para los mensajes).
+    :param value: Valor en formato DynamoDB.
+    :param algorithm: 'zlib' o 'zstd'.
+    :param offload_threshold: Tamaño comprimido a partir del cual se descarga a S3.
+    :param bucket: Bucket de S3 para los valores descargados, o None para no descargar.
+    :param prefix: Prefijo de las claves en S3.
+    :return: Valor codificado en formato DynamoDB ({'B': ...}).
+    """
+    payload = _compress(_to_json(value), algorithm)
+    code = ALGORITHMS[algorithm]
+    if bucket and len(payload) >= offload_threshold:
+        # Clave por contenido: reintentos y valores repetidos reutilizan el mismo objeto
+        object_name = f"{prefix}/{hashlib.sha256(payload).hexdigest()}"
+        if put_object_content(bucket, object_name, payload) is not None:
+            reference = json.dumps({'bucket': bucket, 'key': object_name}).encode('utf-8')
+            return {'B': OFFLOADED_MARKER + code + reference}
+        print(f"No se pudo descargar el atributo {name} a S3; se guarda comprimido en el ítem")
+    return {'B': COMPRESSED_MARKER + code + payload}
+
+def decode_attribute(value):
+    """
+    Restaura un valor codificado por encode_attribute (descargándolo de S3 si corresponde).
+
+    :param value: Valor en formato DynamoDB.
+    :return: Valor original en formato DynamoDB, o None si el objeto de S3 no se pudo leer.
+    """
+    if not is_encoded(value):
+        return value
+    data = bytes(value['B'])
+    marker, code, body = data[:4], data[4:5], data[5:]
+    if marker == OFFLOADED_MARKER:
+        reference = json.loads(body.decode('utf-8'))
+        body = get_object_bytes(reference['bucket'], reference['key'])
+        if body is None:
+            return None
+    return _from_json(_decompress(body, code))
+
+def encode_item(item, key_names=(), compress_threshold=COMPRESS_THRESHOLD_BYTES,
+                offload_threshold=OFFLOAD_THRESHOLD_BYTES, algorithm='zlib',
+                bucket=OFFLOAD_BUCKET, prefix=OFFLOAD_PREFIX):
+    """
+    Codifica los atributos grandes de un ítem antes de escribirlo.
+
+    Los atributos de primer nivel cuyo tamaño supera compress_threshold se guardan como
+    Binary comprimido; si aun comprimidos superan offload_threshold y hay bucket, el
+    contenido va a S3 y el ítem guarda sólo la referencia. Las claves e índices no se tocan.
+
+    :param item: Ítem en formato DynamoDB.
+    :param key_names: Atributos que nunca se codifican (claves de tabla e índices).
+    :param compress_threshold: Tamaño del atributo a partir del cual se comprime.
+    :param offload_threshold: Tamaño comprimido a partir del cual se descarga a S3.
+    :param algorithm: 'zlib' o 'zstd'.
+    :param bucket: Bucket de S3 para los valores descargados, o None para no descargar.
+    :param prefix: Prefijo de las claves en S3.
+    :return: Nuevo ítem con los atributos grandes codificados.
+    """
+    encoded = {}
+    for name, value in item.items():
+        if name not in key_names and not is_encoded(value) and attribute_size(name, value) > compress_threshold:
+            candidate = encode_attribute(name, value, algorithm, offload_threshold, bucket, prefix)
+            # Sólo se reemplaza si efectivamente ahorra espacio
+            if attribute_size(name, candidate) < attribute_size(name, value):
+                value = candidate
+        encoded[name] = value
+    return encoded
+
+class LazyItem(Mapping):
+    """
+    Vista de un ítem leído de DynamoDB que decodifica cada atributo al accederlo.
+
+    Los atributos que no se leen nunca no se descomprimen ni se descargan de S3.
+    """
+
+    def __init__(self, item):
+        self._raw = item
+        self._decoded = {}
+
+    def __getitem__(self, name):
+        if name not in self._decoded:
+            self._decoded[name] = decode_attribute(self._raw[name])
+        return self._decoded[name]
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    @property
+    def raw(self):
+        """Ítem tal como está almacenado en DynamoDB."""
+        return self._raw
+
+    def to_dict(self):
+        """Decodifica todos los atributos y devuelve un diccionario normal."""
+        return {name: self[name] for name in self._raw}
+
+def decode_item(item, lazy=True):
+    """
+    Restaura un ítem codificado por encode_item.
+
+    :param item: Ítem en formato DynamoDB, o None.
+    :param lazy: Si es True devuelve un LazyItem que decodifica bajo demanda.
+    :return: LazyItem, diccionario decodificado, o None si item es None.
+    """
+    if item is None:
+        return None
+    lazy_item = LazyItem(item)
+    return lazy_item if lazy else lazy_item.to_dict()
@@ -0,0 +1,111 @@
+import math
+from decimal import Decimal
+
+# Reglas de tamaño de ítems de DynamoDB
+# https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/CapacityUnitCalculations.html
+MAX_ITEM_SIZE_BYTES = 400 * 1024
+READ_UNIT_BYTES = 4 * 1024
+WRITE_UNIT_BYTES = 1024
+CONTAINER_OVERHEAD_BYTES = 3
+ELEMENT_OVERHEAD_BYTES = 1
+
+def number_size(value):
+    """
+    Calcula el tamaño de un número de DynamoDB.
+
+    Los números ocupan 1 byte por cada 2 dígitos significativos (sin ceros a la
+    izquierda ni a la derecha) más 1 byte, y 1 byte extra si son negativos.
+
+    :param value: Número como texto (formato 'N') o numérico.
+    :return: Tamaño en bytes.
+    """
+    number = Decimal(str(value))
+    digits = number.normalize().as_tuple().digits if number else (0,)
+    significant = ''.join(map(str, digits)).strip('0') or '0'
+    size = math.ceil(len(significant) / 2) + 1
+    if number < 0:
+        size += 1
+    return size
+
+def attribute_value_size(value):
+    """
+    Calcula el tamaño de un valor en formato DynamoDB ({'S': ...}, {'M': {...}}, ...).
+
+    :param value: Valor de atributo en formato DynamoDB.
+    :return: Tamaño en bytes.
+    """
+    (attribute_type, content), = value.items()
+    if attribute_type == 'S':
+        return len(content.encode('utf-8'))
+    if attribute_type == 'N':
+        return number_size(content)
+    if attribute_type == 'B':
+        return len(content)
+    if attribute_type in ('BOOL', 'NULL'):
+        return 1
+    if attribute_type == 'SS':
+        return sum(len(element.encode('utf-8')) for element in content)
+    if attribute_type == 'NS':
+        return sum(number_size(element) for element in content)
+    if attribute_type == 'BS':
+        return sum(len(element) for element in content)
+    if attribute_type == 'L':
+        return CONTAINER_OVERHEAD_BYTES + sum(
+            ELEMENT_OVERHEAD_BYTES + attribute_value_size(element) for element in content
+        )
+    if attribute_type == 'M':
+        return CONTAINER_OVERHEAD_BYTES + sum(
+            ELEMENT_OVERHEAD_BYTES + len(name.encode('utf-8')) + attribute_value_size(element)
+            for name, element in content.items()
+        )
+    raise ValueError(f"Tipo de atributo de DynamoDB desconocido: {attribute_type}")
+
+def attribute_size(name, value):
+    """
+    Calcula el tamaño de un atributo de primer nivel (nombre + valor).
+
+    :param name: Nombre del atributo.
+    :param value: Valor en formato DynamoDB.
+    :return: Tamaño en bytes.
+    """
+    return len(name.encode('utf-8')) + attribute_value_size(value)
+
+def item_size(item):
+    """
+    Calcula el tamaño de un ítem en formato DynamoDB según las reglas de AWS.
+
+    :param item: Ítem en formato DynamoDB.
+    :return: Tamaño en bytes.
+    """
+    return sum(attribute_size(name, value) for name, value in item.items())
+
+def read_capacity_units(size, consistent=False):
+    """
+    Calcula las RCU que consume leer un ítem del tamaño dado.
+
+    :param size: Tamaño del ítem en bytes.
+    :param consistent: True para lectura fuertemente consistente.
+    :return: Unidades de capacidad de lectura.
+    """
+    units = max(1, math.ceil(size / READ_UNIT_BYTES))
+    return units if consistent else units / 2
+
+def write_capacity_units(size):
+    """
+    Calcula las WCU que consume escribir un ítem del tamaño dado.
+
+    :param size: Tamaño del ítem en bytes.
+    :return: Unidades de capacidad de escritura.
+    """
+    return max(1, math.ceil(size / WRITE_UNIT_BYTES))
+
+def largest_attributes(item, limit=5):
+    """
+    Lista los atributos que más aportan al tamaño de un ítem.
+
+    :param item: Ítem en formato DynamoDB.
+    :param limit: Cantidad de atributos a devolver.
+    :return: Lista de tuplas (nombre, tamaño) ordenada de mayor a menor.
+    """
+    sizes = [(name, attribute_size(name, value)) for name, value in item.items()]
+    return sorted(sizes, key=lambda entry: entry[1], reverse=True)[:limit]
@@ -1,8 +1,8 @@
-import boto3
 import json
 import os
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from utils.resilience_utils import resilient_client
 
 # Cargar variables de entorno desde un archivo .env
 load_dotenv()
@@ -14,7 +14,7 @@ AWS_SESSION_TOKEN = os.getenv('AWS_SESSION_TOKEN', 'fakemysessiontoken')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 
 # Inicializa el cliente de Lambda
-lambda_client = boto3.client(
+lambda_client = resilient_client(
     'lambda',
     region_name=AWS_REGION,
     aws_access_key_id=AWS_ACCESS_KEY_ID,
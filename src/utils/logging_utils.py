@@ -0,0 +1,199 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+
+# Atributos estándar de LogRecord que no se copian como campos extra
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON.
+
+    Los campos pasados con extra={...} se agregan al objeto, así los resúmenes
+    (tasa, ETA, contadores) quedan como valores numéricos consultables.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que registra el log.
+
+    El QueueHandler estándar arma el mensaje antes de encolarlo; aquí el registro se
+    encola tal cual y el formateo (msg % args, JSON, I/O) ocurre en el hilo del
+    QueueListener. Los argumentos no deben modificarse después de registrar el log.
+    """
+
+    def prepare(self, record):
+        return record
+
+_listener = None
+
+def setup_logging(level=LOG_LEVEL, log_file=None, json_format=None, console=True):
+    """
+    Configura el logging raíz para que escriba a través de una cola sin bloquear.
+
+    Los handlers reales (consola y archivo) corren en el hilo de un QueueListener, por
+    lo que el costo en el hilo que registra es sólo crear el LogRecord y encolarlo.
+    Llamarla de nuevo reemplaza la configuración anterior.
+
+    :param level: Nivel de log (nombre o número).
+    :param log_file: Archivo donde escribir además de la consola, o None.
+    :param json_format: True para JSON, False para texto; por defecto según LOG_FORMAT.
+    :param console: Si es True escribe también en la consola.
+    :return: El QueueListener en ejecución.
+    """
+    global _listener
+    if json_format is None:
+        json_format = LOG_FORMAT.lower() == 'json'
+    formatter = JsonFormatter() if json_format else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+    return _listener
+
+def shutdown_logging():
+    """Vacía la cola y detiene el QueueListener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
+
+class SampledLogger:
+    """
+    Registra sólo 1 de cada N llamadas por clave, para logs dentro de loops calientes.
+
+    Si el nivel está deshabilitado, la llamada no cuenta ni formatea nada.
+
+    Ejemplo::
+
+        sampled = SampledLogger(logger, every=1000)
+        sampled.debug('item', "Ítem %s migrado", index)
+    """
+
+    def __init__(self, logger, every=1000):
+        self.logger = logger
+        self.every = max(1, every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every == 0:
+            extra = dict(kwargs.pop('extra', None) or {}, sampled_every=self.every, sampled_count=count + 1)
+            self.logger.log(level, msg, *args, extra=extra, **kwargs)
+
+    def debug(self, key, msg, *args, **kwargs):
+        self.log(logging.DEBUG, key, msg, *args, **kwargs)
+
+    def info(self, key, msg, *args, **kwargs):
+        self.log(logging.INFO, key, msg, *args, **kwargs)
+
+    def warning(self, key, msg, *args, **kwargs):
+        self.log(logging.WARNING, key, msg, *args, **kwargs)
+
+class RateReporter:
+    """
+    Emite un resumen periódico de avance (cantidad, tasa y ETA) en lugar de un log por ítem.
+
+    add() es barato: sólo suma y compara el reloj; el log se emite como máximo una vez
+    cada `interval` segundos y al llamar a finish().
+    """
+
+    def __init__(self, logger, label, total=None, interval=10.0, unit='ítems'):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.unit = unit
+        self.count = 0
+        self.started = time.monotonic()
+        self._next_report = self.started + interval
+        self._lock = threading.Lock()
+
+    def add(self, amount=1):
+        """
+        Suma unidades procesadas y emite el resumen si venció el intervalo.
+
+        :param amount: Unidades procesadas.
+        """
+        with self._lock:
+            self.count += amount
+            now = time.monotonic()
+            if now < self._next_report:
+                return
+            self._next_report = now + self.interval
+        self.report()
+
+    def snapshot(self):
+        """Devuelve (cantidad, segundos, tasa por segundo, ETA en segundos o None)."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        rate = self.count / elapsed
+        eta = (self.total - self.count) / rate if self.total and rate else None
+        return self.count, elapsed, rate, eta
+
+    def report(self, final=False):
+        """Registra el resumen actual."""
+        count, elapsed, rate, eta = self.snapshot()
+        progress = f"{count}/{self.total}" if self.total else f"{count}"
+        self.logger.info(
+            "%s: %s %s en %.1fs (%.1f %s/s%s)",
+            self.label, progress, self.unit, elapsed, rate, self.unit,
+            '' if final or eta is None else f", ETA {eta:.0f}s",
+            extra={'progress_label': self.label, 'progress_count': count, 'progress_total': self.total,
+                   'progress_rate': round(rate, 3), 'progress_eta': None if eta is None else round(eta, 1),
+                   'progress_final': final}
+        )
+
+    def finish(self):
+        """Registra el resumen final."""
+        self.report(final=True)
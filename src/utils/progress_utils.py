@@ -0,0 +1,243 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+from utils.logging_utils import RateReporter
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno (el contenedor de la app expone el puerto 5000)
+PROGRESS_METRICS_HOST = os.getenv('PROGRESS_METRICS_HOST', '0.0.0.0')
+PROGRESS_METRICS_PORT = int(os.getenv('PROGRESS_METRICS_PORT', '5000'))
+
+# Ventana (segundos) de los promedios móviles exponenciales
+EWMA_WINDOW_SECONDS = 30.0
+EWMA_TICK_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+class _Ewma:
+    """Promedio móvil exponencial de una tasa, con alfa según el tiempo transcurrido."""
+
+    def __init__(self, window):
+        self.window = window
+        self.rate = None
+
+    def update(self, amount, elapsed):
+        instant = amount / elapsed
+        if self.rate is None:
+            self.rate = instant
+        else:
+            alpha = 1 - math.exp(-elapsed / self.window)
+            self.rate += alpha * (instant - self.rate)
+
+class ProgressTracker(RateReporter):
+    """
+    Seguimiento de avance para trabajos masivos (migraciones, cargas, copias).
+
+    Además del conteo y el resumen periódico en el log de RateReporter, mide ítems/s,
+    bytes/s, capacidad/s (RCU o WCU) y reintentos/s como promedios móviles, y calcula
+    el ETA con la tasa móvil. Los trackers se registran para publicarse en el endpoint
+    HTTP de métricas (ver start_metrics_server).
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name, total=None, log=None, interval=10.0, unit='ítems',
+                 window=EWMA_WINDOW_SECONDS, register=True):
+        super().__init__(log or logger, name, total=total, interval=interval, unit=unit)
+        self.name = name
+        self.bytes = 0
+        self.capacity = 0.0
+        self.retries = 0
+        self.finished = False
+        self._pending = [0, 0, 0.0, 0]
+        self._rates = [_Ewma(window) for _ in range(4)]
+        self._last_tick = self.started
+        if register:
+            with ProgressTracker._registry_lock:
+                ProgressTracker._registry[name] = self
+
+    @classmethod
+    def trackers(cls):
+        """Trackers registrados, por nombre."""
+        with cls._registry_lock:
+            return dict(cls._registry)
+
+    def _tick(self, now, force=False):
+        """Vuelca lo acumulado en los promedios móviles (con el lock tomado)."""
+        elapsed = now - self._last_tick
+        if elapsed < EWMA_TICK_SECONDS and not (force and elapsed > 0):
+            return
+        for rate, amount in zip(self._rates, self._pending):
+            rate.update(amount, elapsed)
+        self._pending = [0, 0, 0.0, 0]
+        self._last_tick = now
+
+    def add(self, amount=1, bytes=0, capacity=0.0):
+        """
+        Registra unidades procesadas.
+
+        :param amount: Ítems procesados.
+        :param bytes: Bytes procesados.
+        :param capacity: Unidades de capacidad consumidas (RCU o WCU).
+        """
+        with self._lock:
+            self.bytes += bytes
+            self.capacity += capacity
+            self._pending[0] += amount
+            self._pending[1] += bytes
+            self._pending[2] += capacity
+            self._tick(time.monotonic())
+        super().add(amount)
+
+    def retry(self, amount=1):
+        """
+        Registra reintentos (throttling, UnprocessedItems, conflictos).
+
+        :param amount: Cantidad de reintentos.
+        """
+        with self._lock:
+            self.retries += amount
+            self._pending[3] += amount
+            self._tick(time.monotonic())
+
+    def snapshot(self):
+        count, elapsed, rate, eta = super().snapshot()
+        with self._lock:
+            self._tick(time.monotonic())
+            moving = self._rates[0].rate
+        if moving and self.total:
+            eta = max(0.0, (self.total - count) / moving)
+        return count, elapsed, rate, eta
+
+    def metrics(self):
+        """
+        Devuelve el estado completo del tracker.
+
+        :return: Diccionario con totales, tasas móviles (por segundo) y ETA.
+        """
+        count, elapsed, average, eta = self.snapshot()
+        with self._lock:
+            items_rate, bytes_rate, capacity_rate, retries_rate = (rate.rate or 0.0 for rate in self._rates)
+            return {
+                'name': self.name,
+                'unit': self.unit,
+                'items': count,
+                'total': self.total,
+                'bytes': self.bytes,
+                'capacity_units': round(self.capacity, 3),
+                'retries': self.retries,
+                'elapsed_seconds': round(elapsed, 3),
+                'average_items_per_second': round(average, 3),
+                'items_per_second': round(items_rate, 3),
+                'bytes_per_second': round(bytes_rate, 3),
+                'capacity_per_second': round(capacity_rate, 3),
+                'retries_per_second': round(retries_rate, 3),
+                'eta_seconds': None if eta is None or self.finished else round(eta, 1),
+                'finished': self.finished
+            }
+
+    def report(self, final=False):
+        metrics = self.metrics()
+        progress = f"{metrics['items']}/{self.total}" if self.total else f"{metrics['items']}"
+        eta = metrics['eta_seconds']
+        self.logger.info(
+            "%s: %s %s en %.1fs (%.1f %s/s, %.0f B/s, %.1f unidades/s, %s reintentos%s)",
+            self.label, progress, self.unit, metrics['elapsed_seconds'], metrics['items_per_second'], self.unit,
+            metrics['bytes_per_second'], metrics['capacity_per_second'], metrics['retries'],
+            '' if final or eta is None else f", ETA {eta:.0f}s",
+            extra={'progress': metrics, 'progress_final': final}
+        )
+
+    def finish(self):
+        """Marca el trabajo como terminado y registra el resumen final."""
+        with self._lock:
+            self._tick(time.monotonic(), force=True)
+            self.finished = True
+        super().finish()
+        return self.metrics()
+
+def prometheus_metrics(trackers):
+    """Formatea los trackers en el formato de texto de Prometheus."""
+    fields = (
+        ('items', 'progress_items_total', 'counter'),
+        ('bytes', 'progress_bytes_total', 'counter'),
+        ('capacity_units', 'progress_capacity_units_total', 'counter'),
+        ('retries', 'progress_retries_total', 'counter'),
+        ('items_per_second', 'progress_items_per_second', 'gauge'),
+        ('bytes_per_second', 'progress_bytes_per_second', 'gauge'),
+        ('capacity_per_second', 'progress_capacity_per_second', 'gauge'),
+        ('retries_per_second', 'progress_retries_per_second', 'gauge'),
+        ('eta_seconds', 'progress_eta_seconds', 'gauge'),
+    )
+    snapshots = [tracker.metrics() for tracker in trackers.values()]
+    lines = []
+    for field, metric, metric_type in fields:
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for snapshot in snapshots:
+            if snapshot[field] is not None:
+                job = snapshot['name'].replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{metric}{{job="{job}"}} {snapshot[field]}')
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Publica /progress (JSON) y /metrics (Prometheus)."""
+
+    def do_GET(self):
+        trackers = ProgressTracker.trackers()
+        if self.path.rstrip('/') in ('', '/progress'):
+            body = json.dumps([tracker.metrics() for tracker in trackers.values()], ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        elif self.path == '/metrics':
+            body = prometheus_metrics(trackers).encode('utf-8')
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s", format % args)
+
+_server = None
+
+def start_metrics_server(port=PROGRESS_METRICS_PORT, host=PROGRESS_METRICS_HOST):
+    """
+    Levanta (una sola vez) el endpoint HTTP de métricas en un hilo en segundo plano.
+
+    :param port: Puerto; 0 o negativo desactiva el servidor.
+    :param host: Interfaz donde escuchar.
+    :return: El servidor, o None si está desactivado o el puerto está ocupado.
+    """
+    global _server
+    if _server is not None or port <= 0:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("No se pudo abrir el endpoint de métricas en %s:%s: %s", host, port, e)
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='progress-metrics', daemon=True).start()
+    logger.info("Métricas de avance en http://%s:%s/progress y /metrics", host, port)
+    return _server
+
+def stop_metrics_server():
+    """Detiene el endpoint HTTP de métricas."""
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,67 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Limitador de tasa compartible entre hilos (token bucket).
+
+    Se usa como presupuesto global de capacidad: cada operación pide tantas unidades
+    como consume (RCU, WCU, bytes, ...) y espera si el balde está vacío. Permite quedar
+    en deuda para registrar consumos que sólo se conocen después de la llamada.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Unidades que se reponen por segundo; None o 0 desactiva el límite.
+        :param capacity: Ráfaga máxima acumulable (por defecto, un segundo de tasa).
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity or 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.rate)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """
+        Toma unidades del balde, esperando lo necesario para respetar la tasa.
+
+        Pedidos mayores que la capacidad se permiten dejando el balde en negativo, de modo
+        que las siguientes llamadas compensan la ráfaga.
+
+        :param amount: Unidades a consumir.
+        :return: Segundos esperados.
+        """
+        if not self.enabled or amount <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= min(amount, self.capacity):
+                    self._tokens -= amount
+                    return waited
+                missing = min(amount, self.capacity) - self._tokens
+            delay = missing / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def consume(self, amount):
+        """
+        Registra un consumo ya realizado sin esperar (puede dejar el balde en deuda).
+
+        :param amount: Unidades consumidas.
+        """
+        if not self.enabled or amount <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
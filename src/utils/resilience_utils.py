@@ -0,0 +1,367 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+import boto3
+from dotenv import load_dotenv
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+RESILIENCE_ENABLED = os.getenv('RESILIENCE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RESILIENCE_MAX_ATTEMPTS = int(os.getenv('RESILIENCE_MAX_ATTEMPTS', '5'))
+RESILIENCE_BASE_DELAY = float(os.getenv('RESILIENCE_BASE_DELAY', '0.05'))
+RESILIENCE_MAX_DELAY = float(os.getenv('RESILIENCE_MAX_DELAY', '5'))
+RESILIENCE_BREAKER_WINDOW = int(os.getenv('RESILIENCE_BREAKER_WINDOW', '20'))
+RESILIENCE_BREAKER_MIN_CALLS = int(os.getenv('RESILIENCE_BREAKER_MIN_CALLS', '10'))
+RESILIENCE_BREAKER_FAILURE_RATIO = float(os.getenv('RESILIENCE_BREAKER_FAILURE_RATIO', '0.5'))
+RESILIENCE_BREAKER_RESET_SECONDS = float(os.getenv('RESILIENCE_BREAKER_RESET_SECONDS', '5'))
+RESILIENCE_RETRY_BUDGET = int(os.getenv('RESILIENCE_RETRY_BUDGET', '500'))
+
+# Costo en fichas del presupuesto de reintentos (mismo esquema que el modo "standard" de los SDK)
+RETRY_COST = 5
+TIMEOUT_RETRY_COST = 10
+NO_RETRY_INCREMENT = 1
+
+# Códigos de error que indican sobrecarga del servicio
+THROTTLING_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException',
+    'RequestLimitExceeded', 'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled',
+    'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException'
+}
+TRANSIENT_CODES = {
+    'InternalError', 'InternalFailure', 'InternalServerError', 'ServiceUnavailable',
+    'ServiceUnavailableException', 'RequestTimeout', 'RequestTimeoutException'
+}
+CONNECTION_ERRORS = (ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+logger = logging.getLogger(__name__)
+
+class AWSServiceError(Exception):
+    """
+    Falla de un servicio de AWS que no se resolvió con reintentos.
+
+    A diferencia de ClientError, no la atrapan los `except ClientError` de los utils:
+    llega al llamador en lugar de convertirse en None o [].
+    """
+
+    def __init__(self, service, operation, message, cause=None):
+        super().__init__(f"{service}.{operation}: {message}")
+        self.service = service
+        self.operation = operation
+        self.cause = cause
+        self.code = cause.response['Error'].get('Code') if isinstance(cause, ClientError) else None
+
+class ThrottlingError(AWSServiceError):
+    """El servicio siguió limitando las llamadas tras los reintentos permitidos."""
+
+class ServiceUnavailableError(AWSServiceError):
+    """El servicio respondió con errores internos o no fue alcanzable."""
+
+class CircuitOpenError(AWSServiceError):
+    """El circuito está abierto: la llamada se rechazó sin llegar al servicio."""
+
+    def __init__(self, service, operation, breaker):
+        super().__init__(service, operation, f"circuito {breaker.name} abierto, reintentar en {breaker.retry_after():.1f}s")
+        self.breaker = breaker
+
+def classify(error):
+    """
+    Clasifica una excepción de botocore.
+
+    :param error: Excepción levantada por el cliente.
+    :return: ThrottlingError o ServiceUnavailableError si indica sobrecarga, None si es un error de negocio.
+    """
+    if isinstance(error, CONNECTION_ERRORS):
+        return ServiceUnavailableError
+    if not isinstance(error, ClientError):
+        return None
+    code = error.response.get('Error', {}).get('Code')
+    if code in THROTTLING_CODES:
+        return ThrottlingError
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+    if code in TRANSIENT_CODES or status >= 500:
+        return ServiceUnavailableError
+    return None
+
+class CircuitBreaker:
+    """
+    Circuito sobre una ventana de los últimos resultados.
+
+    Se abre cuando la proporción de fallas de sobrecarga supera el umbral; tras
+    reset_timeout deja pasar una llamada de prueba (semiabierto) y se cierra si tiene éxito.
+    """
+
+    def __init__(self, name, window=RESILIENCE_BREAKER_WINDOW, min_calls=RESILIENCE_BREAKER_MIN_CALLS,
+                 failure_ratio=RESILIENCE_BREAKER_FAILURE_RATIO, reset_timeout=RESILIENCE_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.opened_at = None
+        self._results = deque(maxlen=window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Segundos hasta que el circuito admita una llamada de prueba."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """
+        Indica si la llamada puede salir; en semiabierto reserva la única llamada de prueba.
+
+        :return: True si la llamada puede hacerse.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._probing = False
+                logger.info("Circuito %s semiabierto", self.name)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def release(self):
+        """Libera la llamada de prueba reservada por allow() sin registrar resultado."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success):
+        """
+        Registra el resultado de una llamada.
+
+        :param success: False si la llamada falló por sobrecarga.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if success:
+                    self.state = CLOSED
+                    self._results.clear()
+                    logger.info("Circuito %s cerrado", self.name)
+                else:
+                    self._open()
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (self.state == CLOSED and len(self._results) >= self.min_calls
+                    and failures / len(self._results) >= self.failure_ratio):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._results.clear()
+        logger.warning("Circuito %s abierto por %.1fs", self.name, self.reset_timeout)
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': len(self._results),
+                'failures': self._results.count(False),
+                'retry_after_seconds': round(self.retry_after(), 3)
+            }
+
+class RetryBudget:
+    """
+    Presupuesto de reintentos por servicio, en fichas.
+
+    Cada reintento retira fichas y cada llamada exitosa devuelve algunas, de modo que
+    durante una tormenta de errores los reintentos se agotan en lugar de multiplicar la
+    carga sobre el servicio.
+    """
+
+    def __init__(self, capacity=RESILIENCE_RETRY_BUDGET):
+        self.capacity = capacity
+        self.tokens = capacity
+        self._lock = threading.Lock()
+
+    def withdraw(self, cost):
+        """
+        :param cost: Fichas que cuesta el reintento.
+        :return: True si quedaba presupuesto para reintentar.
+        """
+        with self._lock:
+            if self.tokens < cost:
+                return False
+            self.tokens -= cost
+            return True
+
+    def deposit(self, amount):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+def backoff_delay(attempt, base_delay=RESILIENCE_BASE_DELAY, max_delay=RESILIENCE_MAX_DELAY):
+    """Espera exponencial con jitter completo para el intento dado (desde 0)."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+_breakers = {}
+_budgets = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(service, operation=None):
+    """
+    Circuito de un servicio, o de una operación de ese servicio.
+
+    :param service: Nombre del servicio (dynamodb, s3, sqs, ...).
+    :param operation: Nombre de la operación de la API, o None para el circuito del servicio.
+    :return: CircuitBreaker compartido.
+    """
+    name = f"{service}.{operation}" if operation else service
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def get_retry_budget(service):
+    """Presupuesto de reintentos compartido por todos los clientes del servicio."""
+    with _registry_lock:
+        if service not in _budgets:
+            _budgets[service] = RetryBudget()
+        return _budgets[service]
+
+def status():
+    """
+    Estado de los circuitos y presupuestos de reintento.
+
+    :return: Diccionario con 'breakers' y 'retry_budgets'.
+    """
+    with _registry_lock:
+        breakers = dict(_breakers)
+        budgets = dict(_budgets)
+    return {
+        'breakers': {name: breaker.status() for name, breaker in breakers.items()},
+        'retry_budgets': {service: budget.tokens for service, budget in budgets.items()}
+    }
+
+def reset():
+    """Descarta los circuitos y presupuestos (estado inicial)."""
+    with _registry_lock:
+        _breakers.clear()
+        _budgets.clear()
+
+def call(service, operation, function, *args, max_attempts=RESILIENCE_MAX_ATTEMPTS, **kwargs):
+    """
+    Ejecuta una llamada a AWS con circuitos, presupuesto de reintentos y backoff con jitter.
+
+    Los errores de negocio (ConditionalCheckFailed, NoSuchKey, ...) se propagan sin cambios.
+    La sobrecarga se reintenta mientras haya intentos y presupuesto; si no se resuelve se
+    levanta ThrottlingError o ServiceUnavailableError. Con el circuito abierto se levanta
+    CircuitOpenError sin hacer la llamada.
+
+    :param service: Nombre del servicio.
+    :param operation: Nombre de la operación.
+    :param function: Función que hace la llamada.
+    :param max_attempts: Intentos totales.
+    :return: Lo que devuelva la función.
+    """
+    service_breaker = get_breaker(service)
+    operation_breaker = get_breaker(service, operation)
+    budget = get_retry_budget(service)
+    retried_cost = 0
+    for attempt in range(max_attempts):
+        if not operation_breaker.allow():
+            raise CircuitOpenError(service, operation, operation_breaker)
+        if not service_breaker.allow():
+            operation_breaker.release()
+            raise CircuitOpenError(service, operation, service_breaker)
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            error_type = classify(e)
+            if error_type is None:
+                # El servicio respondió: para los circuitos cuenta como éxito
+                operation_breaker.record(True)
+                service_breaker.record(True)
+                raise
+            operation_breaker.record(False)
+            service_breaker.record(False)
+            cost = TIMEOUT_RETRY_COST if isinstance(e, CONNECTION_ERRORS) else RETRY_COST
+            if attempt + 1 >= max_attempts:
+                raise error_type(service, operation, f"sin éxito tras {attempt + 1} intentos: {e}", e) from e
+            if not budget.withdraw(cost):
+                raise error_type(service, operation, f"presupuesto de reintentos agotado: {e}", e) from e
+            retried_cost += cost
+            time.sleep(backoff_delay(attempt))
+            continue
+        operation_breaker.record(True)
+        service_breaker.record(True)
+        budget.deposit(retried_cost or NO_RETRY_INCREMENT)
+        return result
+
+def install(client, service=None):
+    """
+    Instala la capa de resiliencia sobre un cliente de boto3.
+
+    Envuelve _make_api_call, por lo que cubre también paginadores y waiters. Clientes
+    sin ese método (por ejemplo, el cliente en memoria) se devuelven sin cambios.
+
+    :param client: Cliente de boto3.
+    :param service: Nombre del servicio para circuitos y presupuesto (por defecto, el del cliente).
+    :return: El mismo cliente.
+    """
+    if getattr(client, '_resilience_installed', False) or not hasattr(client, '_make_api_call'):
+        return client
+    service = service or client.meta.service_model.service_name
+    make_api_call = client._make_api_call
+
+    def _make_api_call(operation_name, api_params):
+        return call(service, operation_name, make_api_call, operation_name, api_params)
+
+    client._make_api_call = _make_api_call
+    client._resilience_installed = True
+    return client
+
+def resilient_client(service_name, **kwargs):
+    """
+    Crea un cliente de boto3 con la capa de resiliencia instalada.
+
+    Los reintentos propios de botocore se desactivan para que no se multipliquen con
+    los de esta capa. Con RESILIENCE_ENABLED=false se devuelve un cliente normal.
+
+    :param service_name: Servicio de AWS.
+    :return: Cliente de boto3.
+    """
+    if not RESILIENCE_ENABLED:
+        return boto3.client(service_name, **kwargs)
+    config = Config(retries={'total_max_attempts': 1})
+    if kwargs.get('config') is not None:
+        config = kwargs['config'].merge(config)
+    kwargs['config'] = config
+    return install(boto3.client(service_name, **kwargs))
+
+def resilient_resource(service_name, **kwargs):
+    """
+    Crea un recurso de boto3 cuyo cliente subyacente tiene la capa de resiliencia.
+
+    :param service_name: Servicio de AWS.
+    :return: Recurso de boto3.
+    """
+    if not RESILIENCE_ENABLED:
+        return boto3.resource(service_name, **kwargs)
+    config = Config(retries={'total_max_attempts': 1})
+    if kwargs.get('config') is not None:
+        config = kwargs['config'].merge(config)
+    kwargs['config'] = config
+    resource = boto3.resource(service_name, **kwargs)
+    install(resource.meta.client)
+    return resource
@@ -0,0 +1,246 @@
+import os
+from collections import defaultdict
+from decimal import Decimal
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+
+from utils.dynamo_utils import dynamodb_client, dynamodb_resource, parallel_scan
+from utils.resilience_utils import AWSServiceError
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+TABLE_NAME = os.getenv('TABLE_BE_AD_API_POS_PAGOS', 'be-ad-api-pos-pagos')
+ROLLUP_TABLE_NAME = os.getenv('TABLE_BE_AD_API_POS_PAGOS_ROLLUP', f"{TABLE_NAME}-rollup")
+
+# Métricas de datosPago que se acumulan por comercio y día
+ROLLUP_METRICS = ('monto', 'iva', 'propina', 'neto')
+ROLLUP_COUNT_FIELD = 'conteo'
+
+ROLLUP_KEY_SCHEMA = [
+    {'AttributeName': 'idComercio', 'KeyType': 'HASH'},
+    {'AttributeName': 'fechaDia', 'KeyType': 'RANGE'}
+]
+ROLLUP_ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'idComercio', 'AttributeType': 'S'},
+    {'AttributeName': 'fechaDia', 'AttributeType': 'S'}
+]
+
+def create_rollup_table(table_name=ROLLUP_TABLE_NAME, read_capacity=5, write_capacity=5):
+    """
+    Crea la tabla de agregados por comercio y día si no existe.
+
+    :param table_name: Nombre de la tabla de agregados.
+    :param read_capacity: Unidades de lectura provisionadas.
+    :param write_capacity: Unidades de escritura provisionadas.
+    :return: Respuesta de create_table, o None si ya existe u ocurre un error.
+    """
+    try:
+        if table_name in dynamodb_client.list_tables().get('TableNames', []):
+            print(f"La tabla de agregados {table_name} ya existe")
+            return None
+        return dynamodb_client.create_table(
+            TableName=table_name,
+            KeySchema=ROLLUP_KEY_SCHEMA,
+            AttributeDefinitions=ROLLUP_ATTRIBUTE_DEFINITIONS,
+            ProvisionedThroughput={
+                'ReadCapacityUnits': read_capacity,
+                'WriteCapacityUnits': write_capacity
+            }
+        )
+    except ClientError as e:
+        print(f"Error al crear la tabla de agregados {table_name}: {e.response['Error']['Message']}")
+        return None
+
+def rollup_key(item):
+    """
+    Obtiene la clave (idComercio, fechaDia) de un pago en formato DynamoDB.
+
+    :param item: Ítem de pago en formato DynamoDB ({'S': ...}, {'N': ...}).
+    :return: Tupla (idComercio, fechaDia) o None si el ítem no tiene ambos campos.
+    """
+    if not item:
+        return None
+    id_comercio = item.get('idComercio', {}).get('S')
+    fecha_dia = item.get('fechaDia', {}).get('S')
+    if not id_comercio or not fecha_dia:
+        return None
+    return id_comercio, fecha_dia
+
+def payment_metrics(item):
+    """
+    Extrae las métricas acumulables de datosPago de un pago.
+
+    :param item: Ítem de pago en formato DynamoDB.
+    :return: Diccionario {métrica: Decimal}; las métricas ausentes valen 0.
+    """
+    datos_pago = item.get('datosPago', {}).get('M', {})
+    return {
+        metric: Decimal(datos_pago[metric]['N']) if 'N' in datos_pago.get(metric, {}) else Decimal(0)
+        for metric in ROLLUP_METRICS
+    }
+
+def apply_rollup_delta(key, metrics, count, table_name=ROLLUP_TABLE_NAME):
+    """
+    Aplica una variación a un agregado con una única actualización atómica ADD.
+
+    :param key: Tupla (idComercio, fechaDia) del agregado.
+    :param metrics: Diccionario {métrica: Decimal} con la variación (puede ser negativa).
+    :param count: Variación del conteo de pagos (1, -1 o 0).
+    :param table_name: Nombre de la tabla de agregados.
+    :return: Respuesta de update_item o None si ocurre un error.
+    """
+    id_comercio, fecha_dia = key
+    fields = ((ROLLUP_COUNT_FIELD, Decimal(count)),) + tuple((metric, metrics[metric]) for metric in ROLLUP_METRICS)
+    try:
+        return dynamodb_client.update_item(
+            TableName=table_name,
+            Key={'idComercio': {'S': id_comercio}, 'fechaDia': {'S': fecha_dia}},
+            UpdateExpression='ADD ' + ', '.join(f"#{name} :{name}" for name, _ in fields),
+            ExpressionAttributeNames={f"#{name}": name for name, _ in fields},
+            ExpressionAttributeValues={f":{name}": {'N': str(value)} for name, value in fields}
+        )
+    except ClientError as e:
+        print(f"Error al actualizar el agregado {key} en la tabla {table_name}: {e.response['Error']['Message']}")
+        return None
+
+def record_payment_change(old_item, new_item, table_name=ROLLUP_TABLE_NAME):
+    """
+    Hook de escritura: ajusta los agregados según la imagen anterior y nueva de un pago.
+
+    Sirve para INSERT (old_item=None), MODIFY y REMOVE (new_item=None).
+    Si ni la clave del agregado ni las métricas cambian, no se escribe nada.
+
+    :param old_item: Imagen anterior del pago en formato DynamoDB, o None.
+    :param new_item: Imagen nueva del pago en formato DynamoDB, o None.
+    :param table_name: Nombre de la tabla de agregados.
+    """
+    old_key, new_key = rollup_key(old_item), rollup_key(new_item)
+    old_metrics = payment_metrics(old_item) if old_key else None
+    new_metrics = payment_metrics(new_item) if new_key else None
+
+    if old_key and old_key == new_key:
+        if old_metrics != new_metrics:
+            # Mismo agregado: se aplica sólo la diferencia, sin tocar el conteo
+            delta = {metric: new_metrics[metric] - old_metrics[metric] for metric in ROLLUP_METRICS}
+            apply_rollup_delta(new_key, delta, 0, table_name)
+        return
+
+    if old_key:
+        apply_rollup_delta(old_key, {metric: -value for metric, value in old_metrics.items()}, -1, table_name)
+    if new_key:
+        apply_rollup_delta(new_key, new_metrics, 1, table_name)
+
+def process_stream_records(records, table_name=ROLLUP_TABLE_NAME):
+    """
+    Consume registros de DynamoDB Streams (vista NEW_AND_OLD_IMAGES) y actualiza los agregados.
+
+    Los streams entregan cada cambio al menos una vez; un reintento del lote completo
+    puede contar dos veces un mismo cambio, en cuyo caso rebuild_rollups lo corrige.
+
+    :param records: Lista de registros del evento ('Records').
+    :param table_name: Nombre de la tabla de agregados.
+    :return: Cantidad de registros procesados.
+    """
+    processed = 0
+    for record in records:
+        change = record.get('dynamodb', {})
+        record_payment_change(change.get('OldImage'), change.get('NewImage'), table_name)
+        processed += 1
+    return processed
+
+def lambda_handler(event, context):
+    """
+    Handler de Lambda para el stream de la tabla de pagos.
+
+    :param event: Evento de DynamoDB Streams.
+    :param context: Información del runtime de Lambda.
+    :return: Diccionario con el estado y la cantidad de registros procesados.
+    """
+    processed = process_stream_records(event.get('Records', []))
+    return {'statusCode': 200, 'processed': processed}
+
+def rebuild_rollups(source_table=TABLE_NAME, table_name=ROLLUP_TABLE_NAME, total_segments=4):
+    """
+    Recalcula todos los agregados desde cero con un scan paralelo de la tabla de pagos.
+
+    Pensado para recuperar la tabla de agregados (primera carga, stream perdido o
+    registros duplicados). Los agregados se sobrescriben con valores absolutos y se
+    eliminan los que ya no tienen pagos; los cambios que lleguen por el stream mientras
+    corre el rebuild pueden perderse, por lo que conviene ejecutarlo con el stream detenido.
+
+    Si el scan de la tabla de pagos falla no se escribe nada: con un scan incompleto los
+    totales serían menores que los reales.
+
+    :param source_table: Nombre de la tabla de pagos.
+    :param table_name: Nombre de la tabla de agregados.
+    :param total_segments: Segmentos del scan paralelo.
+    :return: Cantidad de agregados escritos, o None si el rebuild se abortó.
+    """
+    totals = defaultdict(lambda: dict.fromkeys((ROLLUP_COUNT_FIELD,) + ROLLUP_METRICS, Decimal(0)))
+    projection = 'idComercio, fechaDia, datosPago'
+    try:
+        for item in parallel_scan(source_table, total_segments=total_segments, ProjectionExpression=projection):
+            key = rollup_key(item)
+            if not key:
+                continue
+            aggregate = totals[key]
+            aggregate[ROLLUP_COUNT_FIELD] += 1
+            for metric, value in payment_metrics(item).items():
+                aggregate[metric] += value
+        stale = [key for key in map(rollup_key, parallel_scan(table_name, total_segments=total_segments,
+                                                             ProjectionExpression='idComercio, fechaDia'))
+                 if key and key not in totals]
+    except (ClientError, AWSServiceError) as e:
+        print(f"Rebuild de agregados abortado, no se modificó la tabla {table_name}: {e}")
+        return None
+
+    try:
+        with dynamodb_resource.Table(table_name).batch_writer() as batch:
+            for (id_comercio, fecha_dia), aggregate in totals.items():
+                batch.put_item(Item=dict(aggregate, idComercio=id_comercio, fechaDia=fecha_dia))
+            for id_comercio, fecha_dia in stale:
+                batch.delete_item(Key={'idComercio': id_comercio, 'fechaDia': fecha_dia})
+        print(f"{len(totals)} agregados recalculados y {len(stale)} obsoletos eliminados en la tabla {table_name}")
+    except (ClientError, AWSServiceError) as e:
+        print(f"Error al recalcular los agregados en la tabla {table_name}: {e}")
+        return None
+    return len(totals)
+
+def get_daily_rollup(id_comercio, fecha_dia, table_name=ROLLUP_TABLE_NAME):
+    """
+    Obtiene el total diario de un comercio con un único get_item.
+
+    :param id_comercio: Identificador del comercio.
+    :param fecha_dia: Día en el formato de fechaDia.
+    :return: Diccionario {conteo, monto, iva, propina, neto} con Decimal, o None si no hay ventas.
+    """
+    try:
+        response = dynamodb_client.get_item(
+            TableName=table_name,
+            Key={'idComercio': {'S': id_comercio}, 'fechaDia': {'S': fecha_dia}}
+        )
+    except ClientError as e:
+        print(f"Error al obtener el agregado de la tabla {table_name}: {e.response['Error']['Message']}")
+        return None
+    item = response.get('Item')
+    if not item:
+        return None
+    return {field: Decimal(item[field]['N']) for field in (ROLLUP_COUNT_FIELD,) + ROLLUP_METRICS if field in item}
+
+def main():
+    """
+    Recalcula los agregados de la tabla de pagos y muestra un ejemplo de lectura.
+    """
+    print("Creando la tabla de agregados...")
+    create_rollup_table()
+
+    print("Recalculando agregados...")
+    rebuild_rollups()
+
+    print("Leyendo un agregado...")
+    print(get_daily_rollup('comercio-ejemplo', '2024-01-01'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+from utils.resilience_utils import AWSServiceError
+from utils.s3_utils import s3_client
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+S3_CACHE_DIR = os.getenv('S3_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 's3-objects'))
+S3_CACHE_MAX_BYTES = int(float(os.getenv('S3_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+S3_CACHE_TTL_SECONDS = float(os.getenv('S3_CACHE_TTL_SECONDS', '300'))
+
+# Bloque de escritura al bajar un objeto a la caché
+CHUNK_SIZE = 1024 * 1024
+
+# Códigos con los que botocore informa un GET condicional sin cambios
+NOT_MODIFIED_CODES = ('304', 'NotModified')
+
+def _digest(*parts):
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+class S3ObjectCache:
+    """
+    Caché local en disco de objetos de S3, direccionada por bucket, clave y ETag.
+
+    - blobs/: el contenido, un archivo por (bucket, clave, ETag); su mtime marca el último uso (LRU).
+    - refs/: por (bucket, clave), el ETag vigente y cuándo se validó por última vez.
+
+    Dentro de ttl segundos desde la última validación no se consulta S3; después se hace
+    un GET condicional (If-None-Match) que sólo baja el objeto si cambió. Si el llamador
+    ya conoce el ETag (por ejemplo, guardado junto a la versión del archivo), el blob se
+    usa directamente. Todas las escrituras van a un temporal y se renombran, por lo que
+    varios procesos pueden compartir el directorio.
+    """
+
+    def __init__(self, directory=S3_CACHE_DIR, max_bytes=S3_CACHE_MAX_BYTES, ttl=S3_CACHE_TTL_SECONDS, client=None):
+        """
+        :param directory: Directorio de la caché.
+        :param max_bytes: Tamaño total máximo de los blobs; al superarlo se descartan los menos usados.
+        :param ttl: Segundos durante los que una validación se da por buena sin consultar S3.
+        :param client: Cliente de S3 (por defecto, el de s3_utils).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.client = client or s3_client
+        self.hits = 0
+        self.validations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        for sub in ('blobs', 'refs', 'tmp'):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    # Rutas y escrituras atómicas
+
+    def _blob_path(self, bucket, key, etag):
+        name = _digest(bucket, key, etag.strip('"'))
+        return os.path.join(self.directory, 'blobs', name[:2], name)
+
+    def _ref_path(self, bucket, key):
+        return os.path.join(self.directory, 'refs', _digest(bucket, key) + '.json')
+
+    def _temporary(self):
+        return tempfile.mkstemp(dir=os.path.join(self.directory, 'tmp'))
+
+    def _read_ref(self, bucket, key):
+        try:
+            with open(self._ref_path(bucket, key)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_ref(self, bucket, key, etag):
+        descriptor, temporary = self._temporary()
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump({'bucket': bucket, 'key': key, 'etag': etag.strip('"'), 'validated': time.time()}, file)
+        os.replace(temporary, self._ref_path(bucket, key))
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _store(self, bucket, key, response):
+        """Escribe el cuerpo de un GET en la caché y devuelve la ruta del blob."""
+        etag = response['ETag'].strip('"')
+        path = self._blob_path(bucket, key, etag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = self._temporary()
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in response['Body'].iter_chunks(CHUNK_SIZE):
+                    file.write(chunk)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        self._write_ref(bucket, key, etag)
+        # El blob recién escrito no se descarta aunque por sí solo supere max_bytes
+        self.evict(keep=(path,))
+        return path
+
+    # Consulta
+
+    def get_path(self, bucket, key, etag=None):
+        """
+        Devuelve la ruta local de un objeto, bajándolo sólo si no está o cambió.
+
+        La ruta puede desaparecer si otro proceso la descarta por LRU; para leer sin ese
+        riesgo usar open().
+
+        :param bucket: Nombre del bucket.
+        :param key: Clave del objeto.
+        :param etag: ETag esperado; si se indica y está en caché, no se consulta S3.
+        :return: Ruta del archivo en caché, o None si hubo un error.
+        """
+        if etag:
+            path = self._blob_path(bucket, key, etag)
+            if self._touch(path):
+                self.hits += 1
+                return path
+        ref = self._read_ref(bucket, key)
+        if ref and etag is None:
+            path = self._blob_path(bucket, key, ref['etag'])
+            if time.time() - ref['validated'] < self.ttl and self._touch(path):
+                self.hits += 1
+                return path
+        request = {'Bucket': bucket, 'Key': key}
+        if etag:
+            request['IfMatch'] = f'"{etag.strip(chr(34))}"'
+        elif ref and os.path.exists(self._blob_path(bucket, key, ref['etag'])):
+            request['IfNoneMatch'] = f'"{ref["etag"]}"'
+        try:
+            response = self.client.get_object(**request)
+        except ClientError as e:
+            if e.response['Error']['Code'] in NOT_MODIFIED_CODES:
+                path = self._blob_path(bucket, key, ref['etag'])
+                self._write_ref(bucket, key, ref['etag'])
+                if self._touch(path):
+                    self.validations += 1
+                    return path
+                # Otro proceso descartó el blob entre la consulta y el uso
+                return self.get_path(bucket, key, ref['etag'])
+            print(f"Error al obtener el objeto {key} de S3: {e.response['Error']['Message']}")
+            return None
+        except (AWSServiceError, BotoCoreError) as e:
+            print(f"Error al obtener el objeto {key} de S3: {e}")
+            return None
+        self.misses += 1
+        try:
+            return self._store(bucket, key, response)
+        except BotoCoreError as e:
+            # Conexión cortada mientras se bajaba el cuerpo; _store ya descartó el temporal
+            print(f"Error al bajar el objeto {key} de S3: {e}")
+            return None
+
+    def open(self, bucket, key, etag=None):
+        """
+        Abre en modo binario la copia local de un objeto (sigue siendo legible aunque se descarte).
+
+        :return: Archivo abierto, o None si hubo un error.
+        """
+        for _ in range(3):
+            path = self.get_path(bucket, key, etag)
+            if path is None:
+                return None
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                continue
+        return None
+
+    def get_bytes(self, bucket, key, etag=None):
+        """Contenido de un objeto desde la caché, o None si hubo un error."""
+        file = self.open(bucket, key, etag)
+        if file is None:
+            return None
+        with file:
+            return file.read()
+
+    def download_file(self, bucket, key, file_name, etag=None):
+        """
+        Copia un objeto a un archivo local pasando por la caché.
+
+        :return: True si se copió.
+        """
+        file = self.open(bucket, key, etag)
+        if file is None:
+            return False
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)))
+        try:
+            with file, os.fdopen(descriptor, 'wb') as destination:
+                shutil.copyfileobj(file, destination, CHUNK_SIZE)
+            os.replace(temporary, file_name)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return True
+
+    # Mantenimiento
+
+    def size(self):
+        """Bytes ocupados por los blobs."""
+        return sum(size for _, _, size in self._blobs())
+
+    def _blobs(self):
+        root = os.path.join(self.directory, 'blobs')
+        for shard in os.scandir(root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def evict(self, max_bytes=None, keep=()):
+        """
+        Descarta los blobs menos usados hasta que el total no supere max_bytes.
+
+        :param max_bytes: Límite (por defecto, el de la caché).
+        :param keep: Rutas de blobs que no se descartan (cuentan igual para el total).
+        :return: Bytes liberados.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            blobs = sorted(self._blobs(), key=lambda blob: blob[1])
+            total = sum(size for _, _, size in blobs)
+            freed = 0
+            for path, _, size in blobs:
+                if total <= max_bytes:
+                    break
+                if path in keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                freed += size
+            return freed
+
+    def clear(self):
+        """Vacía la caché."""
+        return self.evict(0)
+
+_default_cache = None
+
+# Método para descargar un archivo de S3 pasando por la caché local
+def cached_download_file(bucket, object_name, file_name, etag=None):
+    """Descarga un objeto de S3 usando la caché local compartida (ver S3ObjectCache)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = S3ObjectCache()
+    if _default_cache.download_file(bucket, object_name, file_name, etag):
+        print(f"Archivo {object_name} disponible en {file_name} (caché {_default_cache.directory})")
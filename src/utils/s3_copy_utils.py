@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from utils.progress_utils import ProgressTracker
+from utils.resilience_utils import AWSServiceError
+from utils.s3_utils import DELETE_BATCH_SIZE, _delete_batch, parallel_iter_objects, s3_client
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+MB = 1024 * 1024
+
+# Configuración de variables de entorno
+S3_COPY_MULTIPART_THRESHOLD = int(float(os.getenv('S3_COPY_MULTIPART_THRESHOLD_MB', '256')) * MB)
+S3_COPY_PART_SIZE = int(float(os.getenv('S3_COPY_PART_SIZE_MB', '128')) * MB)
+
+# Límites de S3: CopyObject admite hasta 5 GB y una subida multipart hasta 10.000 partes
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * MB
+MAX_PARTS = 10000
+
+logger = logging.getLogger(__name__)
+
+class CopyManifest:
+    """
+    Registro de copias terminadas (JSON lines) para retomar una copia masiva.
+
+    Cada línea guarda la clave origen, su ETag y la clave destino; al retomar, los objetos
+    cuyo ETag no cambió no se vuelven a copiar.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path and os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Última línea cortada por una interrupción
+                        continue
+                    self.done[entry['source']] = entry['etag']
+        if path:
+            self._file = open(path, 'a')
+
+    def is_done(self, record):
+        return self.done.get(record['Key']) == record['ETag']
+
+    def record(self, source, etag, destination):
+        if self._file is None:
+            return
+        with self._lock:
+            self._file.write(json.dumps({'source': source, 'etag': etag, 'destination': destination}) + '\n')
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class BulkCopier:
+    """
+    Copia (o mueve) los objetos de un prefijo del lado del servidor, en paralelo.
+
+    Cada clave pasa por una función de reescritura que devuelve la clave destino (o None
+    para omitirla). Los objetos chicos se copian con CopyObject; los que superan el umbral
+    se copian en multipart con UploadPartCopy, con las partes en paralelo. Las copias
+    terminadas se anotan en un manifiesto para poder retomar, y en modo mover los
+    originales se eliminan en lotes de DeleteObjects después de copiarlos.
+    """
+
+    def __init__(self, source_bucket, dest_bucket=None, rewrite=None, move=False, manifest_path=None,
+                 max_workers=16, part_workers=8, multipart_threshold=S3_COPY_MULTIPART_THRESHOLD,
+                 part_size=S3_COPY_PART_SIZE, extra_args=None, client=None):
+        """
+        :param source_bucket: Bucket origen.
+        :param dest_bucket: Bucket destino (por defecto, el mismo).
+        :param rewrite: Función clave origen -> clave destino o None. Si el destino queda dentro
+                        del prefijo listado, debe devolver None para las claves ya reescritas.
+        :param move: Elimina el original después de copiarlo.
+        :param manifest_path: Manifiesto JSON lines para retomar (None no guarda avance).
+        :param max_workers: Objetos copiados a la vez.
+        :param part_workers: Partes de copias multipart copiadas a la vez.
+        :param multipart_threshold: Tamaño a partir del cual se copia en multipart.
+        :param part_size: Tamaño de parte de las copias multipart.
+        :param extra_args: Parámetros adicionales de CopyObject (StorageClass, ServerSideEncryption, ...).
+        :param client: Cliente de S3 (por defecto, el de s3_utils).
+        """
+        self.source_bucket = source_bucket
+        self.dest_bucket = dest_bucket or source_bucket
+        self.rewrite = rewrite or (lambda key: key)
+        self.move = move
+        self.manifest = CopyManifest(manifest_path)
+        self.max_workers = max_workers
+        self.multipart_threshold = min(multipart_threshold, MAX_COPY_OBJECT_SIZE)
+        self.part_size = part_size
+        self.extra_args = extra_args or {}
+        self.client = client or s3_client
+        self._part_executor = ThreadPoolExecutor(max_workers=part_workers)
+
+    # Copia de un objeto
+
+    def _copy_source(self, record):
+        return {'Bucket': self.source_bucket, 'Key': record['Key']}
+
+    def _copy_simple(self, record, dest_key):
+        self.client.copy_object(
+            CopySource=self._copy_source(record), CopySourceIfMatch=f'"{record["ETag"]}"',
+            Bucket=self.dest_bucket, Key=dest_key, **self.extra_args)
+
+    def _copy_multipart(self, record, dest_key):
+        size = record['Size']
+        part_size = max(self.part_size, -(-size // MAX_PARTS))
+        head = self.client.head_object(Bucket=self.source_bucket, Key=record['Key'], IfMatch=f'"{record["ETag"]}"')
+        create_args = {name: head[name] for name in ('ContentType', 'ContentEncoding', 'ContentDisposition',
+                                                      'CacheControl', 'Metadata') if head.get(name)}
+        create_args.update({name: value for name, value in self.extra_args.items() if name != 'MetadataDirective'})
+        upload_id = self.client.create_multipart_upload(Bucket=self.dest_bucket, Key=dest_key, **create_args)['UploadId']
+
+        def copy_part(number):
+            start = (number - 1) * part_size
+            end = min(start + part_size, size) - 1
+            response = self.client.upload_part_copy(
+                Bucket=self.dest_bucket, Key=dest_key, UploadId=upload_id, PartNumber=number,
+                CopySource=self._copy_source(record), CopySourceIfMatch=f'"{record["ETag"]}"',
+                CopySourceRange=f"bytes={start}-{end}")
+            return {'PartNumber': number, 'ETag': response['CopyPartResult']['ETag']}
+
+        try:
+            parts = list(self._part_executor.map(copy_part, range(1, -(-size // part_size) + 1)))
+            self.client.complete_multipart_upload(
+                Bucket=self.dest_bucket, Key=dest_key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+        except BaseException:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.dest_bucket, Key=dest_key, UploadId=upload_id)
+            except Exception as e:
+                # No se oculta el error de la copia; la carga queda para la regla de ciclo de vida
+                logger.error("No se pudo abortar la carga multiparte %s de %s: %s", upload_id, dest_key, e)
+            raise
+
+    def copy_one(self, record, dest_key):
+        """
+        Copia un objeto y lo anota en el manifiesto.
+
+        :param record: Registro de s3_utils.object_record.
+        :param dest_key: Clave destino.
+        """
+        if record['Size'] > self.multipart_threshold:
+            self._copy_multipart(record, dest_key)
+        else:
+            self._copy_simple(record, dest_key)
+        self.manifest.record(record['Key'], record['ETag'], dest_key)
+
+    # Copia masiva
+
+    def run(self, prefix='', records=None, total=None, interval=10.0):
+        """
+        Copia (o mueve) todos los objetos del prefijo.
+
+        :param prefix: Prefijo origen.
+        :param records: Registros a copiar (por defecto, el listado paralelo del prefijo).
+        :param total: Cantidad de objetos, si se conoce (para el ETA).
+        :param interval: Segundos entre resúmenes de avance en el log.
+        :return: Diccionario con copied, skipped, deleted y failed (lista de (clave, error)).
+        :raises ClientError: Si falla el listado del prefijo; antes se esperan las copias en curso
+                             y, en modo mover, se eliminan los originales ya copiados.
+        """
+        records = records if records is not None else parallel_iter_objects(self.source_bucket, prefix)
+        progress = ProgressTracker(f"copia s3://{self.source_bucket}/{prefix}", total=total, log=logger,
+                                   interval=interval, unit='objetos')
+        result = {'copied': 0, 'skipped': 0, 'deleted': 0, 'failed': []}
+        pending = deque()
+        to_delete = []
+
+        def flush_deletes(force=False):
+            if to_delete and (force or len(to_delete) >= DELETE_BATCH_SIZE):
+                # Se borra con el mismo cliente que copió, no con el de s3_utils
+                deleted, errors = _delete_batch(self.source_bucket, [{'Key': key} for key in to_delete], self.client)
+                result['deleted'] += deleted
+                result['failed'].extend((key, f"{code}: {message}") for key, code, message in errors)
+                if errors:
+                    logger.error("No se pudieron eliminar %d originales (por ejemplo %s: %s)",
+                                 len(errors), errors[0][0], errors[0][2])
+                to_delete.clear()
+
+        def collect(record, future):
+            try:
+                future.result()
+            except Exception as e:
+                # Un objeto que falla (ClientError, AWSServiceError de la capa resiliente, ...) no corta la copia
+                message = e.response['Error']['Message'] if isinstance(e, ClientError) else str(e)
+                result['failed'].append((record['Key'], message))
+                logger.error("No se pudo copiar %s: %s", record['Key'], message)
+                return
+            result['copied'] += 1
+            progress.add(bytes=record['Size'])
+            if self.move:
+                to_delete.append(record['Key'])
+                flush_deletes()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                try:
+                    for record in records:
+                        dest_key = self.rewrite(record['Key'])
+                        if dest_key is None or (dest_key == record['Key'] and self.dest_bucket == self.source_bucket):
+                            continue
+                        if self.manifest.is_done(record):
+                            result['skipped'] += 1
+                            progress.add()
+                            if self.move:
+                                to_delete.append(record['Key'])
+                                flush_deletes()
+                            continue
+                        pending.append((record, executor.submit(self.copy_one, record, dest_key)))
+                        if len(pending) >= 4 * self.max_workers:
+                            collect(*pending.popleft())
+                finally:
+                    while pending:
+                        collect(*pending.popleft())
+        finally:
+            # Los originales ya copiados se eliminan aunque el listado se haya cortado
+            flush_deletes(force=True)
+            progress.finish()
+        return result
+
+    def close(self):
+        self._part_executor.shutdown(wait=True)
+        self.manifest.close()
+
+# Método para copiar o mover en paralelo los objetos de un prefijo
+def bulk_copy(source_bucket, prefix, rewrite, dest_bucket=None, move=False, manifest_path=None, **copier_kwargs):
+    """
+    Copia (o mueve) del lado del servidor los objetos de un prefijo, reescribiendo sus claves.
+
+    :param source_bucket: Bucket origen.
+    :param prefix: Prefijo origen.
+    :param rewrite: Función clave origen -> clave destino, o None para omitir la clave.
+    :param dest_bucket: Bucket destino (por defecto, el mismo).
+    :param move: Elimina los originales copiados.
+    :param manifest_path: Manifiesto para retomar una copia interrumpida.
+    :param copier_kwargs: Parámetros adicionales de BulkCopier (max_workers, part_size, ...).
+    :return: Diccionario con copied, skipped, deleted y failed, o None si falló el listado.
+    """
+    copier = BulkCopier(source_bucket, dest_bucket, rewrite, move=move, manifest_path=manifest_path, **copier_kwargs)
+    try:
+        result = copier.run(prefix)
+    except (ClientError, AWSServiceError) as e:
+        message = e.response['Error']['Message'] if isinstance(e, ClientError) else str(e)
+        print(f"Copia de {source_bucket}/{prefix} interrumpida al listar: {message} (se puede retomar con el manifiesto)")
+        return None
+    finally:
+        copier.close()
+    print(f"Copiados {result['copied']} objetos de {source_bucket}/{prefix} "
+          f"({result['skipped']} ya copiados, {result['deleted']} originales eliminados, {len(result['failed'])} fallidos)")
+    return result
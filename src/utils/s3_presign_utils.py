@@ -0,0 +1,209 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+import boto3
+from botocore import UNSIGNED
+from botocore.credentials import Credentials
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from utils.s3_utils import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_SESSION_TOKEN, s3_client
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+S3_PRESIGN_EXPIRES_SECONDS = int(os.getenv('S3_PRESIGN_EXPIRES_SECONDS', '3600'))
+S3_PRESIGN_CACHE_SIZE = int(os.getenv('S3_PRESIGN_CACHE_SIZE', '100000'))
+
+# Fracción de la vigencia a partir de la cual una URL en caché se vuelve a firmar
+REFRESH_RATIO = 0.8
+
+# Marcador de clave para obtener la URL base de un bucket
+_PLACEHOLDER_KEY = 'presign-placeholder'
+
+class BatchPresigner:
+    """
+    Firma URLs GET de S3 en lote.
+
+    generate_presigned_url resuelve el endpoint, serializa y valida parámetros en cada
+    llamada. Aquí eso se hace una vez por bucket (se toma la URL base de una firma normal)
+    y una vez por lote (credenciales congeladas, clave de firma derivada y query string);
+    por clave sólo queda el hash del canonical request y un HMAC.
+
+    Las URLs siempre se firman con SigV4 y son idénticas a las de generate_presigned_url
+    con un cliente configurado con Config(signature_version='s3v4'). Con la configuración
+    por defecto, get_object_url de s3_utils puede emitir URLs SigV2, que son distintas
+    (ambas válidas); quien compare URLs entre los dos helpers debe tenerlo en cuenta.
+    """
+
+    def __init__(self, client=None, credentials=None):
+        """
+        :param client: Cliente de S3 (por defecto, el de s3_utils).
+        :param credentials: Credenciales de botocore con las que se firma (por defecto, las de
+                            s3_utils si se usa su cliente; si no, las de boto3.Session()).
+        """
+        self.client = client or s3_client
+        if credentials is None:
+            if client is None:
+                credentials = Credentials(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_SESSION_TOKEN)
+            elif client.meta.config.signature_version is not UNSIGNED:
+                credentials = boto3.Session().get_credentials()
+        self.credentials = credentials
+        self._base_urls = {}
+        self._lock = threading.Lock()
+
+    def _credentials(self):
+        # Las credenciales refrescables se congelan para que todo el lote use las mismas
+        return self.credentials.get_frozen_credentials() if self.credentials is not None else None
+
+    def _base_url(self, bucket):
+        """URL del bucket hasta la clave (virtual host o path style, según el cliente)."""
+        with self._lock:
+            if bucket not in self._base_urls:
+                url = self.client.generate_presigned_url(
+                    'get_object', Params={'Bucket': bucket, 'Key': _PLACEHOLDER_KEY}, ExpiresIn=1)
+                self._base_urls[bucket] = url.split('?', 1)[0][:-len(_PLACEHOLDER_KEY)]
+            return self._base_urls[bucket]
+
+    def sign(self, bucket, keys, expires_in=S3_PRESIGN_EXPIRES_SECONDS):
+        """
+        Firma URLs GET para muchas claves de un bucket.
+
+        :param bucket: Nombre del bucket.
+        :param keys: Iterable de claves.
+        :param expires_in: Vigencia de las URLs en segundos.
+        :return: Diccionario clave -> URL firmada.
+        """
+        base_url = self._base_url(bucket)
+        credentials = self._credentials()
+        if credentials is None:
+            # Cliente sin firma (acceso anónimo): las URLs no necesitan firma
+            return {key: base_url + quote(key, safe='/~') for key in keys}
+        parts = urlsplit(base_url)
+        host = parts.netloc
+        if (parts.scheme, parts.port) in (('https', 443), ('http', 80)):
+            host = parts.hostname
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        scope = f"{timestamp[:8]}/{self.client.meta.region_name}/s3/aws4_request"
+        params = [
+            ('X-Amz-Algorithm', 'AWS4-HMAC-SHA256'),
+            ('X-Amz-Credential', f"{credentials.access_key}/{scope}"),
+            ('X-Amz-Date', timestamp),
+            ('X-Amz-Expires', str(expires_in)),
+            ('X-Amz-SignedHeaders', 'host')
+        ]
+        if credentials.token is not None:
+            params.append(('X-Amz-Security-Token', credentials.token))
+        encoded = [(name, quote(value, safe='-_.~')) for name, value in params]
+        query = '&'.join(f"{name}={value}" for name, value in encoded)
+        canonical_query = '&'.join(f"{name}={value}" for name, value in sorted(encoded))
+        signing_key = f"AWS4{credentials.secret_key}".encode('utf-8')
+        for part in (timestamp[:8], self.client.meta.region_name, 's3', 'aws4_request'):
+            signing_key = hmac.new(signing_key, part.encode('utf-8'), hashlib.sha256).digest()
+        string_prefix = f"AWS4-HMAC-SHA256\n{timestamp}\n{scope}\n"
+        request_suffix = f"\n{canonical_query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+        url_prefix = f"{parts.scheme}://{parts.netloc}"
+        urls = {}
+        for key in keys:
+            path = parts.path + quote(key, safe='/~')
+            canonical_request = f"GET\n{path}{request_suffix}"
+            string_to_sign = string_prefix + hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+            signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+            urls[key] = f"{url_prefix}{path}?{query}&X-Amz-Signature={signature}"
+        return urls
+
+class PresignedUrlCache:
+    """
+    Caché de URLs firmadas que sólo vuelve a firmar cuando una URL está por vencer.
+
+    Una URL se reutiliza mientras le quede más de (1 - refresh_ratio) de su vigencia, por
+    lo que quien la recibe siempre tiene al menos ese margen. Acotada por LRU.
+    """
+
+    def __init__(self, expires_in=S3_PRESIGN_EXPIRES_SECONDS, refresh_ratio=REFRESH_RATIO,
+                 max_entries=S3_PRESIGN_CACHE_SIZE, presigner=None):
+        """
+        :param expires_in: Vigencia de las URLs emitidas, en segundos.
+        :param refresh_ratio: Fracción de la vigencia tras la cual la URL se vuelve a firmar.
+        :param max_entries: URLs guardadas como máximo.
+        :param presigner: BatchPresigner a usar (por defecto, uno sobre el cliente de s3_utils).
+        """
+        self.expires_in = expires_in
+        self.refresh_after = expires_in * refresh_ratio
+        self.max_entries = max_entries
+        self.presigner = presigner or BatchPresigner()
+        self.hits = 0
+        self.signed = 0
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, bucket, keys):
+        """
+        URLs firmadas para muchas claves; sólo se firman las que faltan o están por vencer.
+
+        :param bucket: Nombre del bucket.
+        :param keys: Iterable de claves.
+        :return: Diccionario clave -> URL firmada.
+        """
+        now = time.monotonic()
+        urls = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = self._urls.get((bucket, key))
+                if entry is not None and now - entry[1] < self.refresh_after:
+                    self._urls.move_to_end((bucket, key))
+                    urls[key] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+        if missing:
+            signed = self.presigner.sign(bucket, missing, self.expires_in)
+            with self._lock:
+                for key, url in signed.items():
+                    self._urls[(bucket, key)] = (url, now)
+                    self._urls.move_to_end((bucket, key))
+                while len(self._urls) > self.max_entries:
+                    self._urls.popitem(last=False)
+                self.signed += len(signed)
+            urls.update(signed)
+        return urls
+
+    def get(self, bucket, key):
+        """URL firmada para una clave (ver get_many)."""
+        return self.get_many(bucket, [key])[key]
+
+    def invalidate(self, bucket, key=None):
+        """Descarta las URLs de una clave o de todo un bucket (por ejemplo, al borrar objetos)."""
+        with self._lock:
+            for cached in [cached for cached in self._urls if cached[0] == bucket and key in (None, cached[1])]:
+                del self._urls[cached]
+
+_default_cache = None
+
+# Método para obtener URLs firmadas de muchos objetos de S3, reutilizando las vigentes
+def get_object_urls(bucket, object_names):
+    """
+    Genera (o reutiliza de la caché compartida) URLs firmadas para varios objetos de S3.
+
+    Las URLs se firman con SigV4 aunque get_object_url use la firma por defecto del cliente
+    (ver BatchPresigner).
+
+    :param bucket: Nombre del bucket.
+    :param object_names: Claves de los objetos.
+    :return: Diccionario clave -> URL, o {} si hubo un error.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PresignedUrlCache()
+    try:
+        return _default_cache.get_many(bucket, object_names)
+    except ClientError as e:
+        print(f"Error al generar las URLs de S3: {e.response['Error']['Message']}")
+        return {}
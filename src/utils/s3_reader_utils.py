@@ -0,0 +1,191 @@
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+from utils.resilience_utils import AWSServiceError
+from utils.s3_utils import s3_client
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+MB = 1024 * 1024
+
+# Configuración de variables de entorno
+S3_READER_BLOCK_SIZE = int(float(os.getenv('S3_READER_BLOCK_SIZE_MB', '4')) * MB)
+S3_READER_CACHE_BLOCKS = int(os.getenv('S3_READER_CACHE_BLOCKS', '16'))
+S3_READER_READ_AHEAD = int(os.getenv('S3_READER_READ_AHEAD', '4'))
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Archivo de sólo lectura, posicionable, sobre un objeto de S3.
+
+    Lee por bloques con GET por rango a medida que se necesitan y guarda los últimos
+    bloques en una caché LRU acotada. Si la lectura es secuencial, pide en paralelo los
+    bloques siguientes (lectura anticipada); los accesos aleatorios (por ejemplo, el
+    footer de un Parquet) sólo bajan los bloques que tocan.
+
+    Todas las lecturas se hacen con IfMatch sobre el ETag inicial: si el objeto cambia
+    mientras se lee, se levanta OSError en lugar de mezclar versiones.
+    """
+
+    def __init__(self, bucket, key, block_size=S3_READER_BLOCK_SIZE, cache_blocks=S3_READER_CACHE_BLOCKS,
+                 read_ahead=S3_READER_READ_AHEAD, client=None, size=None, etag=None):
+        """
+        :param bucket: Nombre del bucket.
+        :param key: Clave del objeto.
+        :param block_size: Bytes por GET.
+        :param cache_blocks: Bloques que se mantienen en memoria (incluye los anticipados).
+        :param read_ahead: Bloques que se piden por adelantado en lecturas secuenciales (0 lo desactiva).
+        :param client: Cliente de S3 (por defecto, el de s3_utils).
+        :param size: Tamaño del objeto, si ya se conoce (evita el HEAD).
+        :param etag: ETag del objeto, si ya se conoce.
+        """
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.block_size = block_size
+        self.cache_blocks = max(1, cache_blocks)
+        self.read_ahead = min(read_ahead, self.cache_blocks - 1)
+        self.client = client or s3_client
+        if size is None:
+            response = self._request(self.client.head_object, Bucket=bucket, Key=key)
+            size = response['ContentLength']
+            etag = etag or response.get('ETag')
+        self.size = size
+        self.etag = etag
+        self.requests = 0
+        self._position = 0
+        self._last_block = None
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.read_ahead) if self.read_ahead > 0 else None
+
+    def _request(self, method, **kwargs):
+        try:
+            return method(**kwargs)
+        except ClientError as e:
+            error = e.response['Error']
+            if error.get('Code') in ('PreconditionFailed', '412'):
+                raise OSError(f"El objeto s3://{self.bucket}/{self.key} cambió durante la lectura") from e
+            raise OSError(f"Error al leer s3://{self.bucket}/{self.key}: {error.get('Message')}") from e
+        except (AWSServiceError, BotoCoreError) as e:
+            # Throttling tras los reintentos, conexión cortada o cuerpo incompleto: también es un error de E/S
+            raise OSError(f"Error al leer s3://{self.bucket}/{self.key}: {e}") from e
+
+    def _fetch(self, index):
+        """Baja un bloque completo con un GET por rango."""
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        request = {'Bucket': self.bucket, 'Key': self.key, 'Range': f"bytes={start}-{end}"}
+        if self.etag:
+            request['IfMatch'] = self.etag
+        response = self._request(self.client.get_object, **request)
+        self.requests += 1
+        return self._request(response['Body'].read)
+
+    def _block(self, index):
+        """Devuelve un bloque desde la caché, la lectura anticipada o S3."""
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+        future = self._pending.pop(index, None)
+        data = future.result() if future is not None else self._fetch(index)
+        self._cache[index] = data
+        while len(self._cache) + len(self._pending) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return data
+
+    def _schedule_read_ahead(self, index):
+        last = (self.size - 1) // self.block_size
+        for ahead in range(index + 1, min(index + self.read_ahead, last) + 1):
+            if ahead in self._cache or ahead in self._pending:
+                continue
+            if len(self._cache) + len(self._pending) >= self.cache_blocks:
+                # Deja lugar descartando los bloques menos usados, salvo el actual
+                oldest = next(iter(self._cache), None)
+                if oldest is None or oldest == index:
+                    break
+                self._cache.popitem(last=False)
+            self._pending[ahead] = self._executor.submit(self._fetch, ahead)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        if position < 0:
+            raise ValueError("Posición negativa")
+        self._position = position
+        return position
+
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError("Lectura sobre un archivo cerrado")
+        if size is None or size < 0:
+            size = self.size - self._position
+        size = max(0, min(size, self.size - self._position))
+        chunks = []
+        while size > 0:
+            index, offset = divmod(self._position, self.block_size)
+            sequential = self._last_block is None or index in (self._last_block, self._last_block + 1)
+            data = self._block(index)
+            if self._executor is not None and sequential and index != self._last_block:
+                self._schedule_read_ahead(index)
+            self._last_block = index
+            chunk = data[offset:offset + size]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def readall(self):
+        return self.read(-1)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            if self._executor is not None:
+                for future in self._pending.values():
+                    future.cancel()
+                self._executor.shutdown(wait=True)
+            self._pending.clear()
+            self._cache.clear()
+        super().close()
+
+# Método para abrir un objeto de S3 como archivo posicionable
+def open_object(bucket, object_name, **reader_kwargs):
+    """
+    Abre un objeto de S3 como archivo binario de sólo lectura con lectura por rangos.
+
+    :param bucket: Nombre del bucket.
+    :param object_name: Clave del objeto.
+    :param reader_kwargs: Parámetros de S3RangeReader (block_size, cache_blocks, read_ahead, ...).
+    :return: S3RangeReader, o None si el objeto no se pudo abrir.
+    """
+    try:
+        return S3RangeReader(bucket, object_name, **reader_kwargs)
+    except OSError as e:
+        print(f"Error al abrir el objeto de S3: {e}")
+        return None
@@ -0,0 +1,316 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from s3transfer.utils import ChunksizeAdjuster
+
+from utils.s3_transfer_utils import MB, S3TransferEngine
+from utils.s3_utils import delete_objects, parallel_iter_objects
+
+# Archivo (dentro del directorio sincronizado) donde se guardan los hashes ya calculados
+MANIFEST_NAME = '.s3sync-manifest.json'
+
+# Tamaños de parte habituales de otras herramientas (aws cli, consola, SDKs)
+COMMON_PART_SIZES = tuple(size * MB for size in (5, 8, 15, 16, 32, 64, 100, 128, 256, 512))
+
+# Bloque de lectura al calcular hashes
+HASH_BLOCK_SIZE = 1 * MB
+
+# Modos de comparación entre archivo local y objeto remoto
+COMPARE_MODES = ('etag', 'size', 'size-mtime')
+
+logger = logging.getLogger(__name__)
+
+def file_etag(path, part_size=0):
+    """
+    Calcula el ETag que S3 asignaría a un archivo.
+
+    :param path: Ruta local.
+    :param part_size: Tamaño de parte de la subida multipart; 0 para una subida simple (MD5).
+    :return: ETag sin comillas ('<md5>' o '<md5 de los md5>-<partes>').
+    """
+    with open(path, 'rb') as file:
+        if not part_size:
+            digest = hashlib.md5()
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+            return digest.hexdigest()
+        part_digests = []
+        while True:
+            part = hashlib.md5()
+            remaining = part_size
+            while remaining:
+                block = file.read(min(HASH_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                part.update(block)
+                remaining -= len(block)
+            if remaining == part_size and part_digests:
+                break
+            part_digests.append(part.digest())
+            if remaining:
+                break
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+def candidate_part_sizes(size, parts, chunksize):
+    """
+    Tamaños de parte que pueden haber producido un ETag multipart de `parts` partes.
+
+    :param size: Tamaño del objeto.
+    :param parts: Cantidad de partes indicada en el ETag.
+    :param chunksize: Tamaño de parte configurado en el motor de transferencias.
+    :return: Lista de tamaños, del más probable al menos probable.
+    """
+    candidates = [ChunksizeAdjuster().adjust_chunksize(chunksize, size)]
+    candidates.extend(COMMON_PART_SIZES)
+    candidates.append(math.ceil(size / parts / MB) * MB)
+    result = []
+    for part_size in candidates:
+        if part_size > 0 and part_size not in result and math.ceil(size / part_size) == parts:
+            result.append(part_size)
+    return result
+
+class HashCache:
+    """
+    Manifiesto local de hashes por archivo.
+
+    Cada entrada guarda tamaño, mtime y los ETag ya calculados (por tamaño de parte);
+    mientras el tamaño y el mtime no cambian, el archivo no se vuelve a leer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning("Manifiesto %s ilegible, se recalculan los hashes: %s", path, e)
+
+    def entry(self, relative, stat):
+        """Entrada vigente del archivo (se descarta si cambió el tamaño o el mtime)."""
+        with self._lock:
+            entry = self.entries.get(relative)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+                entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'etags': {}}
+                self.entries[relative] = entry
+            return entry
+
+    def etag(self, relative, path, stat, part_size=0):
+        entry = self.entry(relative, stat)
+        key = str(part_size)
+        if key not in entry['etags']:
+            etag = file_etag(path, part_size)
+            with self._lock:
+                entry['etags'][key] = etag
+        return entry['etags'][key]
+
+    def matches(self, relative, path, stat, remote_etag, chunksize):
+        """
+        Indica si el archivo local tiene el mismo contenido que el ETag remoto.
+
+        :param remote_etag: ETag del objeto, sin comillas.
+        :param chunksize: Tamaño de parte configurado (para ETags multipart).
+        """
+        entry = self.entry(relative, stat)
+        if entry.get('remote_etag') == remote_etag:
+            return True
+        if '-' not in remote_etag:
+            return self.etag(relative, path, stat) == remote_etag
+        parts = remote_etag.rsplit('-', 1)[1]
+        if not parts.isdigit():
+            return False
+        for part_size in candidate_part_sizes(stat.st_size, int(parts), chunksize):
+            if self.etag(relative, path, stat, part_size) == remote_etag:
+                return True
+        return False
+
+    def remember(self, relative, stat, remote_etag):
+        """Registra que el archivo local es una copia exacta del objeto con ese ETag."""
+        self.entry(relative, stat)['remote_etag'] = remote_etag
+
+    def prune(self, relatives):
+        """Descarta las entradas de archivos que ya no existen."""
+        with self._lock:
+            self.entries = {relative: entry for relative, entry in self.entries.items() if relative in relatives}
+
+    def save(self):
+        """Guarda el manifiesto de forma atómica."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self.entries)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as file:
+            file.write(data)
+        os.replace(temporary, self.path)
+
+def walk_local(local_dir, manifest_name=MANIFEST_NAME):
+    """
+    Recorre un directorio local.
+
+    :return: Diccionario ruta relativa (con '/') -> (ruta, os.stat_result).
+    """
+    files = {}
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            if name in (manifest_name, f"{manifest_name}.tmp"):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            files[relative] = (path, os.stat(path))
+    return files
+
+def list_remote(bucket, prefix, max_workers=8):
+    """
+    Lista un prefijo (en paralelo) para compararlo.
+
+    El listado se arma completo antes de comparar: si falla, se levanta el error y la
+    sincronización no transfiere ni elimina nada.
+
+    :return: Diccionario clave relativa al prefijo -> registro de s3_utils.object_record.
+    :raises ClientError: Si falla el listado (o AWSServiceError de la capa resiliente).
+    """
+    return {
+        record['Key'][len(prefix):]: record
+        for record in parallel_iter_objects(bucket, prefix, max_workers=max_workers)
+        if not record['Key'].endswith('/')
+    }
+
+def _normalize_prefix(prefix):
+    return prefix if not prefix or prefix.endswith('/') else prefix + '/'
+
+def _is_unchanged(cache, relative, path, stat, remote, compare, chunksize, upload):
+    if stat.st_size != remote['Size']:
+        return False
+    if compare == 'size':
+        return True
+    if compare == 'size-mtime':
+        if remote['LastModified'] is None:
+            return False
+        # El destino está al día si es al menos tan nuevo como el origen (LastModified tiene
+        # resolución de segundos, por eso se trunca el mtime local)
+        local_mtime = math.floor(stat.st_mtime)
+        remote_mtime = remote['LastModified'].timestamp()
+        return local_mtime <= remote_mtime if upload else remote_mtime <= local_mtime
+    return cache.matches(relative, path, stat, remote['ETag'], chunksize)
+
+def _compare_all(cache, local, remote, compare, chunksize, max_workers, upload):
+    """Devuelve las rutas relativas presentes en ambos lados cuyo contenido difiere."""
+    common = [relative for relative in local if relative in remote]
+
+    def changed(relative):
+        path, stat = local[relative]
+        return not _is_unchanged(cache, relative, path, stat, remote[relative], compare, chunksize, upload)
+
+    # El cálculo de MD5 libera el GIL: los hashes se calculan en paralelo
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [relative for relative, differs in zip(common, executor.map(changed, common)) if differs]
+
+def sync_to_s3(local_dir, bucket, prefix='', delete=False, compare='etag', dry_run=False,
+               engine=None, manifest_path=None, max_workers=8):
+    """
+    Sube a un prefijo de S3 sólo los archivos nuevos o modificados de un directorio.
+
+    :param local_dir: Directorio origen.
+    :param bucket: Bucket destino.
+    :param prefix: Prefijo destino.
+    :param delete: Elimina los objetos del prefijo que no existen localmente.
+    :param compare: 'etag' (tamaño y ETag, multipart incluido), 'size' o 'size-mtime'.
+    :param dry_run: Sólo calcula el plan, sin transferir ni eliminar.
+    :param engine: S3TransferEngine a usar (por defecto, uno nuevo con la configuración del entorno).
+    :param manifest_path: Manifiesto de hashes (por defecto, dentro de local_dir).
+    :param max_workers: Hilos para listar y calcular hashes.
+    :return: Diccionario con las claves subidas, omitidas, eliminadas y fallidas.
+    :raises ClientError: Si no se pudo listar el destino (no se transfiere ni elimina nada).
+    """
+    prefix = _normalize_prefix(prefix)
+    cache = HashCache(manifest_path or os.path.join(local_dir, MANIFEST_NAME))
+    local = walk_local(local_dir)
+    remote = list_remote(bucket, prefix, max_workers)
+    engine_owned = engine is None
+    engine = engine or S3TransferEngine(name=f"sync {local_dir} -> s3://{bucket}/{prefix}")
+    try:
+        changed = _compare_all(cache, local, remote, compare, engine.config.multipart_chunksize, max_workers,
+                               upload=True)
+        to_upload = [relative for relative in local if relative not in remote] + changed
+        to_delete = [prefix + relative for relative in remote if relative not in local] if delete else []
+        result = {
+            'transferred': to_upload,
+            'skipped': len(local) - len(to_upload),
+            'deleted': to_delete,
+            'failed': []
+        }
+        if not dry_run:
+            transfers = (('upload', local[relative][0], bucket, prefix + relative) for relative in to_upload)
+            result['failed'] = [(transfer[3], str(error)) for transfer, error in
+                                engine.transfer_many(transfers, total=len(to_upload))]
+            deleted = delete_objects(bucket, to_delete, max_workers=max_workers)
+            result['failed'].extend((key, f"{code}: {message}") for key, code, message in deleted['errors'])
+        cache.prune(local)
+        cache.save()
+        return result
+    finally:
+        if engine_owned:
+            engine.shutdown()
+
+def sync_from_s3(bucket, prefix, local_dir, delete=False, compare='etag', dry_run=False,
+                 engine=None, manifest_path=None, max_workers=8):
+    """
+    Descarga de un prefijo de S3 sólo los objetos nuevos o modificados.
+
+    :param bucket: Bucket origen.
+    :param prefix: Prefijo origen.
+    :param local_dir: Directorio destino.
+    :param delete: Elimina los archivos locales que no existen en el prefijo.
+    :param compare: 'etag' (tamaño y ETag, multipart incluido), 'size' o 'size-mtime'.
+    :param dry_run: Sólo calcula el plan, sin transferir ni eliminar.
+    :param engine: S3TransferEngine a usar (por defecto, uno nuevo con la configuración del entorno).
+    :param manifest_path: Manifiesto de hashes (por defecto, dentro de local_dir).
+    :param max_workers: Hilos para listar y calcular hashes.
+    :return: Diccionario con las rutas descargadas, omitidas, eliminadas y fallidas.
+    :raises ClientError: Si no se pudo listar el origen (no se transfiere ni elimina nada).
+    """
+    prefix = _normalize_prefix(prefix)
+    os.makedirs(local_dir, exist_ok=True)
+    cache = HashCache(manifest_path or os.path.join(local_dir, MANIFEST_NAME))
+    local = walk_local(local_dir)
+    remote = list_remote(bucket, prefix, max_workers)
+    engine_owned = engine is None
+    engine = engine or S3TransferEngine(name=f"sync s3://{bucket}/{prefix} -> {local_dir}")
+    try:
+        changed = _compare_all(cache, local, remote, compare, engine.config.multipart_chunksize, max_workers,
+                               upload=False)
+        to_download = [relative for relative in remote if relative not in local] + changed
+        to_delete = [relative for relative in local if relative not in remote] if delete else []
+        result = {
+            'transferred': to_download,
+            'skipped': len(remote) - len(to_download),
+            'deleted': to_delete,
+            'failed': []
+        }
+        if not dry_run:
+            failed = engine.download_many([prefix + relative for relative in to_download], bucket, local_dir,
+                                          prefix=prefix, total=len(to_download))
+            result['failed'] = [(transfer[2], str(error)) for transfer, error in failed]
+            failed_keys = {key for key, _ in result['failed']}
+            for relative in to_download:
+                if prefix + relative not in failed_keys:
+                    path = os.path.join(local_dir, *relative.split('/'))
+                    cache.remember(relative, os.stat(path), remote[relative]['ETag'])
+            for relative in to_delete:
+                try:
+                    os.remove(local[relative][0])
+                except OSError as e:
+                    result['failed'].append((relative, str(e)))
+        cache.prune(walk_local(local_dir) if not dry_run else local)
+        cache.save()
+        return result
+    finally:
+        if engine_owned:
+            engine.shutdown()
@@ -0,0 +1,233 @@
+import logging
+import os
+from collections import deque
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+from s3transfer.subscribers import BaseSubscriber
+
+from utils.progress_utils import ProgressTracker
+from utils.s3_utils import s3_client
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+MB = 1024 * 1024
+
+# Configuración de variables de entorno
+S3_MULTIPART_THRESHOLD = int(float(os.getenv('S3_MULTIPART_THRESHOLD_MB', '16')) * MB)
+S3_MULTIPART_CHUNKSIZE = int(float(os.getenv('S3_MULTIPART_CHUNKSIZE_MB', '16')) * MB)
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', '16'))
+S3_MAX_BANDWIDTH = int(os.getenv('S3_MAX_BANDWIDTH', '0')) or None
+
+# Tamaño de los bloques de lectura en las descargas en streaming
+STREAM_CHUNK_SIZE = 1 * MB
+
+logger = logging.getLogger(__name__)
+
+def transfer_config(multipart_threshold=S3_MULTIPART_THRESHOLD, multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+                    max_concurrency=S3_MAX_CONCURRENCY, max_bandwidth=S3_MAX_BANDWIDTH):
+    """
+    Arma la configuración de transferencia de boto3.
+
+    :param multipart_threshold: Tamaño (bytes) a partir del cual se usa multipart.
+    :param multipart_chunksize: Tamaño (bytes) de cada parte.
+    :param max_concurrency: Hilos que mueven partes a la vez.
+    :param max_bandwidth: Límite (bytes/s) de ancho de banda; None sin límite.
+    :return: TransferConfig.
+    """
+    return TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=multipart_chunksize,
+        max_concurrency=max_concurrency,
+        max_bandwidth=max_bandwidth
+    )
+
+class _ProgressSubscriber(BaseSubscriber):
+    """Lleva los bytes transferidos al ProgressTracker y cuenta los archivos terminados."""
+
+    def __init__(self, progress):
+        self.progress = progress
+
+    def on_progress(self, future, bytes_transferred, **kwargs):
+        self.progress.add(0, bytes=bytes_transferred)
+
+    def on_done(self, future, **kwargs):
+        self.progress.add(1)
+
+class _ConsumerWriter:
+    """Archivo no posicionable que entrega cada bloque descargado a una función."""
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+
+    def write(self, data):
+        self.consumer(data)
+        return len(data)
+
+    def seekable(self):
+        return False
+
+class S3TransferEngine:
+    """
+    Motor de transferencias S3 con un pool de hilos compartido.
+
+    Todas las subidas y descargas pasan por un único TransferManager: las partes de
+    todos los archivos comparten los max_concurrency hilos y el límite de ancho de
+    banda es agregado, no por archivo. Los objetos grandes se mueven en multipart
+    (partes en paralelo, descargas por rangos).
+    """
+
+    def __init__(self, client=None, config=None, window=None, name='s3-transfer'):
+        """
+        :param client: Cliente de S3 (por defecto, el de s3_utils).
+        :param config: TransferConfig (por defecto, transfer_config()).
+        :param window: Transferencias encoladas a la vez en transfer_many (por defecto, 4 por hilo).
+        :param name: Nombre del ProgressTracker de la transferencia masiva.
+        """
+        self.client = client or s3_client
+        self.config = config or transfer_config()
+        self.window = window or 4 * self.config.max_request_concurrency
+        self.name = name
+        self._manager = create_transfer_manager(self.client, self.config)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel=exc_type is not None)
+
+    def shutdown(self, cancel=False):
+        """Espera (o cancela) las transferencias pendientes y libera los hilos."""
+        self._manager.shutdown(cancel=cancel)
+
+    def upload(self, file_name, bucket, key, extra_args=None, subscribers=None):
+        """
+        Encola la subida de un archivo.
+
+        :return: Future de s3transfer (result() levanta el error de la transferencia).
+        """
+        return self._manager.upload(file_name, bucket, key, extra_args=extra_args, subscribers=subscribers)
+
+    def download(self, bucket, key, file_name, extra_args=None, subscribers=None):
+        """
+        Encola la descarga de un objeto a un archivo (se escribe en un temporal y se renombra).
+
+        :return: Future de s3transfer.
+        """
+        return self._manager.download(bucket, key, file_name, extra_args=extra_args, subscribers=subscribers)
+
+    def stream(self, bucket, key, consumer, extra_args=None, subscribers=None):
+        """
+        Descarga un objeto en streaming, sin armarlo en memoria.
+
+        Las partes se bajan en paralelo por rangos y se entregan en orden.
+
+        :param bucket: Nombre del bucket.
+        :param key: Clave del objeto.
+        :param consumer: Archivo abierto para escritura o función que recibe cada bloque de bytes.
+        :return: Future de s3transfer.
+        """
+        fileobj = consumer if hasattr(consumer, 'write') else _ConsumerWriter(consumer)
+        return self._manager.download(bucket, key, fileobj, extra_args=extra_args, subscribers=subscribers)
+
+    def transfer_many(self, transfers, total=None, interval=10.0):
+        """
+        Mueve muchos archivos a la vez por el pool compartido.
+
+        Mantiene a lo sumo `window` transferencias encoladas, por lo que se le puede pasar
+        un generador de millones de archivos. El fallo de una transferencia (de S3, de disco,
+        de s3transfer o de la capa resiliente) se registra y no detiene las demás.
+
+        :param transfers: Iterable de tuplas ('upload', file_name, bucket, key) o
+                          ('download', bucket, key, file_name).
+        :param total: Cantidad de transferencias, si se conoce (para el ETA).
+        :param interval: Segundos entre resúmenes de avance en el log.
+        :return: Lista de (transfer, error) de las que fallaron.
+        """
+        progress = ProgressTracker(self.name, total=total, log=logger, interval=interval, unit='archivos')
+        subscribers = [_ProgressSubscriber(progress)]
+        pending = deque()
+        failed = []
+
+        def collect(transfer, future):
+            try:
+                future.result()
+            except Exception as e:
+                failed.append((transfer, e))
+                logger.error("Transferencia fallida %s: %s", transfer, e)
+
+        try:
+            for transfer in transfers:
+                direction = transfer[0]
+                if direction == 'upload':
+                    future = self.upload(*transfer[1:], subscribers=subscribers)
+                elif direction == 'download':
+                    future = self.download(*transfer[1:], subscribers=subscribers)
+                else:
+                    raise ValueError(f"Tipo de transferencia inválido: {direction}")
+                pending.append((transfer, future))
+                if len(pending) >= self.window:
+                    collect(*pending.popleft())
+        finally:
+            # Si el iterable de transferencias falla, se esperan las ya encoladas antes de salir
+            while pending:
+                collect(*pending.popleft())
+            progress.finish()
+        return failed
+
+    def upload_many(self, files, bucket, prefix='', base_dir=None, total=None):
+        """
+        Sube muchos archivos; la clave es el prefijo más la ruta relativa a base_dir.
+
+        :param files: Iterable de rutas locales.
+        :param bucket: Bucket destino.
+        :param prefix: Prefijo destino.
+        :param base_dir: Directorio base de las rutas relativas (por defecto, sólo el nombre del archivo).
+        :return: Lista de (transfer, error) de las que fallaron.
+        """
+        def transfers():
+            for file_name in files:
+                relative = os.path.relpath(file_name, base_dir) if base_dir else os.path.basename(file_name)
+                yield 'upload', file_name, bucket, prefix + relative.replace(os.sep, '/')
+        return self.transfer_many(transfers(), total=total)
+
+    def download_many(self, keys, bucket, directory, prefix='', total=None):
+        """
+        Descarga muchos objetos a un directorio, recreando la ruta relativa al prefijo.
+
+        :param keys: Iterable de claves.
+        :param bucket: Bucket origen.
+        :param directory: Directorio local destino.
+        :param prefix: Prefijo que se quita de las claves para armar la ruta local.
+        :return: Lista de (transfer, error) de las que fallaron.
+        """
+        def transfers():
+            for key in keys:
+                file_name = os.path.join(directory, *key[len(prefix):].split('/'))
+                os.makedirs(os.path.dirname(file_name) or '.', exist_ok=True)
+                yield 'download', bucket, key, file_name
+        return self.transfer_many(transfers(), total=total)
+
+# Método para descargar un objeto en streaming hacia un archivo o una función
+def stream_object(bucket, object_name, consumer, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Lee un objeto de S3 por bloques sin cargarlo entero en memoria (una sola conexión).
+
+    :param bucket: Nombre del bucket.
+    :param object_name: Clave del objeto.
+    :param consumer: Archivo abierto para escritura o función que recibe cada bloque de bytes.
+    :param chunk_size: Tamaño de cada bloque.
+    :return: Bytes leídos, o None si hubo un error.
+    """
+    write = consumer.write if hasattr(consumer, 'write') else consumer
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=object_name)
+        total = 0
+        for chunk in response['Body'].iter_chunks(chunk_size):
+            write(chunk)
+            total += len(chunk)
+        return total
+    except ClientError as e:
+        print(f"Error al leer el objeto de S3: {e.response['Error']['Message']}")
+        return None
@@ -1,7 +1,11 @@
-import boto3
 from botocore.exceptions import ClientError
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.resilience_utils import AWSServiceError, resilient_client
 
 # Cargar variables de entorno desde un archivo .env
 load_dotenv()
@@ -12,8 +16,11 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'fakemysecretaccesske
 AWS_SESSION_TOKEN = os.getenv('AWS_SESSION_TOKEN', 'fakemysessiontoken')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 
+# Máximo de claves por llamada a DeleteObjects
+DELETE_BATCH_SIZE = 1000
+
 # Inicializar el cliente S3
-s3_client = boto3.client(
+s3_client = resilient_client(
     's3',
     region_name=AWS_REGION,
     aws_access_key_id=AWS_ACCESS_KEY_ID,
@@ -22,34 +29,159 @@ s3_client = boto3.client(
 )
 
 # Método para subir un archivo a S3
-def upload_file(file_name, bucket, object_name=None):
-    """Sube un archivo a un bucket de S3."""
+def upload_file(file_name, bucket, object_name=None, config=None):
+    """Sube un archivo a un bucket de S3 (config: TransferConfig, ver s3_transfer_utils)."""
     try:
         if object_name is None:
             object_name = os.path.basename(file_name)
-        s3_client.upload_file(file_name, bucket, object_name)
+        s3_client.upload_file(file_name, bucket, object_name, Config=config)
         print(f"Archivo {file_name} subido exitosamente a {bucket}/{object_name}")
     except ClientError as e:
         print(f"Error al subir el archivo a S3: {e.response['Error']['Message']}")
 
 # Método para descargar un archivo de S3
-def download_file(bucket, object_name, file_name):
-    """Descarga un archivo desde un bucket de S3."""
+def download_file(bucket, object_name, file_name, config=None):
+    """Descarga un archivo desde un bucket de S3 (config: TransferConfig, ver s3_transfer_utils)."""
     try:
-        s3_client.download_file(bucket, object_name, file_name)
+        s3_client.download_file(bucket, object_name, file_name, Config=config)
         print(f"Archivo {object_name} descargado exitosamente de {bucket} a {file_name}")
     except ClientError as e:
         print(f"Error al descargar el archivo de S3: {e.response['Error']['Message']}")
 
 # Método para listar objetos en un bucket de S3
 def list_objects(bucket, prefix=''):
-    """Lista los objetos en un bucket de S3."""
+    """
+    Lista las claves de los objetos en un bucket de S3, siguiendo la paginación.
+
+    Arma la lista completa en memoria; para prefijos grandes usar iter_objects o
+    parallel_iter_objects.
+    """
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-        return [obj['Key'] for obj in response.get('Contents', [])]
+        return [record['Key'] for record in iter_objects(bucket, prefix)]
     except ClientError as e:
         print(f"Error al listar objetos en S3: {e.response['Error']['Message']}")
         return []
+    except AWSServiceError as e:
+        print(f"Error al listar objetos en S3: {e}")
+        return []
+
+def object_record(obj):
+    """
+    Normaliza una entrada de Contents de list_objects_v2.
+
+    :param obj: Entrada de la respuesta.
+    :return: Diccionario con Key, Size, ETag (sin comillas) y LastModified.
+    """
+    return {
+        'Key': obj['Key'],
+        'Size': obj.get('Size', 0),
+        'ETag': obj.get('ETag', '').strip('"'),
+        'LastModified': obj.get('LastModified')
+    }
+
+def list_pages(bucket, prefix='', **list_kwargs):
+    """
+    Recorre list_objects_v2 siguiendo ContinuationToken.
+
+    :param bucket: Nombre del bucket.
+    :param prefix: Prefijo a listar.
+    :param list_kwargs: Parámetros adicionales (Delimiter, StartAfter, MaxKeys, ...).
+    :return: Generador de páginas (respuestas de list_objects_v2).
+    """
+    request = dict(list_kwargs, Bucket=bucket, Prefix=prefix)
+    while True:
+        response = s3_client.list_objects_v2(**request)
+        yield response
+        if not response.get('IsTruncated'):
+            break
+        request['ContinuationToken'] = response['NextContinuationToken']
+
+def iter_objects(bucket, prefix='', start_after=None):
+    """
+    Lista los objetos de un prefijo de forma perezosa, página a página.
+
+    Los errores se levantan: quien consume el listado (sincronización, copia o borrado
+    masivo) nunca debe confundir un listado cortado con uno completo.
+
+    :param bucket: Nombre del bucket.
+    :param prefix: Prefijo a listar.
+    :param start_after: Clave a partir de la cual listar (para retomar un listado).
+    :return: Generador de registros con Key, Size, ETag y LastModified, en orden de clave.
+    :raises ClientError: Si falla alguna página (o AWSServiceError de la capa resiliente).
+    """
+    list_kwargs = {'StartAfter': start_after} if start_after else {}
+    for page in list_pages(bucket, prefix, **list_kwargs):
+        for obj in page.get('Contents', []):
+            yield object_record(obj)
+
+def parallel_iter_objects(bucket, prefix='', delimiter='/', max_workers=8, max_depth=2, max_buffered_pages=16):
+    """
+    Lista un prefijo grande repartiendo los subprefijos entre varios hilos.
+
+    Primero baja por el árbol con el delimitador (hasta max_depth niveles o hasta tener
+    max_workers subprefijos), entregando los objetos que cuelgan de esos niveles; luego
+    lista cada subprefijo completo en su propio hilo. Las páginas pasan por una cola
+    acotada, por lo que la memoria usada no depende del tamaño del listado. Los
+    registros no salen en orden de clave. Como en iter_objects, cualquier error de un
+    hilo se levanta en el consumidor.
+
+    :param bucket: Nombre del bucket.
+    :param prefix: Prefijo a listar.
+    :param delimiter: Delimitador con el que se divide el espacio de claves.
+    :param max_workers: Subprefijos listados a la vez.
+    :param max_depth: Niveles del delimitador que se recorren para dividir.
+    :param max_buffered_pages: Páginas que pueden esperar en la cola antes de frenar a los hilos.
+    :return: Generador de registros con Key, Size, ETag y LastModified.
+    :raises ClientError: Si falla alguna página (o AWSServiceError de la capa resiliente).
+    """
+    prefixes = [prefix]
+    for _ in range(max_depth):
+        if len(prefixes) >= max_workers:
+            break
+        next_level = []
+        for level_prefix in prefixes:
+            for page in list_pages(bucket, level_prefix, Delimiter=delimiter):
+                for obj in page.get('Contents', []):
+                    yield object_record(obj)
+                next_level.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+        prefixes = next_level
+        if not prefixes:
+            return
+
+    pages = queue.Queue(maxsize=max_buffered_pages)
+    stop = threading.Event()
+    done = object()
+
+    def worker(sub_prefix):
+        try:
+            for page in list_pages(bucket, sub_prefix):
+                if stop.is_set():
+                    return
+                pages.put([object_record(obj) for obj in page.get('Contents', [])])
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(done)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for sub_prefix in prefixes:
+            executor.submit(worker, sub_prefix)
+        pending = len(prefixes)
+        try:
+            while pending:
+                page = pages.get()
+                if page is done:
+                    pending -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            # Libera a los hilos bloqueados en la cola si el consumidor se detiene antes de tiempo
+            stop.set()
+            while pending:
+                if pages.get() is done:
+                    pending -= 1
 
 # Método para eliminar un objeto de S3
 def delete_object(bucket, object_name):
@@ -60,6 +192,82 @@ def delete_object(bucket, object_name):
     except ClientError as e:
         print(f"Error al eliminar el objeto de S3: {e.response['Error']['Message']}")
 
+# Método para eliminar muchos objetos con DeleteObjects
+def _delete_batch(bucket, batch, client=None):
+    """Envía un DeleteObjects (con client o, por defecto, s3_client) y devuelve (eliminados, errores por clave)."""
+    try:
+        response = (client or s3_client).delete_objects(Bucket=bucket, Delete={'Objects': batch, 'Quiet': True})
+    except ClientError as e:
+        error = e.response['Error']
+        return 0, [(obj['Key'], error.get('Code'), error.get('Message')) for obj in batch]
+    except AWSServiceError as e:
+        # Throttling o circuito abierto tras los reintentos: falla el lote, no el borrado completo
+        return 0, [(obj['Key'], e.code or type(e).__name__, str(e)) for obj in batch]
+    errors = [(error['Key'], error.get('Code'), error.get('Message')) for error in response.get('Errors', [])]
+    return len(batch) - len(errors), errors
+
+def delete_objects(bucket, keys, max_workers=8, batch_size=DELETE_BATCH_SIZE):
+    """
+    Elimina muchos objetos agrupando las claves en pedidos DeleteObjects enviados en paralelo.
+
+    Las claves se consumen a medida que llegan (pueden venir de iter_objects o
+    parallel_iter_objects) y se mantienen a lo sumo 2 * max_workers lotes en vuelo.
+
+    :param bucket: Nombre del bucket.
+    :param keys: Iterable de claves, o de registros con 'Key' (y opcionalmente 'VersionId').
+    :param max_workers: Pedidos DeleteObjects simultáneos.
+    :param batch_size: Claves por pedido (máximo 1000).
+    :return: Diccionario con 'deleted' (cantidad) y 'errors' (lista de (clave, código, mensaje)).
+    """
+    result = {'deleted': 0, 'errors': []}
+    pending = deque()
+
+    def collect(future):
+        deleted, errors = future.result()
+        result['deleted'] += deleted
+        result['errors'].extend(errors)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batch = []
+        for key in keys:
+            if isinstance(key, str):
+                batch.append({'Key': key})
+            else:
+                batch.append({name: key[name] for name in ('Key', 'VersionId') if key.get(name)})
+            if len(batch) >= batch_size:
+                pending.append(executor.submit(_delete_batch, bucket, batch))
+                batch = []
+                if len(pending) >= 2 * max_workers:
+                    collect(pending.popleft())
+        if batch:
+            pending.append(executor.submit(_delete_batch, bucket, batch))
+        while pending:
+            collect(pending.popleft())
+    if result['errors']:
+        key, code, message = result['errors'][0]
+        print(f"Error al eliminar {len(result['errors'])} objetos de S3 (por ejemplo {key}: {code} {message})")
+    return result
+
+def delete_prefix(bucket, prefix, predicate=None, max_workers=8, dry_run=False):
+    """
+    Elimina los objetos de un prefijo, opcionalmente sólo los que cumplen una condición.
+
+    :param bucket: Nombre del bucket.
+    :param prefix: Prefijo a limpiar.
+    :param predicate: Función que recibe el registro (Key, Size, ETag, LastModified) y
+                      devuelve True si el objeto debe eliminarse; None elimina todo.
+    :param max_workers: Hilos para listar y para eliminar.
+    :param dry_run: Sólo cuenta los objetos que se eliminarían.
+    :return: Diccionario con 'deleted' y 'errors' (ver delete_objects).
+    :raises ClientError: Si falla el listado; los objetos ya listados pueden haberse eliminado.
+    """
+    records = parallel_iter_objects(bucket, prefix, max_workers=max_workers)
+    if predicate is not None:
+        records = (record for record in records if predicate(record))
+    if dry_run:
+        return {'deleted': sum(1 for _ in records), 'errors': []}
+    return delete_objects(bucket, records, max_workers=max_workers)
+
 # Método para copiar un objeto de S3 a otro bucket o nombre de objeto
 def copy_object(source_bucket, source_object, dest_bucket, dest_object):
     """Copia un objeto de S3 a otro bucket o nombre de objeto."""
@@ -82,13 +290,33 @@ def get_object_content(bucket, object_name):
         return None
 
 # Método para obtener la URL pública de un objeto de S3
-def get_object_url(bucket, object_name):
-    """Genera una URL pública para un objeto de S3."""
+def get_object_url(bucket, object_name, expires_in=3600):
+    """Genera una URL pública para un objeto de S3 (para muchas claves, ver s3_presign_utils)."""
     try:
         url = s3_client.generate_presigned_url('get_object',
                                                Params={'Bucket': bucket, 'Key': object_name},
-                                               ExpiresIn=3600)
+                                               ExpiresIn=expires_in)
         return url
     except ClientError as e:
         print(f"Error al generar la URL de S3: {e.response['Error']['Message']}")
         return None
+
+# Método para subir contenido en memoria a S3
+def put_object_content(bucket, object_name, body):
+    """Sube contenido (bytes o texto) como un objeto de S3."""
+    try:
+        response = s3_client.put_object(Bucket=bucket, Key=object_name, Body=body)
+        return response
+    except ClientError as e:
+        print(f"Error al subir el contenido a S3: {e.response['Error']['Message']}")
+        return None
+
+# Método para obtener el contenido binario de un objeto de S3
+def get_object_bytes(bucket, object_name):
+    """Obtiene el contenido de un objeto de S3 como bytes, sin decodificar."""
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=object_name)
+        return response['Body'].read()
+    except ClientError as e:
+        print(f"Error al obtener el objeto de S3: {e.response['Error']['Message']}")
+        return None
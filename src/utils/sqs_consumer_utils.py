@@ -0,0 +1,370 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from utils.progress_utils import ProgressTracker
+from utils.resilience_utils import (THROTTLING_CODES, TRANSIENT_CODES, AWSServiceError, CircuitOpenError,
+                                    ServiceUnavailableError, ThrottlingError, backoff_delay)
+from utils.sqs_utils import (LONG_POLL_SECONDS, MAX_BATCH_ENTRIES, change_visibility, delete_messages,
+                             receive_messages, send_messages)
+
+# Cargar variables de entorno desde un archivo .env
+load_dotenv()
+
+# Configuración de variables de entorno
+SQS_CONSUMER_POLLERS = int(os.getenv('SQS_CONSUMER_POLLERS', '2'))
+SQS_CONSUMER_WORKERS = int(os.getenv('SQS_CONSUMER_WORKERS', '8'))
+SQS_VISIBILITY_TIMEOUT = int(os.getenv('SQS_VISIBILITY_TIMEOUT', '30'))
+SQS_MAX_RECEIVE_COUNT = int(os.getenv('SQS_MAX_RECEIVE_COUNT', '5'))
+
+# Visibilidad máxima que admite SQS (12 horas) y espera máxima entre reintentos
+MAX_VISIBILITY_TIMEOUT = 12 * 60 * 60
+MAX_RETRY_DELAY = 15 * 60
+
+# Espera de un poller tras un error del servicio
+POLL_ERROR_DELAY = 1.0
+
+# Intentos de eliminar un mensaje procesado cuando el servicio falla de forma transitoria
+MAX_ACK_ATTEMPTS = 5
+
+# Códigos de falla (de SQS o de la capa resiliente) que justifican reintentar una operación batch
+RETRYABLE_CODES = THROTTLING_CODES | TRANSIENT_CODES | {
+    error.__name__ for error in (ThrottlingError, ServiceUnavailableError, CircuitOpenError)
+}
+
+logger = logging.getLogger(__name__)
+
+def receive_count(message):
+    """Veces que SQS entregó el mensaje (ApproximateReceiveCount)."""
+    return int(message.get('Attributes', {}).get('ApproximateReceiveCount', '1'))
+
+class SQSConsumer:
+    """
+    Consumidor concurrente de una cola SQS.
+
+    Varios pollers reciben lotes de hasta 10 mensajes con long polling y los entregan a
+    un pool de workers. Cada lote ocupa un lugar en una ventana acotada: cuando está
+    llena, los pollers dejan de recibir (contrapresión), por lo que los mensajes nunca
+    esperan en memoria más de lo que los workers pueden procesar.
+
+    Mientras un lote se procesa, un hilo extiende su visibilidad para que los mensajes
+    lentos no vuelvan a la cola. Los mensajes procesados se eliminan agrupados en
+    DeleteMessageBatch. Un mensaje que falla vuelve a la cola con una espera creciente
+    y, al llegar a max_receive_count entregas, se envía a la DLQ (si se indicó una) y
+    se elimina de la cola original.
+
+    El handler recibe la lista de mensajes del lote y devuelve los que fallaron (None o
+    una lista vacía si todos se procesaron); si levanta una excepción, falla el lote entero.
+    """
+
+    def __init__(self, queue_url, handler, pollers=SQS_CONSUMER_POLLERS, workers=SQS_CONSUMER_WORKERS,
+                 max_in_flight=None, visibility_timeout=SQS_VISIBILITY_TIMEOUT, heartbeat_interval=None,
+                 max_receive_count=SQS_MAX_RECEIVE_COUNT, dlq_url=None, retry_delay=5,
+                 wait_time_seconds=LONG_POLL_SECONDS, ack_interval=1.0, name=None):
+        """
+        :param queue_url: URL de la cola.
+        :param handler: Función lista de mensajes -> mensajes fallidos (ver la descripción de la clase).
+        :param pollers: Hilos que reciben mensajes.
+        :param workers: Lotes procesados a la vez.
+        :param max_in_flight: Lotes recibidos y sin terminar como máximo (por defecto, 2 por worker).
+        :param visibility_timeout: Visibilidad pedida al recibir y en cada extensión, en segundos.
+        :param heartbeat_interval: Segundos entre extensiones (por defecto, un tercio de la visibilidad).
+        :param max_receive_count: Entregas tras las cuales un mensaje que falla va a la DLQ.
+        :param dlq_url: URL de la DLQ; sin ella, los mensajes fallidos sólo vuelven a la cola
+                        (y la redrive policy de la cola, si la hay, decide cuándo descartarlos).
+        :param retry_delay: Espera base antes de reintentar un mensaje fallido (se duplica por entrega).
+        :param wait_time_seconds: Espera de long polling de cada recepción.
+        :param ack_interval: Segundos que una confirmación espera a completar un lote de 10.
+        :param name: Nombre del consumidor en el log y en las métricas de avance.
+        """
+        self.queue_url = queue_url
+        self.handler = handler
+        self.pollers = pollers
+        self.workers = workers
+        self.visibility_timeout = min(visibility_timeout, MAX_VISIBILITY_TIMEOUT)
+        self.heartbeat_interval = heartbeat_interval or max(1.0, visibility_timeout / 3)
+        self.max_receive_count = max_receive_count
+        self.dlq_url = dlq_url
+        self.retry_delay = retry_delay
+        self.wait_time_seconds = wait_time_seconds
+        self.ack_interval = ack_interval
+        self.name = name or f"consumidor {queue_url.rsplit('/', 1)[-1]}"
+        self.stats = {'received': 0, 'processed': 0, 'failed': 0, 'dead_lettered': 0}
+        self._slots = threading.Semaphore(max_in_flight or 2 * workers)
+        self._stop = threading.Event()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._acks = queue.Queue()
+        self._last_activity = time.monotonic()
+        self._executor = None
+        self._executor_done = threading.Event()
+        self._progress = None
+
+    # Estado de los mensajes en proceso
+
+    def _track(self, messages):
+        now = time.monotonic()
+        with self._in_flight_lock:
+            for message in messages:
+                self._in_flight[message['ReceiptHandle']] = now
+            self.stats['received'] += len(messages)
+            self._last_activity = now
+
+    def _untrack(self, messages):
+        with self._in_flight_lock:
+            for message in messages:
+                self._in_flight.pop(message['ReceiptHandle'], None)
+
+    def _count(self, stat, amount):
+        with self._in_flight_lock:
+            self.stats[stat] += amount
+
+    def _ack(self, messages):
+        self._untrack(messages)
+        for message in messages:
+            self._acks.put(message['ReceiptHandle'])
+
+    # Hilos
+
+    def _poll(self):
+        while not self._stop.is_set():
+            if not self._slots.acquire(timeout=1):
+                continue
+            try:
+                messages = receive_messages(self.queue_url, wait_time_seconds=self.wait_time_seconds,
+                                            visibility_timeout=self.visibility_timeout, raise_errors=True)
+            except (ClientError, AWSServiceError) as e:
+                # Throttling, circuito abierto o cola mal configurada: se espera antes de volver a pedir
+                logger.warning("%s: error al recibir mensajes: %s", self.name, e)
+                messages = []
+                self._stop.wait(POLL_ERROR_DELAY)
+            if not messages:
+                self._slots.release()
+                continue
+            received, submitted = messages, False
+            try:
+                self._track(received)
+                if self.dlq_url:
+                    poison = [message for message in messages if receive_count(message) > self.max_receive_count]
+                    if poison:
+                        self._dead_letter(poison)
+                        messages = [message for message in messages if message not in poison]
+                if messages:
+                    self._executor.submit(self._process, messages)
+                    submitted = True
+            except Exception as e:
+                # Los mensajes sin entregar a un worker vuelven a la cola al vencer su visibilidad
+                logger.exception("%s: error al despachar un lote de %d mensajes: %s", self.name, len(received), e)
+                self._untrack(received)
+                self._stop.wait(POLL_ERROR_DELAY)
+            finally:
+                if not submitted:
+                    self._slots.release()
+
+    def _process(self, messages):
+        try:
+            try:
+                failed = list(self.handler(messages) or [])
+            except Exception as e:
+                logger.exception("%s: error al procesar un lote de %d mensajes: %s", self.name, len(messages), e)
+                failed = messages
+            failed_handles = {message['ReceiptHandle'] for message in failed}
+            succeeded = [message for message in messages if message['ReceiptHandle'] not in failed_handles]
+            self._ack(succeeded)
+            self._count('processed', len(succeeded))
+            self._progress.add(len(succeeded), bytes=sum(len(message['Body']) for message in succeeded))
+            if failed:
+                self._fail(failed)
+        finally:
+            self._slots.release()
+
+    def _fail(self, messages):
+        """Devuelve los mensajes a la cola con espera creciente, o los manda a la DLQ."""
+        self._count('failed', len(messages))
+        self._progress.retry(len(messages))
+        exhausted = [message for message in messages if receive_count(message) >= self.max_receive_count]
+        if self.dlq_url and exhausted:
+            self._dead_letter(exhausted)
+            messages = [message for message in messages if message not in exhausted]
+        self._untrack(messages)
+        by_delay = {}
+        for message in messages:
+            delay = min(MAX_RETRY_DELAY, int(self.retry_delay * 2 ** (receive_count(message) - 1)))
+            by_delay.setdefault(delay, []).append(message['ReceiptHandle'])
+        for delay, handles in by_delay.items():
+            try:
+                failed = change_visibility(self.queue_url, handles, delay)
+            except AWSServiceError as e:
+                failed = [(handle, e.code or type(e).__name__, str(e)) for handle in handles]
+            for handle, code, error in failed:
+                # El mensaje vuelve igual al vencer la visibilidad, sólo sin la espera creciente
+                logger.warning("%s: no se pudo programar el reintento de un mensaje: %s %s", self.name, code, error)
+
+    def _dead_letter(self, messages):
+        """Copia los mensajes a la DLQ y elimina de la cola los que se copiaron."""
+        fifo = self.dlq_url.endswith('.fifo')
+        entries = []
+        for message in messages:
+            entry = {'MessageBody': message['Body']}
+            attributes = {
+                name: {field: value for field, value in attribute.items()
+                       if field in ('DataType', 'StringValue', 'BinaryValue')}
+                for name, attribute in message.get('MessageAttributes', {}).items()
+            }
+            if attributes:
+                entry['MessageAttributes'] = attributes
+            if fifo:
+                entry['MessageGroupId'] = message.get('Attributes', {}).get('MessageGroupId', 'default')
+                entry['MessageDeduplicationId'] = message['MessageId']
+            entries.append(entry)
+        try:
+            result = send_messages(self.dlq_url, entries)
+        except AWSServiceError as e:
+            # Sin DLQ disponible los mensajes quedan en la cola y se reintentan en la próxima entrega
+            result = {'successful': [], 'failed': [(index, e.code or type(e).__name__, str(e)) for index in range(len(entries))]}
+        sent = [messages[index] for index, _ in result['successful']]
+        for index, code, error in result['failed']:
+            logger.error("%s: no se pudo enviar el mensaje %s a la DLQ: %s %s",
+                         self.name, messages[index]['MessageId'], code, error)
+        self._untrack([message for message in messages if message not in sent])
+        self._ack(sent)
+        self._count('dead_lettered', len(sent))
+        if sent:
+            logger.warning("%s: %d mensajes enviados a la DLQ tras %d entregas", self.name, len(sent), self.max_receive_count)
+
+    def _heartbeat(self):
+        """Extiende la visibilidad de los mensajes que llevan un intervalo o más en proceso."""
+        while not self._executor_done.wait(self.heartbeat_interval / 2):
+            now = time.monotonic()
+            with self._in_flight_lock:
+                due = [handle for handle, extended in self._in_flight.items() if now - extended >= self.heartbeat_interval]
+                for handle in due:
+                    self._in_flight[handle] = now
+            if not due:
+                continue
+            try:
+                failed = change_visibility(self.queue_url, due, self.visibility_timeout)
+            except AWSServiceError as e:
+                failed = [(handle, e.code or type(e).__name__, str(e)) for handle in due]
+            retry = []
+            for handle, code, error in failed:
+                if code in RETRYABLE_CODES:
+                    logger.warning("%s: no se pudo extender la visibilidad, se reintenta: %s %s", self.name, code, error)
+                    retry.append(handle)
+                else:
+                    # Un mensaje confirmado entre la lectura y la extensión ya no tiene recibo válido
+                    logger.debug("%s: no se pudo extender la visibilidad: %s %s", self.name, code, error)
+            with self._in_flight_lock:
+                # Se vuelven a extender en la próxima vuelta en lugar de esperar un intervalo completo
+                for handle in retry:
+                    if handle in self._in_flight:
+                        self._in_flight[handle] = now - self.heartbeat_interval
+
+    def _acknowledge(self):
+        """
+        Elimina los mensajes confirmados en lotes de hasta 10.
+
+        Los que fallan por throttling o por un error transitorio se reintentan con espera
+        creciente hasta MAX_ACK_ATTEMPTS veces; si no, se volverían a entregar ya procesados.
+        """
+        handles = []
+        attempts = {}
+        done = False
+        while not done or handles:
+            try:
+                handle = self._acks.get(timeout=self.ack_interval)
+                if handle is None:
+                    done = True
+                else:
+                    handles.append(handle)
+                    if len(handles) < MAX_BATCH_ENTRIES:
+                        continue
+            except queue.Empty:
+                pass
+            if not handles:
+                continue
+            batch = handles[:MAX_BATCH_ENTRIES]
+            del handles[:MAX_BATCH_ENTRIES]
+            try:
+                failed = delete_messages(self.queue_url, batch)
+            except AWSServiceError as e:
+                failed = [(handle, e.code or type(e).__name__, str(e)) for handle in batch]
+            retry = []
+            for handle, code, error in failed:
+                attempts[handle] = attempts.get(handle, 0) + 1
+                if code in RETRYABLE_CODES and attempts[handle] < MAX_ACK_ATTEMPTS:
+                    retry.append(handle)
+                else:
+                    logger.error("%s: no se pudo eliminar un mensaje procesado: %s %s", self.name, code, error)
+            for handle in batch:
+                if handle not in retry:
+                    attempts.pop(handle, None)
+            if retry:
+                logger.warning("%s: se reintenta eliminar %d mensajes procesados", self.name, len(retry))
+                handles.extend(retry)
+                time.sleep(backoff_delay(max(attempts[handle] for handle in retry)))
+
+    # Ejecución
+
+    def stop(self):
+        """Deja de recibir mensajes; run() termina cuando se procesan los que ya se recibieron."""
+        self._stop.set()
+
+    def run(self, idle_timeout=None):
+        """
+        Consume la cola hasta que se llame a stop() o, si se indica, hasta que no llegue
+        ningún mensaje durante idle_timeout segundos.
+
+        :param idle_timeout: Segundos sin mensajes tras los cuales se detiene (None no se detiene solo).
+        :return: Diccionario con received, processed, failed y dead_lettered.
+        """
+        self._stop.clear()
+        self._executor_done = threading.Event()
+        self._progress = ProgressTracker(self.name, log=logger, unit='mensajes')
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        pollers = [threading.Thread(target=self._poll, name=f"sqs-poller-{index}", daemon=True)
+                   for index in range(self.pollers)]
+        heartbeat = threading.Thread(target=self._heartbeat, name='sqs-heartbeat', daemon=True)
+        acknowledger = threading.Thread(target=self._acknowledge, name='sqs-acks', daemon=True)
+        for thread in pollers + [heartbeat, acknowledger]:
+            thread.start()
+        try:
+            while not self._stop.wait(1):
+                with self._in_flight_lock:
+                    idle = not self._in_flight and time.monotonic() - self._last_activity
+                if idle_timeout is not None and idle and idle >= idle_timeout:
+                    self._stop.set()
+        except KeyboardInterrupt:
+            logger.info("%s: deteniendo, se terminan los mensajes en proceso", self.name)
+            self._stop.set()
+        finally:
+            for thread in pollers:
+                thread.join()
+            self._executor.shutdown(wait=True)
+            self._executor_done.set()
+            heartbeat.join()
+            self._acks.put(None)
+            acknowledger.join()
+            self._progress.finish()
+        return dict(self.stats)
+
+# Método para consumir una cola SQS con un pool de workers
+def consume_queue(queue_url, handler, idle_timeout=None, **consumer_kwargs):
+    """
+    Consume una cola SQS en paralelo (ver SQSConsumer).
+
+    :param queue_url: URL de la cola.
+    :param handler: Función lista de mensajes -> mensajes fallidos.
+    :param idle_timeout: Segundos sin mensajes tras los cuales se detiene (None consume indefinidamente).
+    :param consumer_kwargs: Parámetros adicionales de SQSConsumer (pollers, workers, dlq_url, ...).
+    :return: Diccionario con received, processed, failed y dead_lettered.
+    """
+    stats = SQSConsumer(queue_url, handler, **consumer_kwargs).run(idle_timeout)
+    print(f"Mensajes de la cola {queue_url}: {stats['processed']} procesados, {stats['failed']} fallidos, "
+          f"{stats['dead_lettered']} enviados a la DLQ")
+    return stats
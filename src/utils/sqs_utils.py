@@ -1,7 +1,7 @@
-import boto3
 import os
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from utils.resilience_utils import AWSServiceError, resilient_client
 
 # Cargar variables de entorno desde un archivo .env
 load_dotenv()
@@ -12,8 +12,13 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'fakemysecretaccesske
 AWS_SESSION_TOKEN = os.getenv('AWS_SESSION_TOKEN', 'fakemysessiontoken')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 
+# Límites de las operaciones batch de SQS
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+LONG_POLL_SECONDS = 20
+
 # Inicializa el cliente de SQS
-sqs_client = boto3.client(
+sqs_client = resilient_client(
     'sqs',
     region_name=AWS_REGION,
     aws_access_key_id=AWS_ACCESS_KEY_ID,
@@ -57,6 +62,183 @@ def delete_message(queue_url, receipt_handle):
         print(f"Error al eliminar mensaje de la cola {queue_url}: {e.response['Error']['Message']}")
         return None
 
+def message_size(entry):
+    """
+    Tamaño de un mensaje según SQS: cuerpo más nombre, tipo y valor de cada atributo.
+
+    :param entry: Entrada de send_message_batch (MessageBody y MessageAttributes opcionales).
+    :return: Tamaño en bytes.
+    """
+    size = len(entry['MessageBody'].encode('utf-8'))
+    for name, attribute in entry.get('MessageAttributes', {}).items():
+        size += len(name.encode('utf-8')) + len(attribute['DataType'].encode('utf-8'))
+        if 'StringValue' in attribute:
+            size += len(attribute['StringValue'].encode('utf-8'))
+        if 'BinaryValue' in attribute:
+            size += len(attribute['BinaryValue'])
+    return size
+
+def chunk_entries(entries, max_entries=MAX_BATCH_ENTRIES, max_bytes=MAX_BATCH_BYTES):
+    """
+    Agrupa entradas en lotes de hasta 10 mensajes y 256 KB en total.
+
+    :param entries: Iterable de (entrada, tamaño).
+    :return: Generador de listas de entradas.
+    """
+    batch = []
+    batch_bytes = 0
+    for entry, size in entries:
+        if batch and (len(batch) >= max_entries or batch_bytes + size > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(entry)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+# Método para enviar muchos mensajes a una cola SQS en lotes
+def send_messages(queue_url, messages, retries=2):
+    """
+    Envía mensajes con SendMessageBatch, en lotes de hasta 10 mensajes y 256 KB.
+
+    Las entradas que fallan por un error del servicio (no del remitente) se reintentan.
+
+    :param queue_url: URL de la cola.
+    :param messages: Iterable de cuerpos (str) o de entradas con MessageBody y opcionalmente
+                     MessageAttributes, DelaySeconds, MessageGroupId y MessageDeduplicationId.
+    :param retries: Reintentos de las entradas fallidas por error del servicio.
+    :return: Diccionario con 'successful' (lista de (índice, MessageId)) y 'failed'
+             (lista de (índice, código, mensaje)), con índices según el orden de messages.
+    """
+    result = {'successful': [], 'failed': []}
+
+    def entries():
+        for index, message in enumerate(messages):
+            entry = {'MessageBody': message} if isinstance(message, str) else dict(message)
+            entry['Id'] = str(index)
+            size = message_size(entry)
+            if size > MAX_BATCH_BYTES:
+                result['failed'].append((index, 'MessageTooLong', f"{size} bytes supera el máximo de {MAX_BATCH_BYTES}"))
+                continue
+            yield entry, size
+
+    for batch in chunk_entries(entries()):
+        for attempt in range(retries + 1):
+            try:
+                response = sqs_client.send_message_batch(QueueUrl=queue_url, Entries=batch)
+            except ClientError as e:
+                error = e.response['Error']
+                result['failed'].extend((int(entry['Id']), error.get('Code'), error.get('Message')) for entry in batch)
+                break
+            except AWSServiceError as e:
+                # Throttling o circuito abierto tras los reintentos del cliente: falla el lote, no el envío completo
+                result['failed'].extend((int(entry['Id']), e.code or type(e).__name__, str(e)) for entry in batch)
+                break
+            result['successful'].extend((int(done['Id']), done['MessageId']) for done in response.get('Successful', []))
+            failed = response.get('Failed', [])
+            retry_ids = {failure['Id'] for failure in failed if not failure.get('SenderFault') and attempt < retries}
+            result['failed'].extend(
+                (int(failure['Id']), failure.get('Code'), failure.get('Message'))
+                for failure in failed if failure['Id'] not in retry_ids
+            )
+            batch = [entry for entry in batch if entry['Id'] in retry_ids]
+            if not batch:
+                break
+    if result['failed']:
+        index, code, message = result['failed'][0]
+        print(f"Error al enviar {len(result['failed'])} mensajes a la cola {queue_url} (por ejemplo #{index}: {code} {message})")
+    return result
+
+# Método para recibir mensajes de una cola SQS con long polling
+def receive_messages(queue_url, max_messages=MAX_BATCH_ENTRIES, wait_time_seconds=LONG_POLL_SECONDS,
+                     visibility_timeout=None, attribute_names=('All',), raise_errors=False):
+    """
+    Recibe hasta 10 mensajes esperando hasta 20 s a que lleguen (long polling).
+
+    :param queue_url: URL de la cola.
+    :param max_messages: Mensajes por llamada (1 a 10).
+    :param wait_time_seconds: Espera máxima de la llamada (0 a 20).
+    :param visibility_timeout: Visibilidad de los mensajes recibidos, si difiere de la de la cola.
+    :param attribute_names: Atributos de sistema a recibir (ApproximateReceiveCount, SentTimestamp, ...).
+    :param raise_errors: Si es True los errores se levantan en lugar de devolver una lista vacía,
+                         para que el llamador distinga una cola vacía de una falla.
+    :return: Lista de mensajes.
+    :raises ClientError: Con raise_errors, si falla la llamada.
+    :raises AWSServiceError: Con raise_errors, si el servicio sigue fallando tras los reintentos.
+    """
+    request = {
+        'QueueUrl': queue_url,
+        'MaxNumberOfMessages': max_messages,
+        'WaitTimeSeconds': wait_time_seconds,
+        'AttributeNames': list(attribute_names),
+        'MessageAttributeNames': ['All']
+    }
+    if visibility_timeout is not None:
+        request['VisibilityTimeout'] = visibility_timeout
+    try:
+        response = sqs_client.receive_message(**request)
+        return response.get('Messages', [])
+    except ClientError as e:
+        if raise_errors:
+            raise
+        print(f"Error al recibir mensajes de la cola {queue_url}: {e.response['Error']['Message']}")
+        return []
+    except AWSServiceError as e:
+        if raise_errors:
+            raise
+        print(f"Error al recibir mensajes de la cola {queue_url}: {e}")
+        return []
+
+def _batch_by_handle(queue_url, operation, entries):
+    """Ejecuta una operación batch por recibo en lotes de 10 y devuelve (recibo, código, mensaje) de los fallidos."""
+    entries = list(entries)
+    failed = []
+    for start in range(0, len(entries), MAX_BATCH_ENTRIES):
+        batch = [dict(entry, Id=str(start + offset)) for offset, entry in enumerate(entries[start:start + MAX_BATCH_ENTRIES])]
+        try:
+            response = operation(QueueUrl=queue_url, Entries=batch)
+        except ClientError as e:
+            error = e.response['Error']
+            failed.extend((entry['ReceiptHandle'], error.get('Code'), error.get('Message')) for entry in batch)
+            continue
+        except AWSServiceError as e:
+            failed.extend((entry['ReceiptHandle'], e.code or type(e).__name__, str(e)) for entry in batch)
+            continue
+        for failure in response.get('Failed', []):
+            entry = batch[int(failure['Id']) - start]
+            failed.append((entry['ReceiptHandle'], failure.get('Code'), failure.get('Message')))
+    return failed
+
+# Método para eliminar muchos mensajes de una cola SQS en lotes
+def delete_messages(queue_url, receipt_handles):
+    """
+    Elimina mensajes con DeleteMessageBatch, en lotes de 10.
+
+    :param queue_url: URL de la cola.
+    :param receipt_handles: Recibos de los mensajes.
+    :return: Lista de (recibo, código, mensaje) que no se pudieron eliminar.
+    """
+    failed = _batch_by_handle(queue_url, sqs_client.delete_message_batch,
+                              ({'ReceiptHandle': handle} for handle in receipt_handles))
+    if failed:
+        print(f"Error al eliminar {len(failed)} mensajes de la cola {queue_url}: {failed[0][1]} {failed[0][2]}")
+    return failed
+
+# Método para cambiar la visibilidad de muchos mensajes de una cola SQS en lotes
+def change_visibility(queue_url, receipt_handles, visibility_timeout):
+    """
+    Cambia la visibilidad de varios mensajes con ChangeMessageVisibilityBatch, en lotes de 10.
+
+    :param queue_url: URL de la cola.
+    :param receipt_handles: Recibos de los mensajes.
+    :param visibility_timeout: Nueva visibilidad en segundos (desde ahora).
+    :return: Lista de (recibo, código, mensaje) que no se pudieron actualizar.
+    """
+    return _batch_by_handle(queue_url, sqs_client.change_message_visibility_batch,
+                            ({'ReceiptHandle': handle, 'VisibilityTimeout': visibility_timeout}
+                             for handle in receipt_handles))
+
 # Método para listar todas las colas SQS
 def list_queues():
     try:
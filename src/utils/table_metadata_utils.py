@@ -0,0 +1,252 @@
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+
+from utils.dynamo_utils import dynamodb_client
+
+# Tiempo de vida por defecto de las descripciones en caché (segundos)
+METADATA_TTL_SECONDS = 300
+
+class TableMetadataCache:
+    """
+    Caché de describe_table y describe_time_to_live con invalidación y waiters.
+
+    Las operaciones que cambian el esquema (create_table, update_table, delete_table,
+    update_time_to_live) deben pasar por esta clase para que la entrada se invalide.
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, client=None, ttl_seconds=METADATA_TTL_SECONDS):
+        self.client = client or dynamodb_client
+        self.ttl_seconds = ttl_seconds
+        self._tables = {}
+        self._ttl = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, cache, table_name):
+        with self._lock:
+            entry = cache.get(table_name)
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            return entry[1]
+        return None
+
+    def _store(self, cache, table_name, value):
+        with self._lock:
+            cache[table_name] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, table_name=None):
+        """
+        Descarta la metadata en caché de una tabla, o de todas si table_name es None.
+
+        :param table_name: Nombre de la tabla.
+        """
+        with self._lock:
+            if table_name is None:
+                self._tables.clear()
+                self._ttl.clear()
+            else:
+                self._tables.pop(table_name, None)
+                self._ttl.pop(table_name, None)
+
+    # Lecturas
+
+    def describe(self, table_name, refresh=False):
+        """
+        Describe una tabla usando la caché.
+
+        Las tablas que no están ACTIVE no se guardan, para no fijar un estado transitorio.
+
+        :param table_name: Nombre de la tabla.
+        :param refresh: Si es True ignora la caché.
+        :return: Descripción de la tabla ('Table' de describe_table).
+        :raises ClientError: Si la tabla no existe u ocurre un error.
+        """
+        table = None if refresh else self._cached(self._tables, table_name)
+        if table is None:
+            table = self.client.describe_table(TableName=table_name)['Table']
+            if table.get('TableStatus') == 'ACTIVE':
+                self._store(self._tables, table_name, table)
+        return table
+
+    def exists(self, table_name):
+        """
+        Indica si una tabla existe.
+
+        :param table_name: Nombre de la tabla.
+        :return: True si la tabla existe.
+        """
+        try:
+            self.describe(table_name)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return False
+            raise
+
+    def key_schema(self, table_name):
+        """Esquema de claves de la tabla."""
+        return self.describe(table_name)['KeySchema']
+
+    def attribute_types(self, table_name):
+        """Diccionario {atributo: tipo} de las definiciones de atributos."""
+        return {
+            attribute['AttributeName']: attribute['AttributeType']
+            for attribute in self.describe(table_name).get('AttributeDefinitions', [])
+        }
+
+    def key_names(self, table_name):
+        """Nombres de los atributos de clave de la tabla, en orden (HASH, RANGE)."""
+        return [key['AttributeName'] for key in self.key_schema(table_name)]
+
+    def global_indexes(self, table_name):
+        """Índices secundarios globales de la tabla."""
+        return self.describe(table_name).get('GlobalSecondaryIndexes', [])
+
+    def local_indexes(self, table_name):
+        """Índices secundarios locales de la tabla."""
+        return self.describe(table_name).get('LocalSecondaryIndexes', [])
+
+    def billing_mode(self, table_name):
+        """Modo de facturación (PROVISIONED o PAY_PER_REQUEST)."""
+        table = self.describe(table_name)
+        return table.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+
+    def ttl_description(self, table_name, refresh=False):
+        """
+        Describe el TTL de una tabla usando la caché.
+
+        :param table_name: Nombre de la tabla.
+        :param refresh: Si es True ignora la caché.
+        :return: 'TimeToLiveDescription' de describe_time_to_live.
+        """
+        description = None if refresh else self._cached(self._ttl, table_name)
+        if description is None:
+            response = self.client.describe_time_to_live(TableName=table_name)
+            description = response.get('TimeToLiveDescription', {})
+            if description.get('TimeToLiveStatus') in ('ENABLED', 'DISABLED'):
+                self._store(self._ttl, table_name, description)
+        return description
+
+    def ttl_status(self, table_name):
+        """Estado del TTL (ENABLED, DISABLED, ENABLING, DISABLING)."""
+        return self.ttl_description(table_name).get('TimeToLiveStatus')
+
+    # Operaciones que cambian el esquema
+
+    def create_table(self, **kwargs):
+        """create_table con invalidación de la caché."""
+        self.invalidate(kwargs['TableName'])
+        return self.client.create_table(**kwargs)
+
+    def update_table(self, **kwargs):
+        """update_table con invalidación de la caché."""
+        self.invalidate(kwargs['TableName'])
+        return self.client.update_table(**kwargs)
+
+    def delete_table(self, table_name):
+        """delete_table con invalidación de la caché."""
+        self.invalidate(table_name)
+        return self.client.delete_table(TableName=table_name)
+
+    def update_time_to_live(self, table_name, attribute_name, enabled=True):
+        """update_time_to_live con invalidación de la caché."""
+        with self._lock:
+            self._ttl.pop(table_name, None)
+        return self.client.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': enabled, 'AttributeName': attribute_name}
+        )
+
+    # Waiters
+
+    def _poll(self, check, description, timeout, base_delay, max_delay):
+        """Llama a check con backoff exponencial hasta que devuelva un valor o venza el plazo."""
+        deadline = time.monotonic() + timeout
+        delay = base_delay
+        while True:
+            result = check()
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Tiempo de espera agotado ({timeout}s) esperando {description}")
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())) * random.uniform(0.8, 1.2))
+            delay = min(max_delay, delay * 2)
+
+    def wait_until_active(self, table_name, include_indexes=True, timeout=300, base_delay=0.5, max_delay=10):
+        """
+        Espera a que una tabla (y opcionalmente sus GSI) quede ACTIVE.
+
+        :param table_name: Nombre de la tabla.
+        :param include_indexes: Si es True espera también a todos los índices globales.
+        :param timeout: Segundos máximos de espera.
+        :param base_delay: Primera espera entre consultas.
+        :param max_delay: Espera máxima entre consultas.
+        :return: Descripción de la tabla activa.
+        :raises TimeoutError: Si no queda activa dentro del plazo.
+        """
+        def check():
+            try:
+                table = self.describe(table_name, refresh=True)
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                    return None
+                raise
+            if table.get('TableStatus') != 'ACTIVE':
+                return None
+            if include_indexes and any(
+                index.get('IndexStatus', 'ACTIVE') != 'ACTIVE' for index in table.get('GlobalSecondaryIndexes', [])
+            ):
+                self.invalidate(table_name)
+                return None
+            return table
+        return self._poll(check, f"la tabla {table_name}", timeout, base_delay, max_delay)
+
+    def wait_until_index_active(self, table_name, index_name, timeout=600, base_delay=1, max_delay=15):
+        """
+        Espera a que un índice global quede ACTIVE (por ejemplo, tras crearlo con update_table).
+
+        :param table_name: Nombre de la tabla.
+        :param index_name: Nombre del índice global.
+        :param timeout: Segundos máximos de espera.
+        :return: Descripción del índice activo.
+        :raises TimeoutError: Si no queda activo dentro del plazo.
+        """
+        def check():
+            table = self.describe(table_name, refresh=True)
+            for index in table.get('GlobalSecondaryIndexes', []):
+                if index['IndexName'] == index_name and index.get('IndexStatus') == 'ACTIVE':
+                    return index
+            self.invalidate(table_name)
+            return None
+        return self._poll(check, f"el índice {index_name} de {table_name}", timeout, base_delay, max_delay)
+
+    def wait_until_deleted(self, table_name, timeout=300, base_delay=0.5, max_delay=10):
+        """
+        Espera a que una tabla deje de existir.
+
+        :param table_name: Nombre de la tabla.
+        :param timeout: Segundos máximos de espera.
+        :raises TimeoutError: Si la tabla sigue existiendo al vencer el plazo.
+        """
+        def check():
+            self.invalidate(table_name)
+            return None if self.exists(table_name) else True
+        self._poll(check, f"la eliminación de {table_name}", timeout, base_delay, max_delay)
+
+    def wait_until_ttl_enabled(self, table_name, timeout=300, base_delay=1, max_delay=10):
+        """
+        Espera a que el TTL de una tabla quede ENABLED.
+
+        :param table_name: Nombre de la tabla.
+        :param timeout: Segundos máximos de espera.
+        :return: Descripción del TTL.
+        """
+        def check():
+            description = self.ttl_description(table_name, refresh=True)
+            return description if description.get('TimeToLiveStatus') == 'ENABLED' else None
+        return self._poll(check, f"el TTL de {table_name}", timeout, base_delay, max_delay)
+
+# Instancia compartida sobre el cliente de dynamo_utils
+table_metadata = TableMetadataCache()
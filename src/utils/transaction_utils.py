@@ -0,0 +1,256 @@
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from botocore.exceptions import ClientError
+
+from utils.dynamo_utils import dynamodb_client
+from utils.resilience_utils import AWSServiceError, CircuitOpenError
+from utils.table_metadata_utils import TableMetadataCache, table_metadata
+
+# Límites de TransactWriteItems
+MAX_TRANSACTION_ACTIONS = 100
+MAX_TRANSACTION_BYTES = 4 * 1024 * 1024
+
+# Motivos de cancelación que se resuelven reintentando
+RETRYABLE_REASONS = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+
+def _expression_fields(condition, names, values):
+    """Arma los campos opcionales de expresión de una acción."""
+    fields = {}
+    if condition:
+        fields['ConditionExpression'] = condition
+    if names:
+        fields['ExpressionAttributeNames'] = names
+    if values:
+        fields['ExpressionAttributeValues'] = values
+    return fields
+
+def _action_size(action):
+    """Tamaño aproximado de una acción en la solicitud (su serialización JSON)."""
+    return len(json.dumps(action, default=str).encode('utf-8'))
+
+class TransactionResult:
+    """
+    Resultado de una transacción ejecutada por TransactionBatch.
+
+    :ivar actions: Acciones enviadas en la transacción.
+    :ivar succeeded: True si la transacción se confirmó.
+    :ivar attempts: Cantidad de intentos realizados.
+    :ivar reasons: Lista de (acción, código, mensaje) de las acciones que causaron la cancelación.
+    :ivar error: Mensaje de error si la transacción falló por otro motivo.
+    """
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.succeeded = False
+        self.attempts = 0
+        self.reasons = []
+        self.error = None
+
+    def __repr__(self):
+        status = 'OK' if self.succeeded else f"FALLIDA ({self.error})"
+        return f"<TransactionResult {len(self.actions)} acciones, {self.attempts} intentos, {status}>"
+
+class TransactionBatch:
+    """
+    Agrupa escrituras en transacciones TransactWriteItems de hasta 100 acciones.
+
+    Cada grupo agregado con add_group (o cada acción suelta) es atómico: nunca se divide
+    entre transacciones. Los grupos se empaquetan en el orden en que se agregaron, cerrando
+    la transacción en curso al llegar a 100 acciones, a 4 MB o a un grupo que toca un ítem
+    ya incluido en ella. Las transacciones sin ítems en común se ejecutan en paralelo; una
+    transacción que toca un ítem de otra anterior espera a que ésta termine, por lo que los
+    cambios sobre un mismo ítem (aprobar y luego anular) se aplican en orden.
+
+    Ejemplo::
+
+        batch = TransactionBatch()
+        batch.add_group([
+            batch.update(TABLA_PAGOS, clave, 'SET estado = :e', values={':e': {'S': 'ANULADO'}}),
+            batch.update(TABLA_AGREGADOS, clave_agregado, 'ADD conteo :menos', values={':menos': {'N': '-1'}}),
+            batch.put(TABLA_AUDITORIA, registro_auditoria),
+        ])
+        results = batch.execute()
+    """
+
+    def __init__(self, client=None, max_actions=MAX_TRANSACTION_ACTIONS, max_attempts=5,
+                 base_delay=0.05, max_delay=2.0, max_bytes=MAX_TRANSACTION_BYTES, metadata=None):
+        self.client = client or dynamodb_client
+        # Las claves de cada tabla identifican el ítem que toca una acción
+        self.metadata = metadata or (table_metadata if client is None else TableMetadataCache(client))
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.groups = []
+
+    # Constructores de acciones
+
+    @staticmethod
+    def put(table_name, item, condition=None, names=None, values=None):
+        """Crea una acción Put."""
+        return {'Put': dict(TableName=table_name, Item=item, **_expression_fields(condition, names, values))}
+
+    @staticmethod
+    def update(table_name, key, update_expression, condition=None, names=None, values=None):
+        """Crea una acción Update."""
+        return {'Update': dict(TableName=table_name, Key=key, UpdateExpression=update_expression,
+                               **_expression_fields(condition, names, values))}
+
+    @staticmethod
+    def delete(table_name, key, condition=None, names=None, values=None):
+        """Crea una acción Delete."""
+        return {'Delete': dict(TableName=table_name, Key=key, **_expression_fields(condition, names, values))}
+
+    @staticmethod
+    def condition_check(table_name, key, condition, names=None, values=None):
+        """Crea una acción ConditionCheck."""
+        return {'ConditionCheck': dict(TableName=table_name, Key=key, **_expression_fields(condition, names, values))}
+
+    # Armado del batch
+
+    def add(self, action):
+        """
+        Agrega una acción independiente.
+
+        :param action: Acción creada con put, update, delete o condition_check.
+        """
+        self.add_group([action])
+
+    def add_group(self, actions):
+        """
+        Agrega un grupo de acciones que deben confirmarse juntas.
+
+        :param actions: Lista de acciones.
+        :raises ValueError: Si el grupo supera los límites o incluye dos acciones sobre el mismo ítem.
+        :raises ClientError: Si no se puede describir alguna de las tablas.
+        """
+        actions = list(actions)
+        ids = [self._item_id(action) for action in actions]
+        if len(set(ids)) < len(ids):
+            # TransactWriteItems rechaza dos operaciones sobre un mismo ítem
+            raise ValueError("Un grupo atómico no puede incluir dos acciones sobre el mismo ítem")
+        if len(actions) > self.max_actions:
+            raise ValueError(f"Un grupo atómico no puede superar {self.max_actions} acciones ({len(actions)})")
+        size = sum(_action_size(action) for action in actions)
+        if size > self.max_bytes:
+            raise ValueError(f"Un grupo atómico no puede superar {self.max_bytes} bytes ({size})")
+        if actions:
+            self.groups.append(actions)
+
+    def _item_id(self, action):
+        """Identifica el ítem afectado por una acción (tabla + atributos de clave, también para Put)."""
+        (_, body), = action.items()
+        attributes = body.get('Key') or body.get('Item') or {}
+        key = {name: attributes.get(name) for name in self.metadata.key_names(body['TableName'])}
+        return body['TableName'], json.dumps(key, sort_keys=True, default=str)
+
+    def _pack(self):
+        """Empaqueta los grupos en orden; devuelve dicts con 'actions' e 'ids' (ítems tocados)."""
+        transactions = []
+        current = None
+        for group in self.groups:
+            group_ids = {self._item_id(action) for action in group}
+            group_size = sum(_action_size(action) for action in group)
+            if (current is None or len(current['actions']) + len(group) > self.max_actions
+                    or current['size'] + group_size > self.max_bytes or group_ids & current['ids']):
+                current = {'actions': [], 'ids': set(), 'size': 0}
+                transactions.append(current)
+            current['actions'].extend(group)
+            current['ids'] |= group_ids
+            current['size'] += group_size
+        return transactions
+
+    def build_transactions(self):
+        """
+        Empaqueta los grupos en listas de acciones para TransactWriteItems.
+
+        :return: Lista de transacciones (cada una, una lista de acciones), en el orden de los grupos.
+        """
+        return [transaction['actions'] for transaction in self._pack()]
+
+    # Ejecución
+
+    def _backoff(self, attempt):
+        """Espera exponencial con jitter completo."""
+        time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt))))
+
+    def _run(self, actions):
+        """Ejecuta una transacción reintentando los conflictos y el throttling."""
+        result = TransactionResult(actions)
+        token = str(uuid.uuid4())
+        for attempt in range(self.max_attempts):
+            result.attempts = attempt + 1
+            try:
+                self.client.transact_write_items(TransactItems=actions, ClientRequestToken=token)
+                result.succeeded = True
+                result.reasons = []
+                result.error = None
+                return result
+            except CircuitOpenError as e:
+                result.error = str(e)
+                return result
+            except AWSServiceError as e:
+                # Throttling o servicio no disponible tras los reintentos de la capa resiliente
+                result.error = str(e)
+                self._backoff(attempt)
+                continue
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                result.error = e.response['Error']['Message']
+                if code != 'TransactionCanceledException':
+                    # Con un cliente sin capa resiliente el throttling llega como ClientError
+                    if code in ('ThrottlingException', 'ProvisionedThroughputExceededException',
+                                'TransactionInProgressException'):
+                        self._backoff(attempt)
+                        continue
+                    return result
+                reasons = e.response.get('CancellationReasons', [])
+                result.reasons = [
+                    (action, reason.get('Code'), reason.get('Message'))
+                    for action, reason in zip(actions, reasons)
+                    if reason.get('Code') not in (None, 'None')
+                ]
+                if not result.reasons or any(code not in RETRYABLE_REASONS for _, code, _ in result.reasons):
+                    # Una condición fallida no se arregla reintentando
+                    return result
+                # La transacción cancelada no aplicó nada: se reintenta con un token nuevo
+                token = str(uuid.uuid4())
+                self._backoff(attempt)
+        return result
+
+    def execute(self, max_workers=4):
+        """
+        Ejecuta todas las transacciones; las que no comparten ítems, en paralelo.
+
+        :param max_workers: Transacciones simultáneas.
+        :return: Lista de TransactionResult en el orden de build_transactions.
+        """
+        transactions = self._pack()
+        if len(transactions) <= 1 or max_workers <= 1:
+            results = [self._run(transaction['actions']) for transaction in transactions]
+        else:
+            def run_after(actions, dependencies):
+                # Las dependencias se enviaron antes y el pool las inicia en orden: ya están
+                # corriendo o terminadas, por lo que esperar no puede bloquear el pool
+                wait(dependencies)
+                return self._run(actions)
+
+            futures = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for index, transaction in enumerate(transactions):
+                    dependencies = [futures[previous] for previous in range(index)
+                                    if transactions[previous]['ids'] & transaction['ids']]
+                    futures.append(executor.submit(run_after, transaction['actions'], dependencies))
+            results = [future.result() for future in futures]
+        for result in results:
+            if not result.succeeded:
+                print(f"Transacción fallida tras {result.attempts} intentos: {result.error}")
+                for action, code, message in result.reasons:
+                    (operation, body), = action.items()
+                    print(f"  {operation} en {body['TableName']}: {code} {message or ''}")
+        self.groups = []
+        return results